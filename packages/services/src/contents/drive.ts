@@ -1007,8 +1007,7 @@ export class BrowserStorageDrive implements Contents.IDrive {
     options?: Contents.IFetchOptions,
   ): Promise<IModel | null> {
     const name = PathExt.basename(path);
-    const parentContents = await this._getServerDirectory(URLExt.join(path, '..'));
-    let model = parentContents.get(name);
+    let model = await this._getServerChild(URLExt.join(path, '..'), name);
     if (!model) {
       return null;
     }
@@ -1089,6 +1088,10 @@ export class BrowserStorageDrive implements Contents.IDrive {
    * retrieve the contents for this path from the contents index file in the appropriate
    * folder.
    *
+   * If the folder's index is sharded, this resolves as soon as the first shard is
+   * fetched: the rest are added to the same Map as they arrive, see
+   * `_addServerShards`.
+   *
    * @param newLocalPath - The new file path.
    *
    * @returns A promise which resolves with a Map of contents, keyed by local file name
@@ -1097,13 +1100,94 @@ export class BrowserStorageDrive implements Contents.IDrive {
     const content = this._serverContents.get(path) || new Map();
 
     if (!this._serverContents.has(path)) {
-      // Check if contents are indexed by looking for the filename in PageConfig
-      const contentsAllJsonFile = PageConfig.getOption('contentsAllJsonFile');
-      if (!contentsAllJsonFile) {
-        this._serverContents.set(path, content);
-        return content;
+      const listing = await this._getServerListing(path);
+      if (listing?.shards?.length) {
+        const [first, ...rest] = listing.shards;
+        for (const [name, file] of await this._getServerShard(path, first)) {
+          content.set(name, file);
+        }
+        void this._addServerShards(path, rest, content);
+      } else {
+        for (const file of listing?.content || []) {
+          content.set(file.name, file);
+        }
       }
+      this._serverContents.set(path, content);
+    }
+
+    return content;
+  }
+
+  /**
+   * add the rest of the shards of a folder's index to its contents as they arrive,
+   * signaling a change in the folder after each, so that listings are refreshed.
+   *
+   * @param path - The folder path.
+   * @param shards - The shards not yet added.
+   * @param content - The contents of the folder, keyed by local file name
+   */
+  private async _addServerShards(
+    path: string,
+    shards: Private.IServerShard[],
+    content: Map<string, IModel>,
+  ): Promise<void> {
+    const pending = shards.map((shard) => this._getServerShard(path, shard));
+    for (const shard of pending) {
+      const models = await shard;
+      for (const [name, file] of models) {
+        content.set(name, file);
+      }
+      const [first] = models.values();
+      if (first) {
+        this._fileChanged.emit({ type: 'new', oldValue: null, newValue: first });
+      }
+    }
+  }
+
+  /**
+   * retrieve the model of one child of a folder from the contents index files,
+   * only fetching the shard which would list it, if the folder's index is sharded.
+   *
+   * @param path - The folder path.
+   * @param name - The name of the child.
+   *
+   * @returns A promise which resolves with the model, if found
+   */
+  private async _getServerChild(
+    path: string,
+    name: string,
+  ): Promise<IModel | undefined> {
+    const listing = await this._getServerListing(path);
+    if (listing?.shards) {
+      const shard = listing.shards.find(
+        ({ first, last }) => first <= name && name <= last,
+      );
+      return shard && (await this._getServerShard(path, shard)).get(name);
+    }
 
+    return (await this._getServerDirectory(path)).get(name);
+  }
+
+  /**
+   * retrieve the contents index file in a folder, which either lists its contents,
+   * or the shards which do.
+   *
+   * @param path - The folder path.
+   *
+   * @returns A promise which resolves with the index, or `null` if not found
+   */
+  private async _getServerListing(
+    path: string,
+  ): Promise<Private.IServerListing | null> {
+    // Check if contents are indexed by looking for the filename in PageConfig
+    const contentsAllJsonFile = PageConfig.getOption('contentsAllJsonFile');
+    if (!contentsAllJsonFile) {
+      return null;
+    }
+
+    let listing = this._serverListings.get(path);
+
+    if (!listing) {
       const apiURL = URLExt.join(
         PageConfig.getBaseUrl(),
         'api/contents',
@@ -1111,19 +1195,48 @@ export class BrowserStorageDrive implements Contents.IDrive {
         contentsAllJsonFile,
       );
 
-      try {
-        const response = await fetch(apiURL);
-        const json = JSON.parse(await response.text());
-        for (const file of json['content'] as IModel[]) {
-          content.set(file.name, file);
-        }
-      } catch (err) {
+      listing = Private.fetchJSON<Private.IServerListing>(apiURL).catch((err) => {
         console.warn(
           `don't worry, about ${err}... nothing's broken. If there had been a
           file at ${apiURL}, you might see some more files.`,
         );
-      }
-      this._serverContents.set(path, content);
+        return null;
+      });
+      this._serverListings.set(path, listing);
+    }
+
+    return listing;
+  }
+
+  /**
+   * retrieve one shard of a sharded contents index file.
+   *
+   * @param path - The folder path.
+   * @param shard - The shard, as listed in the folder's index file.
+   *
+   * @returns A promise which resolves with a Map of contents, keyed by local file name
+   */
+  private async _getServerShard(
+    path: string,
+    shard: Private.IServerShard,
+  ): Promise<Map<string, IModel>> {
+    const apiURL = URLExt.join(
+      PageConfig.getBaseUrl(),
+      'api/contents',
+      path,
+      shard.file,
+    );
+    let content = this._serverShards.get(apiURL);
+
+    if (!content) {
+      content = Private.fetchJSON<Private.IServerListing>(apiURL).then(
+        (json) => new Map((json.content || []).map((file) => [file.name, file])),
+        (err) => {
+          console.warn(`failed to fetch contents shard ${apiURL}: ${err}`);
+          return new Map();
+        },
+      );
+      this._serverShards.set(apiURL, content);
     }
 
     return content;
@@ -1165,6 +1278,8 @@ export class BrowserStorageDrive implements Contents.IDrive {
   }
 
   private _serverContents = new Map<string, Map<string, IModel>>();
+  private _serverListings = new Map<string, Promise<Private.IServerListing | null>>();
+  private _serverShards = new Map<string, Promise<Map<string, IModel>>>();
   private _isDisposed = false;
   private _fileChanged = new Signal<Contents.IDrive, Contents.IChangedArgs>(this);
   private _storageName: string = DEFAULT_STORAGE_NAME;
@@ -1217,4 +1332,53 @@ namespace Private {
     nbformat: 4,
     cells: [],
   };
+
+  /**
+   * One file of a sharded contents index, as listed in the folder's index file.
+   */
+  export interface IServerShard {
+    /**
+     * The name of the file, next to the folder's index file.
+     */
+    file: string;
+
+    /**
+     * The name of the first child listed in the file.
+     */
+    first: string;
+
+    /**
+     * The name of the last child listed in the file.
+     */
+    last: string;
+
+    /**
+     * The number of children listed in the file.
+     */
+    count: number;
+  }
+
+  /**
+   * A contents index file, listing either the children of a folder, or the shards
+   * which do.
+   */
+  export interface IServerListing {
+    /**
+     * The children of the folder, or `null` if listed in `shards`.
+     */
+    content: IModel[] | null;
+
+    /**
+     * The files which list the children of the folder, sorted by name.
+     */
+    shards?: IServerShard[];
+  }
+
+  /**
+   * Fetch and parse a JSON file.
+   */
+  export async function fetchJSON<T>(url: string): Promise<T> {
+    const response = await fetch(url);
+    return JSON.parse(await response.text()) as T;
+  }
 }
@@ -6,12 +6,19 @@ import locale
 import os
 import tarfile
 import tempfile
-from hashlib import sha256
 from pathlib import Path
 
-from ..constants import C_LOCALE, MOD_FILE, NPM_SOURCE_DATE_EPOCH
+from traitlets import CInt
+
+from ..compression import GZIP_LEVEL, ZSTD_LEVEL, ParallelGzipWriter, zstd_writer
+from ..constants import C_LOCALE, EXTENSION_TAR_ZST, MOD_FILE, NPM_SOURCE_DATE_EPOCH
+from ..hashing import hash_one
+from ..optional import has_optional_dependency
 from .base import BaseAddon
 
+#: the size of a tar record, used for the blocks written by ``libarchive``
+TAR_RECORD_SIZE = tarfile.RECORDSIZE
+
 
 class ArchiveAddon(BaseAddon):
     """Adds contents from the ``lite_dir`` to the ``output_dir``, creates API output
@@ -24,6 +31,30 @@ class ArchiveAddon(BaseAddon):
 
     __all__ = ["archive", "status"]
 
+    aliases = {
+        "compression-level": "ArchiveAddon.compression_level",
+        "compression-workers": "ArchiveAddon.compression_workers",
+    }
+
+    compression_level: int | None = CInt(
+        None,
+        allow_none=True,
+        help=(
+            "The compression level of the output archive. "
+            "For gzip, 0-9, default: 9. For zstandard, 1-22, default: 3"
+        ),
+    ).tag(config=True)
+
+    compression_workers: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help=(
+            "The number of threads used to compress the output archive. "
+            "Defaults to the number of CPUs: if 1, compress gzip on a single thread"
+        ),
+    ).tag(config=True)
+
     def status(self, manager):
         tarball = manager.output_archive
         yield self.task(
@@ -37,14 +68,14 @@ class ArchiveAddon(BaseAddon):
 
         tarball = self.manager.output_archive
 
-        file_dep = [p for p in output_dir.rglob("*") if not p.is_dir() and p not in [tarball]]
+        file_dep = [p for p in manager.get_tree(output_dir).files if p != tarball]
 
         yield self.task(
             name=f"archive:{tarball.name}",
             doc="generate a new app archive",
             file_dep=file_dep,
             actions=[
-                (self.make_archive_stdlib, [tarball, output_dir, file_dep]),
+                (self.make_archive, [tarball, output_dir, file_dep]),
                 (self.log_archive, [tarball, "[lite] [archive] "]),
             ],
             targets=[tarball],
@@ -74,53 +105,141 @@ class ArchiveAddon(BaseAddon):
         finally:
             locale.setlocale(locale.LC_ALL, saved_locale)
 
+    def make_archive(self, tarball, root, members):
+        """build the archive with the best available engine"""
+        if self.should_use_libarchive_c:
+            return self.make_archive_libarchive(tarball, root, members)
+        return self.make_archive_stdlib(tarball, root, members)
+
     def make_archive_stdlib(self, tarball, root, members):
         """actually build the archive.
 
         * this takes longer than any other hook
             * while this pure-python implementation needs to be maintained,
-              a ``libarchive``-based build might be preferable for e.g. CI performance.
-        * an npm-compatible ``.tgz`` is the only supported archive format, as this
+              the ``libarchive``-based build is preferred, if available
+        * an npm-compatible ``.tgz`` is the default archive format, as this
           is compatible with the upstream ``webpack`` build and its native packaged format.
+            * ``.tar.zst`` and ``.tar`` are faster to write, and may be used as
+              an ``app_archive``, but are not npm-compatible
+        """
+        with self.temp_archive(tarball) as fileobj, self.compressed(tarball, fileobj) as stream:
+            self.add_members(stream, root, members)
+
+    def make_archive_libarchive(self, tarball, root, members):
+        """build the archive, writing the tar stream with ``libarchive``.
+
+        Members are normalized with the same ``filter_tarinfo`` and written in the same
+        order as the ``tarfile`` engine, and compressed in the same way. While
+        the content is the same, the tar headers are formatted slightly differently.
+        """
+        import libarchive
+
+        with (
+            self.temp_archive(tarball) as fileobj,
+            self.compressed(tarball, fileobj) as stream,
+            libarchive.custom_writer(
+                stream.write, "pax_restricted", block_size=TAR_RECORD_SIZE
+            ) as tar,
+        ):
+            for path, arcname in self.iter_members(root, members):
+                stat = path.stat()
+                tarinfo = tarfile.TarInfo(arcname)
+                tarinfo.size = stat.st_size
+                tarinfo.mtime = int(stat.st_mtime)
+                tarinfo = self.filter_tarinfo(tarinfo)
+                tar.add_file_from_memory(
+                    tarinfo.name,
+                    tarinfo.size,
+                    self.iter_chunks(path),
+                    permission=tarinfo.mode,
+                    uid=tarinfo.uid,
+                    gid=tarinfo.gid,
+                    uname=tarinfo.uname,
+                    gname=tarinfo.gname,
+                    mtime=tarinfo.mtime,
+                )
+
+    def iter_chunks(self, path, chunk_size=TAR_RECORD_SIZE * 100):
+        """yield the content of a file, in chunks"""
+        with path.open("rb") as fd:
+            while True:
+                chunk = fd.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    @contextlib.contextmanager
+    def compressed(self, tarball, fileobj):
+        """yield a stream which compresses a tar stream, based on the ``tarball`` suffix
+
+        * ``.tar.zst`` is compressed with ``zstandard`` on many threads
+        * ``.tar`` is not compressed at all
+        * anything else is compressed with gzip, on many threads unless
+          ``compression_workers`` is 1
         """
+        level = self.compression_level
+        workers = self.compression_workers
 
+        if tarball.name.endswith(EXTENSION_TAR_ZST):
+            if not has_optional_dependency(
+                "zstandard", f"install zstandard to write {tarball.name}: {{error}}"
+            ):
+                msg = f"Cannot write {tarball.name} without zstandard"
+                raise RuntimeError(msg)
+            with zstd_writer(fileobj, ZSTD_LEVEL if level is None else level, workers) as zst:
+                yield zst
+        elif tarball.name.endswith(".tar"):
+            yield fileobj
+        elif workers == 1:
+            level = GZIP_LEVEL if level is None else level
+            with gzip.GzipFile(fileobj=fileobj, mode="wb", mtime=0, compresslevel=level) as gz:
+                yield gz
+        else:
+            level = GZIP_LEVEL if level is None else level
+            with ParallelGzipWriter(fileobj, compresslevel=level, workers=workers) as gz:
+                yield gz
+
+    @contextlib.contextmanager
+    def temp_archive(self, tarball):
+        """yield a file to write, which is copied to the ``tarball`` when complete"""
         # if the command fails, but this still exists, it can cause problems
         if tarball.exists():
             tarball.unlink()
 
+        with tempfile.TemporaryDirectory() as td:
+            temp_ball = Path(td) / tarball.name
+            with os.fdopen(os.open(temp_ball, os.O_WRONLY | os.O_CREAT, MOD_FILE), "wb") as tar_gz:
+                yield tar_gz
+            self.copy_one(temp_ball, tarball)
+
+    def add_members(self, fileobj, root, members=None):
+        """write an uncompressed tar stream of the ``members`` of ``root`` to ``fileobj``"""
+        with tarfile.open(fileobj=fileobj, mode="w:") as tar:
+            for path, arcname in self.iter_members(root, members):
+                tar.add(path, arcname=arcname, filter=self.filter_tarinfo, recursive=False)
+
+    def iter_members(self, root, members=None):
+        """yield the files in ``root``, and their archive names, in a stable order"""
+        if members is None:
+            members = self.manager.get_tree(root).files
+
         # best-effort stable sorting
         with self.setlocale(C_LOCALE):
-            members = sorted(root.rglob("*"), key=lambda p: locale.strxfrm(str(p)))
+            members = sorted(members, key=lambda p: locale.strxfrm(str(p)))
 
         len_members = str(len(members))
         rjust = len(len_members)
 
-        with tempfile.TemporaryDirectory() as td:
-            temp_ball = Path(td) / tarball.name
-            with (
-                os.fdopen(os.open(temp_ball, os.O_WRONLY | os.O_CREAT, MOD_FILE), "wb") as tar_gz,
-                gzip.GzipFile(fileobj=tar_gz, mode="wb", mtime=0) as gz,
-                tarfile.open(fileobj=gz, mode="w:") as tar,
-            ):
-                for i, path in enumerate(members):
-                    if path.is_dir():
-                        continue
-                    if i == 0:
-                        self.log.info(f"""[lite] [archive] files: {len_members}""")
-                    if not (i % 100):
-                        self.log.info(
-                            """[lite] [archive] """
-                            f"""... {str(i + 1).rjust(rjust)} """
-                            f"""of {len_members}"""
-                        )
-                    tar.add(
-                        path,
-                        arcname=f"package/{path.relative_to(root)}",
-                        filter=self.filter_tarinfo,
-                        recursive=False,
-                    )
-
-            self.copy_one(temp_ball, tarball)
+        for i, path in enumerate(members):
+            if i == 0:
+                self.log.info(f"""[lite] [archive] files: {len_members}""")
+            if not (i % 100):
+                self.log.info(
+                    """[lite] [archive] """
+                    f"""... {str(i + 1).rjust(rjust)} """
+                    f"""of {len_members}"""
+                )
+            yield path, f"package/{path.relative_to(root)}"
 
     def log_archive(self, tarball, prefix=""):
         """print some information about an archive"""
@@ -133,7 +252,7 @@ class ArchiveAddon(BaseAddon):
             stat = tarball.stat()
             size = stat.st_size / (1024 * 1024)
             self.log.info(f"{prefix}filename:   {tarball.name}")
-            shasum = sha256(tarball.read_bytes()).hexdigest()
+            shasum = hash_one(tarball)
             self.log.info(f"{prefix}size:       {size} Mb")
             # extra details, for the curious
             self.log.debug(f"{prefix}created:  {int(stat.st_mtime)}")
@@ -1,3 +1,4 @@
+import contextlib
 import email.utils
 import json
 import os
@@ -7,12 +8,14 @@ import tempfile
 import time
 import zipfile
 from collections.abc import Generator
+from hashlib import sha256
 from pathlib import Path
 from typing import Any
 
 from traitlets import Bool, Instance
 from traitlets.config import LoggingConfigurable
 
+from ..compression import open_tar
 from ..constants import (
     DISABLED_EXTENSIONS,
     EXTENSION_TAR,
@@ -31,6 +34,8 @@ from ..constants import (
     SOURCEMAPS,
     UTF8,
 )
+from ..copying import COPY, HARDLINK, copy_file
+from ..hashing import HashCache, hash_many
 from ..manager import LiteManager
 from ..optional import has_optional_dependency
 
@@ -54,6 +59,14 @@ class BaseAddon(LoggingConfigurable):
     def log(self):
         return self.manager.log
 
+    @property
+    def fingerprint_paths(self) -> list[Path]:
+        """the paths, outside of the ``lite_dir``, which this addon reads during a build
+
+        Changes to these paths mean a build is needed, see ``LiteManager.get_fingerprint``.
+        """
+        return []
+
     def task(self, **task):
         """Ensure a ``doit`` task is well-formed.
 
@@ -63,6 +76,15 @@ class BaseAddon(LoggingConfigurable):
         task["name"] = task["name"].replace("=", "--")
         return task
 
+    def patch_config(self, config_path, patch, file_dep=None, config=None):
+        """register a function of a whole config document, to patch a config file once
+
+        See ``LiteManager.patch_config``.
+        """
+        self.manager.patch_config(
+            config_path, type(self).__name__, patch, file_dep=file_dep, config=config
+        )
+
     def copy_one(self, src, dest):
         """copy one Path (a file or folder)"""
         if self.manager.no_sourcemaps and self.is_ignored_sourcemap(src.name):
@@ -75,21 +97,29 @@ class BaseAddon(LoggingConfigurable):
 
         if not dest.parent.exists():
             self.log.debug(f"creating folder {dest.parent}")
-            dest.parent.mkdir(parents=True)
+            dest.parent.mkdir(parents=True, exist_ok=True)
 
-        self.maybe_timestamp(dest.parent)
-
-        copytree_kwargs = {}
+        copytree_kwargs = dict(copy_function=self.copy_file)
 
         if self.manager.no_sourcemaps:
             copytree_kwargs["ignore"] = SOURCEMAP_IGNORE_PATTERNS
 
         if src.is_dir():
             shutil.copytree(src, dest, **copytree_kwargs)
+            self.maybe_timestamp(dest)
         else:
-            shutil.copy2(src, dest)
+            self.copy_file(src, dest)
 
-        self.maybe_timestamp(dest)
+        self.timestamp_written(dest)
+
+    def copy_file(self, src, dest):
+        """copy one file with the ``copy_strategy``, as the ``copy_function`` of ``copytree``"""
+        strategy = self.manager.copy_strategy
+        sde = self.manager.source_date_epoch
+        if strategy == HARDLINK and sde is not None and os.stat(src).st_mtime > sde:
+            # clamping the timestamp of a link would also change the original
+            strategy = COPY
+        return copy_file(src, dest, strategy)
 
     def fetch_one(self, url, dest):
         """fetch one file
@@ -125,10 +155,34 @@ class BaseAddon(LoggingConfigurable):
 
         if path.is_dir():
             for p in path.rglob("*"):
-                self.timestamp_one(p)
+                # with many ``jobs``, other tasks may be replacing files
+                with contextlib.suppress(FileNotFoundError):
+                    self.timestamp_one(p)
 
         self.timestamp_one(path)
 
+    def timestamp_written(self, *paths):
+        """clamp the timestamps of just-written paths, and of the folders above them
+
+        Writing (or deleting) a file changes the ``mtime`` of its parent, and creating
+        a folder changes the ``mtime`` of its own parent, so each folder up to the
+        ``output_dir`` is clamped, without walking anything else.
+        """
+        if self.manager.source_date_epoch is None:
+            return
+
+        output_dir = self.manager.output_dir
+        to_clamp = set()
+        for path in map(Path, paths):
+            to_clamp.add(path)
+            to_clamp.update(p for p in path.parents if output_dir in [p, *p.parents])
+
+        # deepest first, so writing a child doesn't change an already-clamped parent
+        for path in sorted(to_clamp, key=lambda p: len(p.parts), reverse=True):
+            # with many ``jobs``, other tasks may be replacing files
+            with contextlib.suppress(FileNotFoundError):
+                self.timestamp_one(path)
+
     def timestamp_one(self, path):
         """adjust the timestamp to be --source-date-epoch for files newer than then
 
@@ -184,30 +238,23 @@ class BaseAddon(LoggingConfigurable):
         schema = json.loads(schema_path.read_text(**UTF8))
         return klass(schema, format_checker=klass.FORMAT_CHECKER)
 
-    def merge_one_jupyterlite(self, out_path, in_paths):  # noqa: C901, PLR0912
-        """write the ``out_path`` with the merge content of ``in_paths``, where
-        all are valid ``jupyter-lite.*`` files.
-        """
-        self.log.debug(f"[lite][config][merge] {out_path}")
-        config = None
-
-        for in_path in in_paths:
-            self.log.debug(f"[lite][config][merge] . {in_path}")
-            in_config = None
-            try:
-                in_config = json.loads(in_path.read_text(**UTF8))
-                if out_path.name == JUPYTERLITE_IPYNB:
-                    in_config = in_config["metadata"].get(JUPYTERLITE_METADATA)
-            except:  # noqa: E722, S110
-                pass
-
-            if not in_config:
-                continue
-
-            if not config:
-                config = in_config
-                continue
-
+    def merge_one_jupyterlite_config(self, in_path, config, name=JUPYTERLITE_JSON):
+        """merge the content of a ``jupyter-lite.*`` file into a config, as a config patch"""
+        self.log.debug(f"[lite][config][merge] . {in_path}")
+        in_config = None
+        try:
+            in_config = json.loads(in_path.read_text(**UTF8))
+            if name == JUPYTERLITE_IPYNB:
+                in_config = in_config["metadata"].get(JUPYTERLITE_METADATA)
+        except:  # noqa: E722, S110
+            pass
+
+        if not in_config:
+            return config
+
+        if not config:
+            config = in_config
+        else:
             for k, v in in_config.items():
                 self.log.debug(f"""[lite][config] ... updating {k} => {v}?""")
                 if k == JUPYTER_CONFIG_DATA:
@@ -216,9 +263,21 @@ class BaseAddon(LoggingConfigurable):
                     self.log.debug(f"""[lite][config] ..... {k} updated""")
                     config[k] = v
 
-        if config and JUPYTER_CONFIG_DATA in config:
+        if JUPYTER_CONFIG_DATA in config:
             self.dedupe_federated_extensions(config[JUPYTER_CONFIG_DATA])
 
+        return config
+
+    def merge_one_jupyterlite(self, out_path, in_paths):
+        """write the ``out_path`` with the merge content of ``in_paths``, where
+        all are valid ``jupyter-lite.*`` files.
+        """
+        self.log.debug(f"[lite][config][merge] {out_path}")
+        config = None
+
+        for in_path in in_paths:
+            config = self.merge_one_jupyterlite_config(in_path, config, out_path.name)
+
         if out_path.name == JUPYTERLITE_IPYNB:
             if out_path.exists():
                 doc_path = out_path
@@ -321,8 +380,7 @@ class BaseAddon(LoggingConfigurable):
             with zipfile.ZipFile(archive) as zf:
                 zf.extractall(dest)  # noqa: S202
         elif archive.name.endswith(EXTENSION_TAR):
-            mode = "r:bz2" if archive.name.endswith(".bz2") else "r:gz"
-            with tarfile.open(archive, mode) as tf:
+            with open_tar(archive) as tf:
                 self.safe_extract_all(tf, dest)
         else:
             raise ValueError(f"Unrecognized archive format {archive.name}")
@@ -336,7 +394,9 @@ class BaseAddon(LoggingConfigurable):
         prefix = os.path.commonprefix([abs_directory, abs_target])
         return prefix == abs_directory
 
-    def safe_extract_all(self, tar, path=".", members=None, *, numeric_owner=False):
+    def safe_extract_all(
+        self, tar: tarfile.TarFile, path=".", members=None, *, numeric_owner=False
+    ):
         for member in tar.getmembers():
             member_path = os.path.join(path, member.name)
             if not self.is_within_directory(path, member_path):
@@ -344,13 +404,20 @@ class BaseAddon(LoggingConfigurable):
         tar.extractall(path, members, numeric_owner=numeric_owner)  # noqa: S202
 
     def hash_all(self, hashfile: Path, root: Path, paths: list[Path]):
-        from hashlib import sha256
+        """write a ``sha256sum``-compatible file of the hashes of ``paths``
 
-        lines = [
-            "  ".join([sha256(p.read_bytes()).hexdigest(), p.relative_to(root).as_posix()])
-            for p in sorted(paths)
-        ]
+        Hashes are cached in the ``cache_dir``, so only changed files are re-read.
+        """
+        cache = HashCache(self.get_hash_cache_file(hashfile))
+        hashes = hash_many(paths, workers=self.manager.hash_workers, cache=cache)
+        lines = ["  ".join([hashes[p], p.relative_to(root).as_posix()]) for p in sorted(paths)]
         hashfile.write_text("\n".join(lines))
+        cache.save(paths)
+
+    def get_hash_cache_file(self, hashfile: Path) -> Path:
+        """get the location of the cached hashes used to write a ``hashfile``"""
+        key = sha256(str(hashfile.resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.manager.cache_dir / "hashes" / f"{hashfile.name}.{key}.json"
 
     def get_lite_config_paths(self) -> Generator[Path, None, None]:
         """Yield all config paths that exist in the ``lite_dir``."""
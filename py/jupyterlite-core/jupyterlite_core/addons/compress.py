@@ -0,0 +1,269 @@
+"""a JupyterLite addon for pre-compressing static assets"""
+
+import json
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha256
+from itertools import repeat
+from pathlib import Path
+
+import doit.tools
+from traitlets import Bool, CInt, Unicode, default
+
+from ..compression import (
+    BROTLI_QUALITY,
+    GZIP_LEVEL,
+    SIDECARS_VERSION,
+    get_sidecars_json,
+    load_sidecars_json,
+    sidecar_path,
+    write_sidecars,
+)
+from ..constants import COMPRESSED_SIDECARS, COMPRESSIBLE_EXTENSIONS, UTF8
+from ..hashing import HashCache, hash_many
+from ..optional import has_optional_dependency
+from ..trait_types import TypedTuple
+from ..tree import TreeSnapshot
+from .base import BaseAddon
+
+
+class CompressAddon(BaseAddon):
+    """write pre-compressed copies of compressible files in the ``output_dir``
+
+    Static hosts, such as ``nginx`` with ``gzip_static``, can serve these ``.gz``
+    and ``.br`` "sidecars" rather than compressing each response. Sidecars are only
+    written again if the hash of their source, or the compression level, changes.
+    """
+
+    __all__ = ["post_build", "status"]
+
+    aliases = {
+        "compress-workers": "CompressAddon.workers",
+    }
+
+    flags = {
+        "gzip-sidecars": (
+            {"CompressAddon": {"gzip": True}},
+            "Write a .gz copy of compressible files, if smaller",
+        ),
+        "brotli-sidecars": (
+            {"CompressAddon": {"brotli": True}},
+            "Write a .br copy of compressible files, if smaller. Requires brotli",
+        ),
+    }
+
+    gzip: bool = Bool(
+        False,
+        help=(
+            "Write a .gz copy of compressible files. Sidecars are only checked again if"
+            " a compressible file or sidecar changes, or the compression levels change"
+        ),
+    ).tag(config=True)
+
+    brotli: bool = Bool(
+        False,
+        help=(
+            "Write a .br copy of compressible files. Sidecars are only checked again if"
+            " a compressible file or sidecar changes, or the compression levels change"
+        ),
+    ).tag(config=True)
+
+    extensions: tuple[str] = TypedTuple(
+        Unicode(), help="The extensions of files to pre-compress"
+    ).tag(config=True)
+
+    gzip_level: int = CInt(
+        GZIP_LEVEL, min=1, max=9, help="The compression level of gzip sidecars"
+    ).tag(config=True)
+
+    brotli_quality: int = CInt(
+        BROTLI_QUALITY, min=0, max=11, help="The quality of brotli sidecars"
+    ).tag(config=True)
+
+    workers: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help="The number of processes used to compress files. Defaults to the number of CPUs",
+    ).tag(config=True)
+
+    def status(self, manager):
+        """yield some status information about pre-compression"""
+        yield self.task(
+            name="compress",
+            actions=[
+                lambda: print(f"""    compress: {", ".join(self.levels) or "off"}"""),
+            ],
+        )
+
+    def post_build(self, manager):
+        """write sidecars after every other task in ``post_build``
+
+        As many of the files to compress are only written during ``post_build``, they
+        are only found when the task is run: it is up-to-date if the levels, and the
+        ``stat`` of every compressible file and sidecar, are unchanged since it last
+        ran, see ``is_sidecars_uptodate``. If no encodings are configured, any sidecars
+        written by an earlier build are removed.
+        """
+        levels = self.levels
+        if not levels and not self.load_sidecars():
+            return
+
+        yield self.task(
+            name="sidecars",
+            doc="write pre-compressed copies of compressible files",
+            after_all=True,
+            uptodate=[
+                doit.tools.config_changed(dict(levels=levels, extensions=list(self.extensions))),
+                self.is_sidecars_uptodate,
+            ],
+            actions=[(self.write_all_sidecars, [])],
+        )
+
+    @property
+    def levels(self):
+        """the compression level of each encoding which can be written"""
+        levels = {}
+        if self.gzip:
+            levels["gzip"] = self.gzip_level
+        if self.brotli and has_optional_dependency(
+            "brotli", "install brotli to write .br sidecars: {error}"
+        ):
+            levels["br"] = self.brotli_quality
+        return levels
+
+    @property
+    def sidecars_json(self):
+        """the record of the sidecars written for each file in the ``output_dir``"""
+        return get_sidecars_json(self.manager.cache_dir, self.manager.output_dir)
+
+    def is_compressible(self, path):
+        """whether a file in the ``output_dir`` should be pre-compressed"""
+        manager = self.manager
+        return (
+            path.suffix in self.extensions
+            and path != manager.output_archive
+            and manager.cache_dir not in path.parents
+        )
+
+    def get_sidecars_stats(self):
+        """get the hash of the names, sizes and times of every compressible file, every
+        sidecar in the ``output_dir``, and their record, without reading any
+
+        As files may be written with their ``mtime`` clamped to the ``SOURCE_DATE_EPOCH``,
+        their ``ctime`` is also used.
+        """
+        suffixes = set(COMPRESSED_SIDECARS.values())
+        entries = dict(TreeSnapshot(self.manager.output_dir).entries)
+        if self.sidecars_json.exists():
+            entries[self.sidecars_json] = self.sidecars_json.stat()
+
+        digest = sha256()
+        for path, path_stat in sorted(entries.items()):
+            if stat.S_ISDIR(path_stat.st_mode) or not (
+                path == self.sidecars_json or path.suffix in suffixes or self.is_compressible(path)
+            ):
+                continue
+            digest.update(
+                f"{path}:{path_stat.st_size}:{path_stat.st_mtime_ns}:{path_stat.st_ctime_ns}\n".encode()
+            )
+        return digest.hexdigest()
+
+    def is_sidecars_uptodate(self, task, values):
+        """whether no compressible file, or sidecar, changed since sidecars were written"""
+        return bool(values.get("stats")) and values["stats"] == self.get_sidecars_stats()
+
+    def write_all_sidecars(self):
+        """write sidecars for every compressible file which is new or changed
+
+        Files are compressed on a pool of processes, and the sidecars of files which
+        no longer exist, or of encodings no longer configured, are removed. Returns the
+        ``stats`` of the files afterwards, for ``is_sidecars_uptodate``.
+        """
+        levels = self.levels
+        if not levels:
+            self.remove_all_sidecars()
+            return dict(stats=self.get_sidecars_stats())
+
+        tree = TreeSnapshot(self.manager.output_dir)
+        paths = [p for p in tree.files if self.is_compressible(p)]
+        cache = HashCache(self.get_hash_cache_file(self.sidecars_json))
+        hashes = hash_many(paths, workers=self.manager.hash_workers, cache=cache)
+        old_records = self.load_sidecars()
+        records = {}
+        to_write = []
+
+        for path in paths:
+            record = old_records.pop(str(path), None)
+            if record and self.is_uptodate(path, hashes[path], levels, record):
+                records[str(path)] = record
+                continue
+            to_write += [path]
+            if record:
+                self.remove_sidecars(path, set(record[2]) - set(levels))
+
+        for path, written in zip(to_write, self.map_sidecars(to_write, levels), strict=True):
+            records[str(path)] = [hashes[path], levels, written]
+
+        for key, (_, _, written) in old_records.items():
+            self.remove_sidecars(Path(key), written)
+
+        # adding or removing sidecars changes the ``mtime`` of their folders
+        self.timestamp_written(*{path.parent for path in [*to_write, *map(Path, old_records)]})
+        self.log.info(f"[lite] [compress] compressed {len(to_write)} of {len(paths)} files")
+        self.save_sidecars(records)
+        cache.save(paths)
+        return dict(stats=self.get_sidecars_stats())
+
+    def map_sidecars(self, paths, levels):
+        """write the sidecars of many files, on a pool of processes"""
+        sde = self.manager.source_date_epoch
+        workers = min(self.workers or os.cpu_count() or 1, len(paths))
+
+        if workers <= 1:
+            return [write_sidecars(path, levels, sde) for path in paths]
+
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(
+                pool.map(write_sidecars, paths, repeat(levels), repeat(sde), chunksize=chunksize)
+            )
+
+    def is_uptodate(self, path, source_hash, levels, record):
+        """whether the sidecars of a file were written from the same source and levels"""
+        old_hash, old_levels, written = record
+        return (
+            old_hash == source_hash
+            and old_levels == levels
+            and all(sidecar_path(path, e).exists() for e, was in written.items() if was)
+        )
+
+    def remove_all_sidecars(self):
+        """remove every recorded sidecar, and the record"""
+        records = self.load_sidecars()
+        for key, (_, _, written) in records.items():
+            self.remove_sidecars(Path(key), written)
+        self.timestamp_written(*{Path(key).parent for key in records})
+        self.log.info(f"[lite] [compress] removed the sidecars of {len(records)} files")
+        self.sidecars_json.unlink(missing_ok=True)
+        self.get_hash_cache_file(self.sidecars_json).unlink(missing_ok=True)
+
+    def remove_sidecars(self, path, encodings):
+        """remove the sidecars of a file, if they exist"""
+        for encoding in encodings:
+            sidecar_path(path, encoding).unlink(missing_ok=True)
+
+    def load_sidecars(self):
+        """read the record of written sidecars, ignoring it if missing or out-of-date"""
+        return load_sidecars_json(self.sidecars_json)
+
+    def save_sidecars(self, records):
+        """write the record of written sidecars"""
+        data = dict(version=SIDECARS_VERSION, files=records)
+        self.sidecars_json.parent.mkdir(parents=True, exist_ok=True)
+        self.sidecars_json.write_text(json.dumps(data, sort_keys=True), **UTF8)
+
+    @default("extensions")
+    def _default_extensions(self):
+        return COMPRESSIBLE_EXTENSIONS
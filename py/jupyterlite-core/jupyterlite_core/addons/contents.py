@@ -2,28 +2,124 @@
 
 import datetime
 import json
+import math
+import mimetypes
+import os
 import pprint
-import re
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from hashlib import sha256
 from pathlib import Path
 
+import doit.tools
+from traitlets import Bool, CInt, Dict, Unicode, default
+
 from ..constants import (
     ALL_JSON,
     API_CONTENTS,
+    COMPRESSED_SIDECARS,
     CONTENTS_ALL_JSON_FILE,
+    CONTENTS_MANIFEST_FILE,
+    CONTENTS_SCHEMA,
+    DEFAULT_HIDE_GLOBS,
     JSON_FMT,
     JUPYTER_CONFIG_DATA,
     JUPYTERLITE_JSON,
+    MANIFEST_NDJSON,
     UTF8,
 )
-from ..optional import has_optional_dependency
+from ..hashing import HASH_ALGORITHM, HashCache, hash_many
+from ..trait_types import TypedTuple
 from .base import BaseAddon
 
+#: the ``jupyter_server`` classes whose ``allow_hidden`` and ``hide_globs`` are honored
+LEGACY_CONTENTS_MANAGERS = ["ContentsManager", "FileContentsManager"]
+
+#: the number of files hashed at once while writing the manifest
+MANIFEST_CHUNK_SIZE = 256
+
+#: the version of the on-disk record of the sources of copied batches
+COPIED_VERSION = 1
+
+
+def shard_name(index):
+    """get the file name of a shard of a Contents API response"""
+    stem, ext = ALL_JSON.rsplit(".", 1)
+    return f"{stem}.{index}.{ext}"
+
+
+class HiddenContentsError(ValueError):
+    """a hidden directory was found in ``/files/``, but hidden contents are not allowed"""
+
 
 class ContentsAddon(BaseAddon):
     """Adds contents from the ``lite_dir`` to the ``output_dir``, creates API output"""
 
     __all__ = ["build", "post_build", "check", "status"]
 
+    aliases = {
+        "contents-shard-size": "ContentsAddon.shard_size",
+        "contents-batch-size": "ContentsAddon.batch_size",
+        "contents-copy-workers": "ContentsAddon.copy_workers",
+    }
+
+    flags = {
+        "contents-manifest": (
+            {"ContentsAddon": {"manifest": True}},
+            f"Also write a sorted manifest of every file in /files/ to {MANIFEST_NDJSON}",
+        ),
+    }
+
+    allow_hidden: bool = Bool(
+        help="Index files and directories which start with ``.`` in the Contents API"
+    ).tag(config=True)
+
+    hide_globs: tuple[str] = TypedTuple(
+        Unicode(), help="Glob patterns of file and directory names to omit from listings"
+    ).tag(config=True)
+
+    shard_size: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help=(
+            "If given, split the listing of each folder with more children than this "
+            "into shards of at most this many children, sorted by name. The folder's "
+            "`all.json` then lists the shards, so the browser only fetches those it needs"
+        ),
+    ).tag(config=True)
+
+    manifest: bool = Bool(
+        False,
+        help=(
+            "Also write a manifest of every file in `/files/`, sorted by path, with one "
+            "JSON object per line of its path, size, last_modified, mimetype and hash"
+        ),
+    ).tag(config=True)
+
+    batch_size: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help=(
+            "If given, copy contents in one task per folder of at most this many files, "
+            "rather than one task per file, only copying missing or changed files"
+        ),
+    ).tag(config=True)
+
+    copy_workers: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help=(
+            "The number of threads used to copy each batch of contents. "
+            "Defaults to the number of CPUs"
+        ),
+    ).tag(config=True)
+
+    _content_plan = Dict(help="the source and destination of each file, by relative path")
+
     def status(self, manager):
         """yield some status information about the state of contents"""
         yield self.task(
@@ -41,181 +137,579 @@ class ContentsAddon(BaseAddon):
         """perform the main user build of pre-populating ``/files/``"""
         contents = sorted(self.file_src_dest)
         output_files_dir = self.output_files_dir
-        all_dest_files = []
-
-        for src_file, dest_file in contents:
-            all_dest_files += [dest_file]
-            rel = dest_file.relative_to(output_files_dir)
-            yield self.task(
-                name=f"copy:{rel}",
-                doc=f"copy {src_file} to {rel}",
-                file_dep=[src_file],
-                targets=[dest_file],
-                actions=[
-                    (self.copy_one, [src_file, dest_file]),
-                ],
-            )
 
-        if manager.source_date_epoch is not None:
-            yield self.task(
-                name="timestamp",
-                file_dep=all_dest_files,
-                actions=[
-                    (self.maybe_timestamp, [self.output_files_dir]),
-                ],
-            )
+        if self.batch_size:
+            names = []
+            for name, batch in self.get_copy_batches(contents):
+                names += [name]
+                yield self.task(
+                    name=f"copy:{name}",
+                    doc=f"copy {len(batch)} files to {name}",
+                    file_dep=[src_file for src_file, _ in batch],
+                    targets=[dest_file for _, dest_file in batch],
+                    actions=[(self.copy_batch, [name, batch])],
+                )
+            self.prune_copied(names)
+        else:
+            for src_file, dest_file in contents:
+                rel = dest_file.relative_to(output_files_dir)
+                yield self.task(
+                    name=f"copy:{rel}",
+                    doc=f"copy {src_file} to {rel}",
+                    file_dep=[src_file],
+                    targets=[dest_file],
+                    actions=[
+                        (self.copy_one, [src_file, dest_file]),
+                    ],
+                )
 
     def post_build(self, manager):
         """create a Contents API index for each subdirectory in ``/files/``"""
         if not self.output_files_dir.exists():
             return
 
-        output_file_dirs = [d for d in self.output_files_dir.rglob("*") if d.is_dir()] + [
-            self.output_files_dir
-        ]
+        tree = manager.get_tree(self.output_files_dir)
+        stems = sorted(d.relative_to(self.output_files_dir).as_posix() for d in tree.dirs)
         root_all_json = self.api_dir / ALL_JSON
+        file_dep = [
+            p
+            for p in tree.files
+            if not self.is_compressed_sidecar(p, p.relative_to(self.output_files_dir).as_posix())
+        ]
 
-        for output_file_dir in output_file_dirs:
-            stem = output_file_dir.relative_to(self.output_files_dir)
-            api_path = self.api_dir / stem / ALL_JSON
+        yield self.task(
+            name="contents",
+            doc="create a Jupyter Contents API response for every directory in /files/",
+            uptodate=[
+                doit.tools.config_changed(
+                    dict(
+                        allow_hidden=self.allow_hidden,
+                        hide_globs=self.hide_globs,
+                        shard_size=self.shard_size,
+                        stems=stems,
+                    )
+                )
+            ],
+            actions=[(self.all_contents_paths, [])],
+            file_dep=file_dep,
+            targets=[
+                root_all_json,
+                *[self.api_dir / stem / ALL_JSON for stem in stems],
+                *self.get_shard_targets(tree),
+            ],
+        )
 
+        if self.manifest:
             yield self.task(
-                name=f"contents:{stem}",
-                doc=f"create a Jupyter Contents API response for {stem}",
-                actions=[
-                    (self.one_contents_path, [output_file_dir, api_path]),
-                    (self.maybe_timestamp, [api_path]),
+                name="manifest",
+                doc=f"list every file in /files/ in {MANIFEST_NDJSON}",
+                uptodate=[
+                    doit.tools.config_changed(
+                        dict(
+                            allow_hidden=self.allow_hidden,
+                            hide_globs=self.hide_globs,
+                            source_date_epoch=manager.source_date_epoch,
+                        )
+                    )
                 ],
-                file_dep=[p for p in output_file_dir.rglob("*") if not p.is_dir()],
-                targets=[api_path],
+                actions=[(self.write_manifest, [])],
+                file_dep=file_dep,
+                targets=[self.manifest_path],
             )
 
         # Update jupyter-lite.json with the contents all.json filename
         jupyterlite_json = self.manager.output_dir / JUPYTERLITE_JSON
-        yield self.task(
-            name="patch:contentsAllJsonFile",
-            doc="update jupyter-lite.json with contentsAllJsonFile",
+        self.patch_config(
+            jupyterlite_json,
+            self.patch_contents_config,
             file_dep=[root_all_json, jupyterlite_json],
-            actions=[(self.patch_contents_config, [jupyterlite_json])],
+            config=dict(manifest=self.manifest),
         )
 
     def check(self, manager):
-        """verify that all Contents API is valid (sorta)"""
-        for all_json in self.api_dir.rglob(ALL_JSON):
+        """verify that all Contents API responses, and any shards, are valid"""
+        api_files = [*self.api_dir.rglob(ALL_JSON), *self.api_dir.rglob(shard_name("*"))]
+        for all_json in sorted(p for p in api_files if p.is_file()):
             stem = all_json.relative_to(self.api_dir)
             yield self.task(
                 name=f"validate:{stem}",
-                doc=f"(eventually) validate {stem} with the Jupyter Contents API",
-                file_dep=[all_json],
-                actions=[(self.validate_one_json_file, [None, all_json])],
+                doc=f"validate {stem} with the Jupyter Contents API",
+                file_dep=[all_json, CONTENTS_SCHEMA],
+                actions=[(self.validate_one_json_file, [CONTENTS_SCHEMA, all_json])],
             )
 
     @property
     def api_dir(self):
         return self.manager.output_dir / API_CONTENTS
 
+    @property
+    def manifest_path(self):
+        return self.api_dir / MANIFEST_NDJSON
+
     @property
     def output_files_dir(self):
         return self.manager.output_dir / "files"
 
     @property
     def file_src_dest(self):
-        """the pairs of contents that will be copied
+        """the pairs of contents that will be copied, planned once per run"""
+        return list(self._content_plan.values())
 
-        these are processed in `reverse` order, such that only the last path
+    @default("_content_plan")
+    def _default_content_plan(self):
+        """plan the source of each file in ``/files/``, by its relative path
+
+        ``contents`` are processed in `reverse` order, such that only the last path
         wins
         """
-        yielded_dests = []
+        plan = {}
+        output_files_dir = self.output_files_dir
         for mgr_file in reversed(self.manager.contents):
-            path = Path(mgr_file)
-            for from_path in self.maybe_add_one_path(path):
-                stem = from_path.relative_to(path) if path.is_dir() else path.name
-                to_path = self.output_files_dir / stem
-                resolved = str(to_path.resolve())
-                if resolved in yielded_dests:  # pragma: no cover
-                    self.log.debug("Already populated %s", resolved)
+            path = Path(mgr_file).resolve()
+            if not path.is_dir():
+                plan.setdefault(path.name, (path, output_files_dir / path.name))
+                continue
+            for from_path, stem in self.maybe_add_one_path(path):
+                if stem in plan:  # pragma: no cover
+                    self.log.debug("Already populated %s", stem)
                     continue
-                yielded_dests += [resolved]
-                yield from_path, to_path
+                plan[stem] = from_path, output_files_dir / stem
+        return plan
 
-    def maybe_add_one_path(self, path, root=None):
-        """add a file or folder's contents (if not ignored)"""
-
-        if root is not None:
-            rel_posix_path = f"/{path.relative_to(root).as_posix()}"
+    def get_copy_batches(self, contents):
+        """group the sorted pairs of contents by folder, in batches of ``batch_size``"""
+        by_dir = {}
+        for src_file, dest_file in contents:
+            rel_dir = dest_file.parent.relative_to(self.output_files_dir).as_posix()
+            by_dir.setdefault(rel_dir, []).append((src_file, dest_file))
 
-            for ignore in [
-                *self.manager.ignore_contents,
-                *self.manager.extra_ignore_contents,
-            ]:
-                if re.findall(ignore, rel_posix_path):
-                    return
+        for rel_dir, pairs in by_dir.items():
+            batches = [
+                pairs[i : i + self.batch_size] for i in range(0, len(pairs), self.batch_size)
+            ]
+            for i, batch in enumerate(batches):
+                yield (rel_dir if len(batches) == 1 else f"{rel_dir}:{i}"), batch
 
-        if path.is_dir():
-            for child in path.glob("*"):
-                yield from self.maybe_add_one_path(child, root or path)
-        else:
-            yield path.resolve()
+    def copy_batch(self, name, batch):
+        """copy the files in a batch which are missing or changed, on many threads
 
-    def one_contents_path(self, output_file_dir, api_path):
-        """A lazy reuse of a ``jupyter_server`` Contents API generator
-
-        .. todo::
+        The ``stat`` of each source is recorded as it is copied, as with
+        ``--source-date-epoch`` the ``mtime`` of a copy can't tell if its source changed.
+        """
+        copied_json = self.get_copied_json(name)
+        old_copied = self.load_copied(copied_json)
+        copied = {}
+        to_copy = []
+        for src, dest in batch:
+            if self.is_copy_uptodate(src, dest, old_copied.get(str(dest))):
+                copied[str(dest)] = copied_stat(src.stat())
+            else:
+                to_copy += [(src, dest)]
+
+        self.log.debug(f"[lite] [contents] copying {len(to_copy)} of {len(batch)} files")
+        workers = min(self.copy_workers or os.cpu_count() or 1, len(to_copy))
 
-            Ideally we'd have a fallback, schema-verified generator, which we could
-            later port to e.g. JS
+        try:
+            if workers <= 1:
+                for src, dest in to_copy:
+                    self.copy_one_file(src, dest, copied)
+            else:
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    list(pool.map(lambda pair: self.copy_one_file(*pair, copied), to_copy))
+        finally:
+            self.save_copied(copied_json, copied)
+
+    def copy_one_file(self, src, dest, copied=None):
+        """copy one file, clamping only its own timestamp, and those of its parents
+
+        If given, the ``stat`` of the source from before it was copied is recorded in
+        ``copied``, by destination.
         """
-        has_jupyter_server = has_optional_dependency(
-            "jupyter_server",
-            "[lite] [contents] install `jupyter_server` to index contents: {error}",
-        )
-        if self.manager.contents and not has_jupyter_server:
-            raise RuntimeError(
-                """jupyter-server is not installed. You cannot add custom content to jupyterlite.
-                Please install jupyter-server and try again.
-                """
-            )
-        elif not has_jupyter_server:
+        if self.manager.no_sourcemaps and self.is_ignored_sourcemap(src.name):
             return
+        src_stat = src.stat()
+        if dest.exists():
+            dest.unlink()
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        self.copy_file(src, dest)
+        self.timestamp_written(dest)
+        if copied is not None:
+            copied[str(dest)] = copied_stat(src_stat)
+
+    def is_copy_uptodate(self, src, dest, copied=None):
+        """whether a file has already been copied, by its size and ``mtime``
+
+        If the ``mtime`` of the copy was clamped to ``--source-date-epoch``, the source
+        must be unchanged since it was ``copied``.
+        """
+        try:
+            src_stat, dest_stat = src.stat(), dest.stat()
+        except FileNotFoundError:
+            return False
 
+        if src_stat.st_size != dest_stat.st_size:
+            return False
+
+        sde = self.manager.source_date_epoch
+        if sde is not None and src_stat.st_mtime > sde:
+            return dest_stat.st_mtime == sde and copied == copied_stat(src_stat)
+        return dest_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+    @property
+    def copied_dir(self):
+        """the records of the sources of copied batches, for this ``output_dir``"""
+        output_key = sha256(str(self.output_files_dir.resolve()).encode("utf-8")).hexdigest()
+        return self.manager.cache_dir / "contents" / "copied" / output_key[:16]
+
+    def get_copied_json(self, name):
+        """the record of the sources of a batch, by its name"""
+        key = sha256(name.encode("utf-8")).hexdigest()[:16]
+        return self.copied_dir / f"{key}.json"
+
+    def load_copied(self, copied_json):
+        """read the ``stat`` of each source when last copied, by destination"""
+        try:
+            data = json.loads(copied_json.read_text(**UTF8))
+        except (OSError, ValueError):
+            return {}
+        return data.get("files", {}) if data.get("version") == COPIED_VERSION else {}
+
+    def save_copied(self, copied_json, copied):
+        """record the ``stat`` of each source in a batch when it was copied"""
+        copied_json.parent.mkdir(parents=True, exist_ok=True)
+        data = dict(version=COPIED_VERSION, files=copied)
+        copied_json.write_text(json.dumps(data, sort_keys=True), **UTF8)
+
+    def prune_copied(self, names):
+        """remove the records of batches which no longer exist"""
+        if not self.copied_dir.exists():
+            return
+        keep = {self.get_copied_json(name) for name in names}
+        for copied_json in self.copied_dir.glob("*.json"):
+            if copied_json not in keep:
+                copied_json.unlink()
+
+    def maybe_add_one_path(self, root):
+        """yield the (not ignored) files in a folder, and their paths relative to it"""
+        ignore = self.manager.contents_ignore
+        pending = [(str(root), "")]
+
+        while pending:
+            os_dir, rel_dir = pending.pop()
+            with os.scandir(os_dir) as entries:
+                for entry in entries:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    is_dir = entry.is_dir()
+                    if ignore.is_ignored(f"/{rel}", is_dir):
+                        continue
+                    if is_dir:
+                        pending += [(entry.path, rel)]
+                    else:
+                        yield Path(entry.path), rel
+
+    def all_contents_paths(self):
+        """write a Contents API response for every directory in ``/files/``
+
+        The whole tree is walked once, and nothing is written unless every
+        directory could be indexed.
+        """
         if not self.output_files_dir.exists():
             return
 
-        self.maybe_timestamp(self.output_files_dir)
+        try:
+            listings = list(self.iter_contents_listings(self.output_files_dir))
+        except HiddenContentsError as error:
+            self.print_hidden_contents_hint(error)
+            return False
 
-        from jupyter_server.services.contents.filemanager import FileContentsManager
+        for listing_path, listing in listings:
+            self.write_sharded_listing(self.api_dir / listing_path / ALL_JSON, listing)
 
-        fm = FileContentsManager(root_dir=str(self.output_files_dir), parent=self)
+    def iter_contents_listings(self, root):
+        """yield the API path and listing of ``root``, and every directory below it"""
+        pending = [""]
+        while pending:
+            listing_path = pending.pop()
+            listing, child_dirs = self.one_contents_listing(root, listing_path)
+            pending += reversed(child_dirs)
+            yield listing_path, listing
 
-        listing_path = str(output_file_dir.relative_to(self.output_files_dir))
-        # normalize the root folder to avoid adding a `./` prefix to the
-        # path field in the generated listing
-        if listing_path == ".":
-            listing_path = ""
+    def one_contents_listing(self, root, listing_path):  # noqa: C901
+        """build the Contents API model of one directory, with its children
 
-        try:
-            listing = fm.get(listing_path)
-        except Exception as error:
-            print(
-                f"""Couldn't fetch {listing_path} as Jupyter contents.  {error}
-                If this folder, or one of its parents, starts with a `.`, you can
-                enable indexing hidden files with a `jupyter_lite_config.json` such as:
-
-                    "ContentsManager": {{
-                        "allow_hidden": true
-                    }}
-
-                Alternately, to skip it:
-
-                    "LiteBuildConfig": {{
-                        "extra_ignore_contents": [
-                            "/\\.<the offendings path name>"
-                        ]
-                    }}
-                """
-            )
-            return False
+        This matches the output of ``jupyter_server``'s ``FileContentsManager.get``,
+        and returns the API paths of child directories which should also be indexed.
+        """
+        os_dir = os.path.join(root, listing_path)
+
+        is_hidden_path = any(part.startswith(".") for part in listing_path.split("/"))
+        if listing_path and is_hidden_path and not self.allow_hidden:
+            raise HiddenContentsError(listing_path)
+
+        model = self.one_contents_model(os_dir, listing_path, os.lstat(os_dir), "directory")
+        model["content"] = content = []
+        model["format"] = "json"
+        child_dirs = []
+
+        with os.scandir(os_dir) as entries:
+            for entry in entries:
+                child_path = f"{listing_path}/{entry.name}" if listing_path else entry.name
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                    is_dir = entry.is_dir()
+                except OSError:  # pragma: no cover
+                    self.log.debug("[lite] [contents] couldn't stat %s", entry.path)
+                    continue
+
+                if not (stat.S_ISLNK(st.st_mode) or stat.S_ISREG(st.st_mode) or is_dir):
+                    continue
+
+                is_hidden = self.is_hidden_entry(entry, st)
+
+                if is_dir and not stat.S_ISLNK(st.st_mode):
+                    if is_hidden and not self.allow_hidden:
+                        raise HiddenContentsError(child_path)
+                    child_dirs += [child_path]
+
+                if is_hidden and not self.allow_hidden:
+                    continue
+
+                if any(fnmatch(entry.name, glob) for glob in self.hide_globs):
+                    continue
+
+                if not is_dir and self.is_compressed_sidecar(entry.path, child_path):
+                    continue
+
+                if is_dir:
+                    model_type = "directory"
+                elif entry.name.endswith(".ipynb"):
+                    model_type = "notebook"
+                else:
+                    model_type = "file"
+
+                content += [self.one_contents_model(entry.path, child_path, st, model_type)]
+
+        return model, child_dirs
+
+    def one_contents_model(self, os_path, api_path, st, model_type):
+        """build a Contents API model, without content, from a ``stat`` result"""
+        model = {
+            "name": api_path.rsplit("/", 1)[-1],
+            "path": api_path,
+            "last_modified": fromtimestamp(st.st_mtime),
+            "created": fromtimestamp(created_timestamp(st)),
+            "content": None,
+            "format": None,
+            "mimetype": None,
+            "size": st.st_size,
+            "writable": os.access(os_path, os.W_OK),
+            "hash": None,
+            "hash_algorithm": None,
+            "type": model_type,
+        }
+
+        if model_type == "directory":
+            model["size"] = None
+        elif model_type == "file":
+            model["mimetype"] = mimetypes.guess_type(os_path)[0]
+
+        return model
+
+    def is_compressed_sidecar(self, os_path, api_path):
+        """whether a file is a pre-compressed copy of its sibling, rather than contents
+
+        See ``CompressAddon``: a file named, e.g. ``.gz``, which was copied from the
+        ``contents``, is still listed.
+        """
+        stem, ext = os.path.splitext(os_path)
+        return (
+            ext in COMPRESSED_SIDECARS.values()
+            and os.path.isfile(stem)
+            and api_path not in self._content_plan
+        )
+
+    def is_hidden_entry(self, entry, st):
+        """whether a directory entry would be hidden by ``jupyter_server``"""
+        if entry.name.startswith("."):
+            return True
+
+        if stat.S_ISLNK(st.st_mode):
+            try:
+                st = entry.stat()
+            except OSError:
+                return False
+
+        if stat.S_ISDIR(st.st_mode) and not os.access(entry.path, os.X_OK | os.R_OK):
+            return True
+
+        return bool(getattr(st, "st_flags", 0) & getattr(stat, "UF_HIDDEN", 0))
+
+    def get_shard_targets(self, tree):
+        """get the shards which the listing of each directory in ``/files/`` will need
+
+        The children of each directory are counted from the ``tree``, skipping those
+        that ``one_contents_listing`` would, as far as their names and types tell.
+        """
+        if not self.shard_size:
+            return []
+
+        counts = {}
+        for path, path_stat in tree.entries.items():
+            api_path = path.relative_to(self.output_files_dir).as_posix()
+            if path.name.startswith(".") and not self.allow_hidden:
+                continue
+            if any(fnmatch(path.name, glob) for glob in self.hide_globs):
+                continue
+            if not stat.S_ISDIR(path_stat.st_mode) and self.is_compressed_sidecar(path, api_path):
+                continue
+            counts[path.parent] = counts.get(path.parent, 0) + 1
+
+        targets = []
+        for parent, count in sorted(counts.items()):
+            if count > self.shard_size:
+                api_dir = self.api_dir / parent.relative_to(self.output_files_dir)
+                targets += [
+                    api_dir / shard_name(i) for i in range(math.ceil(count / self.shard_size))
+                ]
+        return targets
+
+    def write_sharded_listing(self, api_path, listing):
+        """write a Contents API response, maybe as a manifest of ``shard_size`` shards
+
+        A manifest is the directory model, with a ``null`` ``content``, and a list of
+        ``shards``, each with the ``file`` name, and the ``first`` and ``last`` child
+        names, in that file. Each shard is the directory model, with some of its content.
+        """
+        content = listing["content"]
+        shards = []
+
+        if self.shard_size and len(content) > self.shard_size:
+            content = sorted(content, key=lambda model: model["name"])
+            for start in range(0, len(content), self.shard_size):
+                chunk = content[start : start + self.shard_size]
+                shard_file = shard_name(len(shards))
+                self.write_one_listing(api_path.parent / shard_file, {**listing, "content": chunk})
+                shards += [
+                    dict(
+                        file=shard_file,
+                        first=chunk[0]["name"],
+                        last=chunk[-1]["name"],
+                        count=len(chunk),
+                    )
+                ]
+            listing = {**listing, "content": None, "shards": shards}
+
+        self.write_one_listing(api_path, listing)
+
+        for stale in api_path.parent.glob(shard_name("*")):
+            if stale.is_file() and stale.name not in {shard["file"] for shard in shards}:
+                stale.unlink()
+                self.timestamp_written(api_path.parent)
+
+    def write_manifest(self):
+        """write every file in ``/files/``, sorted by path, as one JSON object per line
+
+        Each line has the ``path``, ``size``, ``last_modified``, ``mimetype`` and the
+        ``hash`` (with ``HASH_ALGORITHM``) of a file. The tree is walked one directory at
+        a time, in order, and files are hashed, and written, a chunk at a time. Hashes
+        are cached in one file per directory, so only changed files are read again, and
+        only the entries and hashes of the directories being walked are held in memory.
+        """
+        manifest = self.manifest_path
+        manifest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = manifest.with_name(f"{manifest.name}.{os.getpid()}.tmp")
+        cache_files = set()
 
+        with tmp_file.open("w", **UTF8) as fd:
+            self.write_manifest_dir(fd, self.output_files_dir, "", cache_files)
+
+        tmp_file.replace(manifest)
+        for stale in self.manifest_cache_dir.glob("*.json"):
+            if stale not in cache_files:
+                stale.unlink()
+        self.timestamp_written(manifest)
+
+    @property
+    def manifest_cache_dir(self):
+        """the folder of cached hashes of each directory in the manifest"""
+        return self.get_hash_cache_file(self.manifest_path).with_suffix("")
+
+    def write_manifest_dir(self, fd, os_dir, api_dir, cache_files):
+        """write the records of the files in a directory, and those below it, in order"""
+        key = sha256(api_dir.encode("utf-8")).hexdigest()[:16]
+        cache_file = self.manifest_cache_dir / f"{key}.json"
+        cache_files.add(cache_file)
+        cache = HashCache(cache_file, HASH_ALGORITHM)
+        paths = []
+        chunk = []
+
+        for api_path, path, st in self.iter_manifest_children(os_dir, api_dir):
+            if st is None:
+                self.write_manifest_records(fd, chunk, cache)
+                chunk = []
+                self.write_manifest_dir(fd, path, api_path, cache_files)
+                continue
+            chunk += [(api_path, path, st)]
+            paths += [path]
+            if len(chunk) == MANIFEST_CHUNK_SIZE:
+                self.write_manifest_records(fd, chunk, cache)
+                chunk = []
+
+        self.write_manifest_records(fd, chunk, cache)
+        cache.save(paths)
+
+    def write_manifest_records(self, fd, chunk, cache):
+        """hash a chunk of files in one directory, and write their records"""
+        if not chunk:
+            return
+        sde = self.manager.source_date_epoch
+        hashes = hash_many(
+            [path for _, path, _ in chunk], workers=self.manager.hash_workers, cache=cache
+        )
+        for api_path, path, st in chunk:
+            mtime = st.st_mtime if sde is None else min(st.st_mtime, sde)
+            record = {
+                "path": api_path,
+                "size": st.st_size,
+                "last_modified": isoformat(fromtimestamp(mtime)),
+                "mimetype": mimetypes.guess_type(path)[0],
+                "hash": hashes[path],
+            }
+            fd.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def iter_manifest_children(self, os_dir, api_dir):
+        """yield the API path, path and ``stat`` of every listed child, sorted by API path
+
+        Directories are sorted by their name with a trailing ``/``, so walking each in
+        turn yields the same order as sorting every API path. A directory has no ``stat``.
+        """
+        children = []
+
+        with os.scandir(os_dir) as entries:
+            for entry in entries:
+                try:
+                    lst = entry.stat(follow_symlinks=False)
+                    st = entry.stat()
+                except OSError:
+                    self.log.debug("[lite] [contents] couldn't stat %s", entry.path)
+                    continue
+                if self.is_hidden_entry(entry, lst) and not self.allow_hidden:
+                    continue
+                if any(fnmatch(entry.name, glob) for glob in self.hide_globs):
+                    continue
+                is_dir = stat.S_ISDIR(st.st_mode)
+                if is_dir and stat.S_ISLNK(lst.st_mode):
+                    continue
+                if not is_dir and self.is_compressed_sidecar(entry.path, f"{api_dir}{entry.name}"):
+                    continue
+                if is_dir or stat.S_ISREG(st.st_mode):
+                    children += [(f"{entry.name}/" if is_dir else entry.name, entry, st)]
+
+        for key, entry, st in sorted(children, key=lambda child: child[0]):
+            yield f"{api_dir}{key}", Path(entry.path), None if key.endswith("/") else st
+
+    def write_one_listing(self, api_path, listing):
+        """write one Contents API response, maybe clamping its timestamps"""
         if self.manager.source_date_epoch is not None:
             listing = self.patch_listing_timestamps(listing)
 
@@ -225,27 +719,53 @@ class ContentsAddon(BaseAddon):
             json.dumps(listing, **JSON_FMT, cls=DateTimeEncoder),
             **UTF8,
         )
+        self.timestamp_written(api_path)
+
+    def print_hidden_contents_hint(self, error):
+        """explain how to handle a hidden directory in ``/files/``"""
+        print(
+            f"""Couldn't fetch {error} as Jupyter contents.
+            If this folder, or one of its parents, starts with a `.`, you can
+            enable indexing hidden files with a `jupyter_lite_config.json` such as:
+
+                "ContentsAddon": {{
+                    "allow_hidden": true
+                }}
+
+            Alternately, to skip it:
+
+                "LiteBuildConfig": {{
+                    "extra_ignore_contents": [
+                        "/\\.<the offendings path name>"
+                    ]
+                }}
+            """
+        )
 
-        self.maybe_timestamp(api_path.parent)
+    @default("allow_hidden")
+    def _default_allow_hidden(self):
+        return bool(self._legacy_contents_manager_config("allow_hidden", False))
 
-    def patch_contents_config(self, jupyterlite_json):
-        """Update jupyter-lite.json with the contents all.json filename."""
-        try:
-            config = json.loads(jupyterlite_json.read_text(**UTF8))
-        except (FileNotFoundError, json.JSONDecodeError):
-            config = {JUPYTER_CONFIG_DATA: {}}
+    @default("hide_globs")
+    def _default_hide_globs(self):
+        return self._legacy_contents_manager_config("hide_globs", DEFAULT_HIDE_GLOBS)
 
-        if JUPYTER_CONFIG_DATA not in config:
-            config[JUPYTER_CONFIG_DATA] = {}
+    def _legacy_contents_manager_config(self, name, default_value):
+        """read a value once configured for the ``jupyter_server`` contents manager"""
+        value = default_value
+        for cls_name in LEGACY_CONTENTS_MANAGERS:
+            if cls_name in self.config and name in self.config[cls_name]:
+                value = self.config[cls_name][name]
+        return value
 
+    def patch_contents_config(self, config):
+        """Update jupyter-lite.json with the contents all.json filename."""
         # Set the filename for contents all.json
-        config[JUPYTER_CONFIG_DATA][CONTENTS_ALL_JSON_FILE] = ALL_JSON
-
-        jupyterlite_json.write_text(json.dumps(config, **JSON_FMT), **UTF8)
-        self.maybe_timestamp(jupyterlite_json)
-        self.log.debug(
-            f"[lite] [contents] Updated {jupyterlite_json} with {CONTENTS_ALL_JSON_FILE}"
-        )
+        config_data = config.setdefault(JUPYTER_CONFIG_DATA, {})
+        config_data[CONTENTS_ALL_JSON_FILE] = ALL_JSON
+        if self.manifest:
+            config_data[CONTENTS_MANIFEST_FILE] = MANIFEST_NDJSON
+        return config
 
     def patch_listing_timestamps(self, listing, sde=None):
         """clamp a contents listing's times to ``SOURCE_DATE_EPOCH``
@@ -290,3 +810,24 @@ class DateTimeEncoder(json.JSONEncoder):
 def isoformat(dt):
     """a small helper to user ``Z`` for UTC ISO strings"""
     return dt.isoformat().replace("+00:00", "Z")
+
+
+def fromtimestamp(timestamp):
+    """a UTC datetime for a ``stat`` time, falling back to the epoch if invalid"""
+    try:
+        return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+    except (ValueError, OverflowError, OSError):  # pragma: no cover
+        return datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def copied_stat(st):
+    """the fields of the ``stat`` of a source which change if it is written"""
+    return [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino]
+
+
+def created_timestamp(st):
+    """the best-effort creation time of a ``stat`` result, as used by ``jupyter_server``"""
+    birthtime = getattr(st, "st_birthtime", None)
+    if isinstance(birthtime, (int, float)) and birthtime >= 0 and math.isfinite(birthtime):
+        return birthtime
+    return st.st_ctime
@@ -11,7 +11,6 @@ from traitlets import List, Unicode
 from ..constants import (
     ALL_FEDERATED_JSON,
     FEDERATED_EXTENSIONS,
-    JSON_FMT,
     JUPYTER_CONFIG_DATA,
     JUPYTERLITE_JSON,
     LAB_EXTENSIONS,
@@ -55,6 +54,19 @@ class FederatedExtensionAddon(BaseAddon):
         """where archives will go in the cache"""
         return self.manager.cache_dir / "archives"
 
+    @property
+    def fingerprint_paths(self):
+        """the installed, and local, extensions which may be copied during a build"""
+        paths = [] if self.is_sys_prefix_ignored() else [self.labextensions_path]
+        paths += [Path(p) for p in self.extra_labextensions_path]
+        for path_or_url in self.manager.federated_extensions:
+            if re.findall(r"^https?://", path_or_url):
+                name = urllib.parse.urlparse(path_or_url).path.split("/")[-1]
+                paths += [self.ext_cache / name]
+            else:
+                paths += [self.manager.lite_dir / path_or_url]
+        return paths
+
     @property
     def output_extensions(self):
         """where labextensions will go in the output folder"""
@@ -163,10 +175,9 @@ class FederatedExtensionAddon(BaseAddon):
             actions=[
                 (self.delete_one, [hashfile]),
                 (self.extract_one, [archive, unarchived]),
+                (self.manager.invalidate_tree, [unarchived]),
                 lambda: self.hash_all(
-                    hashfile,
-                    unarchived,
-                    [p for p in unarchived.rglob("*") if not p.is_dir()],
+                    hashfile, unarchived, self.manager.get_tree(unarchived).files
                 ),
             ],
             file_dep=[archive],
@@ -180,10 +191,12 @@ class FederatedExtensionAddon(BaseAddon):
 
     def copy_all_federated_extensions(self, unarchived):
         """actually copy all federated extensions found in a folder."""
-        for simple_pkg_json in unarchived.rglob(f"{SHARE_LABEXTENSIONS}/*/package.json"):
+        tree = self.manager.get_tree(unarchived)
+        for simple_pkg_json in tree.rglob(f"{SHARE_LABEXTENSIONS}/*/package.json"):
             self.copy_one_federated_extension(simple_pkg_json)
-        for org_pkg_json in unarchived.rglob(f"{SHARE_LABEXTENSIONS}/@*/*/package.json"):
+        for org_pkg_json in tree.rglob(f"{SHARE_LABEXTENSIONS}/@*/*/package.json"):
             self.copy_one_federated_extension(org_pkg_json)
+        self.manager.invalidate_tree(self.output_extensions)
 
     def copy_one_federated_extension(self, pkg_json):
         """actually copy one labextension from an extracted archive"""
@@ -225,10 +238,9 @@ class FederatedExtensionAddon(BaseAddon):
             actions=[
                 (self.delete_one, [hashfile]),
                 (self.extract_one, [inner_archive, inner_unarchived]),
+                (self.manager.invalidate_tree, [inner_unarchived]),
                 lambda: self.hash_all(
-                    hashfile,
-                    inner_unarchived,
-                    [p for p in inner_unarchived.rglob("*") if not p.is_dir()],
+                    hashfile, inner_unarchived, self.manager.get_tree(inner_unarchived).files
                 ),
             ],
             file_dep=[inner_archive],
@@ -253,11 +265,10 @@ class FederatedExtensionAddon(BaseAddon):
         lab_extensions_root = manager.output_dir / LAB_EXTENSIONS
         lab_extensions = self.env_extensions(lab_extensions_root)
 
-        yield self.task(
-            name="patch",
-            doc=f"ensure {JUPYTERLITE_JSON} includes the federated_extensions",
+        self.patch_config(
+            jupyterlite_json,
+            self.patch_jupyterlite_json,
             file_dep=[*lab_extensions, jupyterlite_json],
-            actions=[(self.patch_jupyterlite_json, [jupyterlite_json])],
         )
 
         stems = [p.parent.relative_to(lab_extensions_root) for p in lab_extensions]
@@ -307,6 +318,7 @@ class FederatedExtensionAddon(BaseAddon):
             setting for p in lab_extensions for setting in self.get_federated_settings(p.parent)
         ]
         all_federated_json.write_text(json.dumps(all_federated_settings), **UTF8)
+        self.timestamp_written(all_federated_json)
 
     def get_federated_settings(self, extension):
         """get the settings for a federated extension"""
@@ -335,7 +347,7 @@ class FederatedExtensionAddon(BaseAddon):
 
         return all_settings
 
-    def patch_jupyterlite_json(self, jupyterlite_json):
+    def patch_jupyterlite_json(self, config):
         """add the federated_extensions to jupyter-lite.json
 
         .. todo::
@@ -343,8 +355,6 @@ class FederatedExtensionAddon(BaseAddon):
             it _really_ doesn't like duplicate ids, probably need to catch it
             earlier... not possible with "pure" schema (but perhaps SHACL?)
         """
-        config = json.loads(jupyterlite_json.read_text(**UTF8))
-
         extensions = config[JUPYTER_CONFIG_DATA].get(FEDERATED_EXTENSIONS, [])
         lab_extensions_root = self.manager.output_dir / LAB_EXTENSIONS
 
@@ -357,6 +367,4 @@ class FederatedExtensionAddon(BaseAddon):
 
         self.dedupe_federated_extensions(config[JUPYTER_CONFIG_DATA])
 
-        jupyterlite_json.write_text(json.dumps(config, **JSON_FMT), **UTF8)
-
-        self.maybe_timestamp(jupyterlite_json)
+        return config
@@ -49,7 +49,6 @@ class IconsAddon(BaseAddon):
                 doc="copy the favicons",
                 actions=[
                     (self.copy_one, [src_favicons, dest_favicons]),
-                    (self.maybe_timestamp, [dest_favicons]),
                 ],
             )
 
@@ -1,6 +1,6 @@
 """a JupyterLite addon for jupyterlite-specific tasks"""
 
-import re
+import functools
 
 from ..constants import (
     JUPYTERLITE_IPYNB,
@@ -46,6 +46,15 @@ class LiteAddon(BaseAddon):
                 )
                 continue
 
+            # a config patch needs a document to patch: otherwise, write a new one
+            if dest.name == JUPYTERLITE_JSON and dest.exists():
+                self.patch_config(
+                    dest,
+                    functools.partial(self.merge_one_jupyterlite_config, jupyterlite_file),
+                    file_dep=[jupyterlite_file],
+                )
+                continue
+
             yield self.task(
                 name=f"patch:{rel}",
                 file_dep=[jupyterlite_file],
@@ -53,6 +62,7 @@ class LiteAddon(BaseAddon):
                     (self.merge_one_jupyterlite, [dest, [dest, jupyterlite_file]]),
                     (self.maybe_timestamp, [dest]),
                 ],
+                writes=[dest],
             )
 
     def check(self, manager):
@@ -65,10 +75,9 @@ class LiteAddon(BaseAddon):
 
         file_dep += [schema]
 
-        for lite_file in [
-            *manager.output_dir.rglob(JUPYTERLITE_JSON),
-            *manager.output_dir.rglob(JUPYTERLITE_IPYNB),
-        ]:
+        tree = manager.get_tree(manager.output_dir)
+
+        for lite_file in [*tree.rglob(JUPYTERLITE_JSON), *tree.rglob(JUPYTERLITE_IPYNB)]:
             stem = lite_file.relative_to(manager.output_dir)
             selector = (
                 None if lite_file.name == JUPYTERLITE_JSON else ["metadata", JUPYTERLITE_METADATA]
@@ -87,18 +96,5 @@ class LiteAddon(BaseAddon):
     @property
     def lite_files(self):
         """all the source `jupyter-lite.*` files, excluding ignored directories"""
-        lite_dir = self.manager.lite_dir
-        all_lite_files = [
-            *lite_dir.rglob(JUPYTERLITE_JSON),
-            *lite_dir.rglob(JUPYTERLITE_IPYNB),
-        ]
-        return [p for p in all_lite_files if not self._is_ignored_lite_config(p)]
-
-    def _is_ignored_lite_config(self, path):
-        """check if a path should be ignored based on ignore patterns"""
-        rel_posix_path = f"/{path.relative_to(self.manager.lite_dir).as_posix()}"
-        ignore_patterns = [
-            *self.manager.ignore_lite_config,
-            *self.manager.extra_ignore_lite_config,
-        ]
-        return any(re.findall(p, rel_posix_path) for p in ignore_patterns)
+        tree = self.manager.get_tree(self.manager.lite_dir, self.manager.lite_config_ignore)
+        return [*tree.rglob(JUPYTERLITE_JSON), *tree.rglob(JUPYTERLITE_IPYNB)]
@@ -1,15 +1,9 @@
 """a JupyterLite addon for customizing mime types"""
 
-import json
-
-import doit
-
 from ..constants import (
-    JSON_FMT,
     JUPYTER_CONFIG_DATA,
     JUPYTERLITE_JSON,
     SETTINGS_FILE_TYPES,
-    UTF8,
 )
 from .base import BaseAddon
 
@@ -37,33 +31,23 @@ class MimetypesAddon(BaseAddon):
         return file_types
 
     def post_build(self, manager):
-        """Yield ``doit`` tasks to update with file type config."""
+        """Patch ``jupyter-lite.json`` with file type config."""
         jupyterlite_json = manager.output_dir / JUPYTERLITE_JSON
 
-        yield self.task(
-            name="patch",
-            uptodate=[
-                doit.tools.config_changed(
-                    dict(
-                        file_types=self.manager.file_types,
-                        extra_file_types=self.manager.file_types,
-                    )
-                )
-            ],
-            doc=f"ensure {jupyterlite_json} includes the file_types",
+        self.patch_config(
+            jupyterlite_json,
+            self.patch_jupyterlite_json,
             file_dep=[jupyterlite_json],
-            actions=[(self.patch_jupyterlite_json, [jupyterlite_json])],
+            config=dict(
+                file_types=self.manager.file_types,
+                extra_file_types=self.manager.file_types,
+            ),
         )
 
-    def patch_jupyterlite_json(self, jupyterlite_json):
+    def patch_jupyterlite_json(self, config):
         """add the file_types to the base"""
-        config = json.loads(jupyterlite_json.read_text(**UTF8))
-
-        file_types = config[JUPYTER_CONFIG_DATA].get(SETTINGS_FILE_TYPES, {})
+        config_data = config.setdefault(JUPYTER_CONFIG_DATA, {})
+        file_types = config_data.get(SETTINGS_FILE_TYPES, {})
         file_types.update(self.file_types)
-
-        config = json.loads(jupyterlite_json.read_text(**UTF8))
-        config[JUPYTER_CONFIG_DATA][SETTINGS_FILE_TYPES] = file_types
-        jupyterlite_json.write_text(json.dumps(config, **JSON_FMT), **UTF8)
-
-        self.maybe_timestamp(jupyterlite_json)
+        config_data[SETTINGS_FILE_TYPES] = file_types
+        return config
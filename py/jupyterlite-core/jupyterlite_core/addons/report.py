@@ -52,6 +52,6 @@ class ReportAddon(BaseAddon):
     def all_output_files(self):
         return [
             p
-            for p in sorted(self.manager.output_dir.rglob("*"))
-            if not p.is_dir() and p not in [self.sha256sums, self.manager.output_archive]
+            for p in self.manager.get_tree(self.manager.output_dir).files
+            if p not in [self.sha256sums, self.manager.output_archive]
         ]
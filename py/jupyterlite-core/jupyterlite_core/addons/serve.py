@@ -2,23 +2,74 @@
 
 import json
 import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
 
 import doit
-from traitlets import Bool, default
-
-from ..constants import JUPYTER_CONFIG_DATA, JUPYTERLITE_JSON, SETTINGS_FILE_TYPES, UTF8
+from traitlets import Bool, CInt, default
+
+from ..compression import compress_bytes, get_sidecars_json, load_sidecars_json, sidecar_path
+from ..constants import (
+    COMPRESSIBLE_EXTENSIONS,
+    JUPYTER_CONFIG_DATA,
+    JUPYTERLITE_JSON,
+    SETTINGS_FILE_TYPES,
+    UTF8,
+)
+from ..hashing import HashCache, hash_one
 from ..optional import has_optional_dependency
 from .base import BaseAddon
 
 # we _really_ don't want to be in the server-running business, so hardcode, now...
 HOST = "127.0.0.1"
 
+#: the compression level of responses compressed on the fly, favoring speed
+SERVE_LEVELS = {"br": 5, "gzip": 6}
+
 
 class ServeAddon(BaseAddon):
     __all__ = ["status", "serve"]
 
+    aliases = {
+        "serve-compress-cache-size": "ServeAddon.compress_cache_size",
+    }
+
+    flags = {
+        "no-serve-debug": (
+            {"ServeAddon": {"debug": False}},
+            "Serve without tornado's debug mode, and its autoreload",
+        ),
+        "no-serve-compress": (
+            {"ServeAddon": {"compress": False}},
+            "Serve files without negotiating a Content-Encoding",
+        ),
+    }
+
     has_tornado: bool = Bool()
 
+    debug: bool = Bool(
+        True,
+        help=(
+            "Run tornado in debug mode, which reloads the server when its source changes "
+            "and doesn't cache templates, at some cost to throughput"
+        ),
+    ).tag(config=True)
+
+    compress: bool = Bool(
+        True,
+        help=(
+            "Serve compressible files with the best Content-Encoding a client accepts, "
+            "from a .br or .gz sidecar if present, or else compressed on the fly"
+        ),
+    ).tag(config=True)
+
+    compress_cache_size: int = CInt(
+        128 * 1024 * 1024,
+        min=0,
+        help="The total size, in bytes, of responses compressed on the fly to keep in memory",
+    ).tag(config=True)
+
     @default("has_tornado")
     def _default_has_tornado(self):
         return has_optional_dependency("tornado")
@@ -31,6 +82,8 @@ class ServeAddon(BaseAddon):
             f"""    url: {self.url}"""
             "\n"
             f"""    server: {"tornado" if self.has_tornado else "stdlib"}"""
+            "\n"
+            f"""    compress: {", ".join(self.encodings) if self.compress else "off"}"""
         )
 
         print("""    headers:""")
@@ -42,6 +95,23 @@ class ServeAddon(BaseAddon):
     def url(self):
         return f"http://{HOST}:{self.manager.port}{self.manager.base_url}"
 
+    @property
+    def encodings(self):
+        """the content encodings which can be served, in order of preference"""
+        return [e for e in SERVE_LEVELS if e != "br" or has_optional_dependency("brotli")]
+
+    def get_compressed_responses(self):
+        """get a cache of compressed responses, if compression is enabled"""
+        if self.compress:
+            sidecars_json = get_sidecars_json(self.manager.cache_dir, self.manager.output_dir)
+            return CompressedResponses(
+                self.encodings,
+                self.compress_cache_size,
+                sidecars_json=sidecars_json,
+                hash_cache_file=self.get_hash_cache_file(sidecars_json),
+            )
+        return None
+
     def serve(self, manager):
         if self.has_tornado:
             name = "tornado"
@@ -80,12 +150,13 @@ class ServeAddon(BaseAddon):
 
             return mime_map
 
-    def _serve_tornado(self):
+    def _serve_tornado(self):  # noqa: C901
         from tornado import httpserver, ioloop, web
 
         self._patch_mime()
 
         manager = self.manager
+        compressed = self.get_compressed_responses()
 
         def shutdown():
             http_server.stop()
@@ -107,13 +178,61 @@ class ServeAddon(BaseAddon):
                     url_path = url_path + "index.html"
                 return url_path
 
+            def validate_absolute_path(self, root, absolute_path):
+                """serve a sidecar, or a body compressed on the fly, if accepted"""
+                absolute_path = super().validate_absolute_path(root, absolute_path)
+                self.original_path = absolute_path
+                self.content_encoding = self.compressed_body = None
+                if absolute_path is None or compressed is None:
+                    return absolute_path
+
+                accept = self.request.headers.get("Accept-Encoding", "")
+                encoding, sidecar = compressed.negotiate(Path(absolute_path), accept)
+                if sidecar:
+                    self.content_encoding = encoding
+                    return str(sidecar)
+                if encoding and "Range" not in self.request.headers:
+                    self.compressed_body = compressed.get(Path(absolute_path), encoding)
+                    if self.compressed_body is not None:
+                        self.content_encoding = encoding
+                return absolute_path
+
+            def set_extra_headers(self, path):
+                if compressed and compressed.is_compressible(Path(self.original_path)):
+                    self.add_header("Vary", "Accept-Encoding")
+                if self.content_encoding:
+                    self.set_header("Content-Encoding", self.content_encoding)
+
+            def get_content_type(self):
+                if self.content_encoding:
+                    return compressed.get_content_type(Path(self.original_path))
+                return super().get_content_type()
+
+            def get_content_size(self):
+                if self.compressed_body is not None:
+                    return len(self.compressed_body)
+                if self.content_encoding:
+                    return os.stat(self.absolute_path).st_size
+                return super().get_content_size()
+
+            def get_content(self, abspath, start=None, end=None):
+                if self.compressed_body is not None:
+                    return [self.compressed_body[start:end]]
+                return super().get_content(abspath, start, end)
+
+            def compute_etag(self):
+                """an ``ETag`` from the ``stat`` of the file, rather than its hash"""
+                st = os.stat(self.absolute_path)
+                suffix = f"-{self.content_encoding}" if self.compressed_body else ""
+                return f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ctime_ns:x}{suffix}"'
+
         path = str(manager.output_dir)
         app = web.Application(
             [
                 (manager.base_url + "shutdown", ShutdownHandler),
                 (manager.base_url + "(.*)", StaticHandler, {"path": path}),
             ],
-            debug=True,
+            debug=self.debug,
         )
         http_server = httpserver.HTTPServer(app)
         http_server.listen(manager.port)
@@ -123,23 +242,51 @@ class ServeAddon(BaseAddon):
     def _serve_stdlib(self):
         """Serve the site with python's standard library HTTP server."""
 
+        import io
         import socketserver
         from functools import partial
+        from http import HTTPStatus
         from http.server import SimpleHTTPRequestHandler
 
-        HttpRequestHandler = SimpleHTTPRequestHandler  # noqa: N806
-
         mime_map = self._patch_mime()
+        compressed = self.get_compressed_responses()
+        path = str(self.manager.output_dir)
 
-        if mime_map:
-            path = str(self.manager.output_dir)
-
-            class HttpRequestHandler(SimpleHTTPRequestHandler):
+        class HttpRequestHandler(SimpleHTTPRequestHandler):
+            if mime_map:
                 extensions_map = {
                     "": "application/octet-stream",
                     **mime_map,
                 }
 
+            def send_head(self):
+                """send a sidecar, or a body compressed on the fly, if accepted"""
+                file_path = Path(self.translate_path(self.path))
+                self.vary = compressed and compressed.is_compressible(file_path)
+                if not (self.vary and file_path.is_file()) or "Range" in self.headers:
+                    return super().send_head()
+
+                accept = self.headers.get("Accept-Encoding", "")
+                encoding, sidecar = compressed.negotiate(file_path, accept)
+                body = sidecar.read_bytes() if sidecar else None
+                if encoding and not sidecar:
+                    body = compressed.get(file_path, encoding)
+                if body is None:
+                    return super().send_head()
+
+                self.send_response(HTTPStatus.OK)
+                self.send_header("Content-Type", compressed.get_content_type(file_path))
+                self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Last-Modified", self.date_time_string(file_path.stat().st_mtime))
+                self.end_headers()
+                return io.BytesIO(body)
+
+            def end_headers(self):
+                if getattr(self, "vary", False):
+                    self.send_header("Vary", "Accept-Encoding")
+                super().end_headers()
+
         httpd = socketserver.TCPServer(
             (HOST, self.manager.port), partial(HttpRequestHandler, directory=path)
         )
@@ -171,3 +318,146 @@ class ServeAddon(BaseAddon):
             handler()
         except KeyboardInterrupt:
             self.log.warning(f"Stopping {self.url}")
+
+
+class CompressedResponses:
+    """negotiates the ``Content-Encoding`` of responses, keeping compressed bodies
+
+    A ``.br`` or ``.gz`` sidecar, as written by ``CompressAddon``, is preferred to
+    compressing a file on the fly, if it is still fresh. Bodies compressed on the fly
+    are kept in memory, keyed by the ``stat`` of their file, discarding the
+    least-recently used once ``max_size`` bytes are kept.
+    """
+
+    def __init__(self, encodings, max_size, sidecars_json=None, hash_cache_file=None):
+        self.encodings = list(encodings)
+        self.max_size = max_size
+        self.size = 0
+        self.bodies = OrderedDict()
+        self.lock = threading.Lock()
+        self.sidecars_json = sidecars_json
+        self.hash_cache_file = hash_cache_file
+        self._sidecars_stat = None
+        self._sidecars = {}
+        self._hashes = None
+
+    def is_compressible(self, path: Path) -> bool:
+        """whether a file is worth compressing"""
+        return path.suffix in COMPRESSIBLE_EXTENSIONS or self.get_content_type(path).startswith(
+            "text/"
+        )
+
+    def get_content_type(self, path: Path) -> str:
+        """the ``Content-Type`` of a file, regardless of how it is encoded"""
+        import mimetypes
+
+        return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    def negotiate(self, path: Path, accept_encoding: str):
+        """get the best accepted encoding for a file, and its sidecar, if it exists"""
+        if not self.is_compressible(path):
+            return None, None
+
+        accepted = parse_accept_encoding(accept_encoding)
+        ranked = sorted(
+            (e for e in SERVE_LEVELS if accepted.get(e, accepted.get("*", 0)) > 0),
+            key=lambda e: -accepted.get(e, accepted.get("*", 0)),
+        )
+
+        for encoding in ranked:
+            sidecar = sidecar_path(path, encoding)
+            if sidecar.is_file() and self.is_fresh(path, encoding, sidecar):
+                return encoding, sidecar
+
+        for encoding in ranked:
+            if encoding in self.encodings:
+                return encoding, None
+
+        return None, None
+
+    def is_fresh(self, path: Path, encoding: str, sidecar: Path) -> bool:
+        """whether a sidecar was written from the current content of its file
+
+        A sidecar recorded by ``CompressAddon`` is fresh if its file still has the
+        recorded hash, as its ``mtime`` may be the same as a newer file, e.g. when both
+        are clamped to ``--source-date-epoch``. Any other sidecar must be newer.
+        """
+        record = self.get_sidecars().get(os.path.abspath(path))
+        if record is None:
+            return sidecar.stat().st_mtime_ns > path.stat().st_mtime_ns
+        source_hash, _, written = record
+        return bool(written.get(encoding)) and self.get_hash(path) == source_hash
+
+    def get_sidecars(self) -> dict[str, list]:
+        """get the record of written sidecars, by absolute path, reading it if changed"""
+        try:
+            st = os.stat(self.sidecars_json) if self.sidecars_json else None
+        except FileNotFoundError:
+            st = None
+        stat_key = st and (st.st_size, st.st_mtime_ns, st.st_ino)
+
+        with self.lock:
+            if stat_key != self._sidecars_stat:
+                records = load_sidecars_json(self.sidecars_json) if stat_key else {}
+                self._sidecars = {os.path.abspath(k): v for k, v in records.items()}
+                self._sidecars_stat = stat_key
+                self._hashes = None
+            return self._sidecars
+
+    def get_hash(self, path: Path) -> str:
+        """get the hash of a file, reusing any cached by ``CompressAddon``"""
+        with self.lock:
+            if self._hashes is None:
+                self._hashes = HashCache(self.hash_cache_file or Path(os.devnull))
+            hashes = self._hashes
+            cached = hashes.get_many([path]).get(path)
+        if cached is not None:
+            return cached
+
+        digest = hash_one(path)
+        with self.lock:
+            hashes.update({path: digest})
+        return digest
+
+    def get(self, path: Path, encoding: str) -> bytes | None:
+        """get a file compressed with an encoding, or ``None`` if too large to keep"""
+        st = path.stat()
+        if st.st_size > self.max_size:
+            return None
+
+        key = (str(path), st.st_size, st.st_mtime_ns, st.st_ctime_ns, encoding)
+        with self.lock:
+            if key in self.bodies:
+                self.bodies.move_to_end(key)
+                return self.bodies[key]
+
+        body = compress_bytes(path.read_bytes(), encoding, SERVE_LEVELS[encoding])
+
+        with self.lock:
+            if key not in self.bodies:
+                self.bodies[key] = body
+                self.size += len(body)
+            while self.size > self.max_size:
+                _, old_body = self.bodies.popitem(last=False)
+                self.size -= len(old_body)
+
+        return body
+
+
+def parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    """get the quality of each encoding in an ``Accept-Encoding`` header"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        encoding, *params = [p.strip() for p in part.split(";")]
+        if not encoding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[encoding.lower()] = quality
+    return accepted
@@ -1,9 +1,9 @@
 """a JupyterLite addon for supporting extension settings"""
 
+import functools
 import json
 
 from ..constants import (
-    JSON_FMT,
     JUPYTER_CONFIG_DATA,
     JUPYTERLITE_IPYNB,
     JUPYTERLITE_JSON,
@@ -59,17 +59,16 @@ class SettingsAddon(BaseAddon):
             if not overrides_json.exists():
                 continue
 
-            yield self.task(
-                name=f"patch:overrides:{app}",
+            self.patch_config(
+                jupyterlite_json,
+                functools.partial(self.patch_one_overrides, overrides_json),
                 file_dep=[overrides_json, jupyterlite_json],
-                actions=[(self.patch_one_overrides, [jupyterlite_json, overrides_json])],
             )
 
     def check(self, manager):
-        for lite_file in [
-            *manager.output_dir.rglob(JUPYTERLITE_JSON),
-            *manager.output_dir.rglob(JUPYTERLITE_IPYNB),
-        ]:
+        tree = manager.get_tree(manager.output_dir)
+
+        for lite_file in [*tree.rglob(JUPYTERLITE_JSON), *tree.rglob(JUPYTERLITE_IPYNB)]:
             yield from self.check_one_lite_file(lite_file)
 
     def check_one_lite_file(self, lite_file):
@@ -100,15 +99,10 @@ class SettingsAddon(BaseAddon):
                 actions=[(self.validate_one_json_file, [validator, None, defaults])],
             )
 
-    def patch_one_overrides(self, jupyterlite_json, overrides_json):
+    def patch_one_overrides(self, overrides_json, config):
         """update and normalize settingsOverrides"""
-        try:
-            config = json.loads(jupyterlite_json.read_text(**UTF8))
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.log.debug(f"[lite] [settings] Initializing {jupyterlite_json}")
-            config = {JUPYTER_CONFIG_DATA: {}}
-
-        overrides = config[JUPYTER_CONFIG_DATA].get(SETTINGS_OVERRIDES, {})
+        config_data = config.setdefault(JUPYTER_CONFIG_DATA, {})
+        overrides = config_data.get(SETTINGS_OVERRIDES, {})
 
         from_json = json.loads(overrides_json.read_text(**UTF8))
         for k, v in from_json.items():
@@ -117,12 +111,8 @@ class SettingsAddon(BaseAddon):
             else:
                 overrides[k] = v
 
-        config[JUPYTER_CONFIG_DATA][SETTINGS_OVERRIDES] = overrides
-
-        jupyterlite_json.write_text(json.dumps(config, **JSON_FMT), **UTF8)
-
-        self.maybe_timestamp(jupyterlite_json)
-        self.log.debug(f"[lite] [settings] Updated {jupyterlite_json}")
+        config_data[SETTINGS_OVERRIDES] = overrides
+        return config
 
     @property
     def output_extensions(self):
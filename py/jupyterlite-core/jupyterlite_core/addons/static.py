@@ -1,18 +1,21 @@
 """a JupyterLite addon for jupyterlab core"""
 
-import json
-import re
+import os
 import shutil
-import tarfile
-import tempfile
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 import doit
-from traitlets import Instance, default
+from traitlets import Bool, Instance, default
 
-from ..constants import JUPYTERLITE_JSON, UTF8
+from ..app_archive import PACKAGE
+from ..compression import open_tar
+from ..constants import JUPYTERLITE_JSON, MOD_DIRECTORY, MOD_FILE
+from ..hashing import HashCache, hash_many
 from .base import BaseAddon
 
+#: the size of each read while unpacking a member
+COPY_BUFSIZE = 1024 * 1024
+
 
 class StaticAddon(BaseAddon):
     """Copy the core "gold master" artifacts into the output folder"""
@@ -26,6 +29,22 @@ class StaticAddon(BaseAddon):
         ),
     ).tag(config=True)
 
+    reconcile = Bool(
+        False,
+        help=(
+            "If the app archive or its options change, only write changed files to, "
+            "and delete unwanted files from, the `output_dir`, rather than starting over. "
+            "Files which did not come from the app archive are kept"
+        ),
+    ).tag(config=True)
+
+    flags = {
+        "reconcile": (
+            {"StaticAddon": {"reconcile": True}},
+            "Only write the changed files of a changed app archive to the output_dir",
+        ),
+    }
+
     __all__ = ["pre_init", "init", "post_init", "pre_status"]
 
     def pre_status(self, manager):
@@ -50,10 +69,19 @@ class StaticAddon(BaseAddon):
 
     def pre_init(self, manager):
         """well before anything else, we need to ensure that the output_dir exists
-        and is empty (if the baseline tarball has changed)
+        and, unless reconciling, is empty (if the baseline tarball has changed)
         """
         output_dir = manager.output_dir
 
+        if self.reconcile:
+            yield self.task(
+                name="output_dir",
+                doc="ensure the lite directory exists",
+                actions=[(doit.tools.create_folder, [output_dir])],
+                uptodate=[output_dir.is_dir()],
+            )
+            return
+
         yield self.task(
             name="output_dir",
             doc="clean out the lite directory",
@@ -80,6 +108,15 @@ class StaticAddon(BaseAddon):
             doc=f"unpack a 'gold master' JupyterLite from {self.app_archive.name}",
             actions=[(self._unpack_stdlib, [])],
             file_dep=[self.app_archive],
+            uptodate=[
+                doit.tools.config_changed(
+                    dict(
+                        apps=self.manager.apps,
+                        no_sourcemaps=self.manager.no_sourcemaps,
+                        no_unused_shared_packages=self.manager.no_unused_shared_packages,
+                    )
+                )
+            ],
             targets=[manager.output_dir / JUPYTERLITE_JSON],
         )
 
@@ -87,16 +124,12 @@ class StaticAddon(BaseAddon):
         """maybe remove sourcemaps, or all static assets if an app is not installed"""
         output_dir = manager.output_dir
 
-        with tarfile.open(str(self.app_archive), "r:gz") as tar:
-            pkg_data = json.loads(tar.extractfile(tar.getmember("package/package.json")).read())
-
-        all_apps = set(pkg_data["jupyterlite"]["apps"])
+        all_apps, apps_to_remove = self.get_apps_to_remove()
         mgr_apps = set(manager.apps if manager.apps else all_apps)
 
         for not_an_app in mgr_apps - all_apps:
             self.log.warn(f"[static] app '{not_an_app}' is not one of: {all_apps}")
 
-        apps_to_remove = all_apps - mgr_apps
         app_prune_task_dep = []
 
         if apps_to_remove and self.manager.no_unused_shared_packages:
@@ -120,41 +153,201 @@ class StaticAddon(BaseAddon):
     def _default_app_archive(self):
         return self.manager.app_archive
 
+    @property
+    def app_archive_index(self):
+        """the cached metadata of the app archive"""
+        return self.manager.get_app_archive_index(self.app_archive)
+
+    def get_apps_to_remove(self):
+        """get all of the apps in the app archive, and those which are not wanted"""
+        all_apps = set(self.app_archive_index.apps)
+        mgr_apps = set(self.manager.apps if self.manager.apps else all_apps)
+        return all_apps, all_apps - mgr_apps
+
     def _unpack_stdlib(self):
-        """extract the original static assets into the output dir"""
+        """stream the original static assets into the output dir
+
+        Each member is read once, and written straight to its final location,
+        skipping sourcemaps and the files of apps which will be pruned, and
+        clamping timestamps to ``--source-date-epoch``.
+
+        If reconciling, files already in the ``output_dir`` with the same hash as
+        in the archive are kept, and only previously-unpacked files which are no longer
+        wanted are deleted.
+        """
+        output_dir = self.manager.output_dir
+        index = self.app_archive_index
+
+        skip_prefixes = self.get_unpack_skip_prefixes()
+        wanted = {
+            rel: member
+            for rel, member in index.members.items()
+            if not (rel.startswith(skip_prefixes) or self.is_ignored_sourcemap(rel))
+        }
+
+        cache = HashCache(self.get_hash_cache_file(output_dir))
+        to_write, to_delete = set(wanted), set()
+
+        if self.reconcile:
+            to_write = self.get_changed_members(wanted, cache)
+            previous = {Path(p).relative_to(output_dir.resolve()).as_posix() for p in cache.entries}
+            to_delete = {*index.members, *previous} - set(wanted)
+
+        self.log.info(
+            f"[static] unpacking {len(to_write)} of {len(wanted)} files, deleting {len(to_delete)}"
+        )
+
+        dir_mtimes = {output_dir: None}
+
+        for rel in sorted(to_delete):
+            dest = output_dir / rel
+            if dest.is_file():
+                self.delete_one(dest)
+                dir_mtimes.setdefault(dest.parent, None)
+
+        if to_write:
+            self.unpack_members(to_write, dir_mtimes, cache)
+
+        # parents are modified while their children are written, so finish them last
+        for path, mtime in sorted(dir_mtimes.items(), reverse=True):
+            if not path.is_dir():
+                continue
+            path.chmod(MOD_DIRECTORY)
+            if mtime is not None:
+                os.utime(path, (mtime, mtime))
+            elif self.manager.source_date_epoch is not None:
+                self.timestamp_one(path)
+
+        cache.save([(output_dir / rel).resolve() for rel in wanted])
+
+    def get_changed_members(self, wanted, cache):
+        """get the members which are missing, or different, in the ``output_dir``
+
+        Files which match are kept, but their timestamps are still clamped.
+        """
+        output_dir = self.manager.output_dir
+        sde = self.manager.source_date_epoch
+        maybe_same = {}
+
+        for rel, member in wanted.items():
+            dest = output_dir / rel
+            if dest.is_file() and dest.stat().st_size == member["size"]:
+                maybe_same[dest.resolve()] = rel
+
+        hashes = hash_many(maybe_same, workers=self.manager.hash_workers, cache=cache)
+        changed = set(wanted)
+
+        for dest, rel in maybe_same.items():
+            member = wanted[rel]
+            if hashes[dest] != member["sha256"]:
+                continue
+            changed.discard(rel)
+            mtime = member["mtime"] if sde is None else min(member["mtime"], sde)
+            if int(dest.stat().st_mtime) != mtime:
+                os.utime(dest, (mtime, mtime))
+
+        return changed
+
+    def unpack_members(self, to_write, dir_mtimes, cache):
+        """stream the app archive, writing only some of its members"""
         output_dir = self.manager.output_dir
+        sde = self.manager.source_date_epoch
+        written = {}
+        to_write_parents = {str(p) for rel in to_write for p in PurePosixPath(rel).parents}
+
+        with open_tar(self.app_archive, stream=True) as tar:
+            for member in tar:
+                rel = self.get_unpack_relative_path(member)
+                if rel is None:
+                    continue
+
+                dest = output_dir / rel
+                mtime = int(member.mtime if sde is None else min(member.mtime, sde))
+
+                if member.isdir():
+                    if dest.is_dir() or rel in to_write_parents:
+                        dest.mkdir(parents=True, exist_ok=True)
+                        dir_mtimes[dest] = mtime
+                    continue
+
+                if rel not in to_write:
+                    continue
+
+                for parent in dest.relative_to(output_dir).parents:
+                    dir_mtimes.setdefault(output_dir / parent, None)
+
+                self.unpack_one(tar, member, dest, mtime)
+                written[dest.resolve()] = self.app_archive_index.members[rel]["sha256"]
+
+        cache.update(written, fresh=True)
+
+    def get_unpack_skip_prefixes(self):
+        """get the relative paths of app files which will be pruned anyway"""
+        all_apps, apps_to_remove = self.get_apps_to_remove()
+        prefixes = [
+            f"{prefix}{app}/" for app in sorted(apps_to_remove) for prefix in ["", "build/"]
+        ]
+        if self.manager.no_unused_shared_packages:
+            unused = self.get_unused_shared_chunks(all_apps, apps_to_remove)
+            prefixes += [f"build/{chunk_id}.{chunk_hash}." for chunk_id, chunk_hash in unused]
+        return tuple(prefixes)
+
+    def get_unpack_relative_path(self, member):
+        """get the path of a member, relative to the output dir, if it should be unpacked"""
+        parts = PurePosixPath(member.name).parts
+        if not parts or parts[0] != PACKAGE or len(parts) == 1:
+            return None
+        if not (member.isfile() or member.isdir()):
+            self.log.debug(f"[static] skipping unsupported member {member.name}")
+            return None
+        if ".." in parts or PurePosixPath(member.name).is_absolute():
+            msg = f"Attempted Path Traversal in Tar File: {member.name}"
+            raise ValueError(msg)
+        return "/".join(parts[1:])
 
-        with tempfile.TemporaryDirectory() as td:
-            tdp = Path(td)
-            self.extract_one(self.app_archive, tdp)
-            self.copy_one(tdp / "package", output_dir)
+    def unpack_one(self, tar, member, dest, mtime):
+        """write one tar member to its final location"""
+        if dest.is_dir():
+            shutil.rmtree(dest)
+        elif dest.exists():
+            dest.unlink()
+        dest.parent.mkdir(parents=True, exist_ok=True)
 
-        self.maybe_timestamp(output_dir)
+        with tar.extractfile(member) as src, dest.open("wb") as fd:
+            shutil.copyfileobj(src, fd, COPY_BUFSIZE)
+
+        dest.chmod(MOD_FILE)
+        os.utime(dest, (mtime, mtime))
 
     def prune_unused_shared_packages(self, all_apps, apps_to_remove):
         """manually remove unused webpack chunks from shared packages"""
-        chunk_pattern = r'(\d+):"([0-9a-f]+)"'
+        build_dir = self.manager.output_dir / "build"
+
+        for chunk_id, chunk_hash in self.get_unused_shared_chunks(all_apps, apps_to_remove):
+            unused = sorted(build_dir.glob(f"{chunk_id}.{chunk_hash}.*"))
+            if unused:
+                self.log.debug(
+                    f"[static] pruning unused shared package {chunk_id}: {len(unused)} files"
+                )
+                self.delete_one(*unused)
+
+    def get_unused_shared_chunks(self, all_apps, apps_to_remove):
+        """get the ids and hashes of webpack chunks only used by removed apps"""
         used_chunks = {}
         removed_used_chunks = {}
-        build_dir = self.manager.output_dir / "build"
+        all_chunks = self.app_archive_index.chunks
 
         for app in all_apps:
-            bundle = build_dir / app / "bundle.js"
-            if not bundle.exists():  # pragma: no cover
+            if app not in all_chunks:  # pragma: no cover
                 continue
-            bundle_txt = bundle.read_text(**UTF8)
-            chunks = dict(re.findall(chunk_pattern, bundle_txt))
+            chunks = all_chunks[app]
             if app in apps_to_remove:
                 removed_used_chunks.update(chunks)
             else:
                 used_chunks.update(chunks)
 
-        for chunk_id, chunk_hash in sorted(removed_used_chunks.items()):
-            if chunk_id in used_chunks:
-                continue
-            unused = sorted(build_dir.glob(f"{chunk_id}.{chunk_hash}.*"))
-            if unused:
-                self.log.debug(
-                    f"[static] pruning unused shared package {chunk_id}: {len(unused)} files"
-                )
-                self.delete_one(*unused)
+        return [
+            (chunk_id, chunk_hash)
+            for chunk_id, chunk_hash in sorted(removed_used_chunks.items())
+            if chunk_id not in used_chunks
+        ]
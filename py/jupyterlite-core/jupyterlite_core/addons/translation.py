@@ -49,7 +49,6 @@ class TranslationAddon(BaseAddon):
             actions=[
                 (self.delete_one, [self.api_dir]),
                 (self.one_translation_path, [api_path, metadata, packs]),
-                (self.maybe_timestamp, [api_path]),
             ],
         )
 
@@ -70,11 +69,12 @@ class TranslationAddon(BaseAddon):
         # save the metadata about available packs
         api_path.parent.mkdir(parents=True, exist_ok=True)
         api_path.write_text(json.dumps(metadata, **JSON_FMT), **UTF8)
+        self.timestamp_written(api_path)
 
         for locale, data in packs.items():
             language_pack_file = self.get_language_pack_file(locale)
             language_pack_file.write_text(json.dumps(data, **JSON_FMT), **UTF8)
-            self.maybe_timestamp(language_pack_file)
+            self.timestamp_written(language_pack_file)
 
     @property
     def translation_data(self):
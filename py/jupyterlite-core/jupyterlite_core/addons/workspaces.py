@@ -49,11 +49,10 @@ class WorkspacesAddon(BaseAddon):
 
         # Update jupyter-lite.json with the workspaces all.json filename
         jupyterlite_json = self.manager.output_dir / JUPYTERLITE_JSON
-        yield self.task(
-            name="patch:workspacesAllJsonFile",
-            doc="update jupyter-lite.json with workspacesAllJsonFile",
+        self.patch_config(
+            jupyterlite_json,
+            self.patch_workspaces_config,
             file_dep=[self.output_workspaces_json, jupyterlite_json],
-            actions=[(self.patch_workspaces_config, [jupyterlite_json])],
         )
 
     def check(self, manager):
@@ -84,24 +83,11 @@ class WorkspacesAddon(BaseAddon):
             **UTF8,
         )
 
-    def patch_workspaces_config(self, jupyterlite_json):
+    def patch_workspaces_config(self, config):
         """Update jupyter-lite.json with the workspaces all.json filename."""
-        try:
-            config = json.loads(jupyterlite_json.read_text(**UTF8))
-        except (FileNotFoundError, json.JSONDecodeError):
-            config = {JUPYTER_CONFIG_DATA: {}}
-
-        if JUPYTER_CONFIG_DATA not in config:
-            config[JUPYTER_CONFIG_DATA] = {}
-
         # Set the filename for workspaces all.json
-        config[JUPYTER_CONFIG_DATA][WORKSPACES_ALL_JSON_FILE] = ALL_JSON
-
-        jupyterlite_json.write_text(json.dumps(config, **JSON_FMT), **UTF8)
-        self.maybe_timestamp(jupyterlite_json)
-        self.log.debug(
-            f"[lite] [workspaces] Updated {jupyterlite_json} with {WORKSPACES_ALL_JSON_FILE}"
-        )
+        config.setdefault(JUPYTER_CONFIG_DATA, {})[WORKSPACES_ALL_JSON_FILE] = ALL_JSON
+        return config
 
     def validate_workspaces_json(self):
         """Ensure /api/workspaces/all.json is well-formatted"""
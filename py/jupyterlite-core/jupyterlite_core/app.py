@@ -36,6 +36,10 @@ lite_flags = {
         {"LiteBuildConfig": {"no_libarchive": True}},
         "Do not try to use libarchive-c for archive operations",
     ),
+    "no-verify-source-date-epoch": (
+        {"LiteBuildConfig": {"no_verify_source_date_epoch": True}},
+        "Do not check every timestamp in the output_dir after a reproducible build",
+    ),
 }
 
 lite_aliases = dict(
@@ -58,6 +62,14 @@ lite_aliases = dict(
         "output-dir": "LiteBuildConfig.output_dir",
         "output-archive": "LiteBuildConfig.output_archive",
         "source-date-epoch": "LiteBuildConfig.source_date_epoch",
+        "hash-workers": "LiteBuildConfig.hash_workers",
+        "copy-strategy": "LiteBuildConfig.copy_strategy",
+        "file-dep-checker": "LiteBuildConfig.file_dep_checker",
+        "jobs": "LiteBuildConfig.jobs",
+        "jobs-backend": "LiteBuildConfig.jobs_backend",
+        "trace": "LiteBuildConfig.trace_file",
+        "profile-dir": "LiteBuildConfig.profile_dir",
+        "profilers": "LiteBuildConfig.profilers",
         # server-specific things
         "port": "LiteBuildConfig.port",
         "base-url": "LiteBuildConfig.base_url",
@@ -161,7 +173,7 @@ class ManagedApp(BaseLiteApp):
     lite_manager = Instance(LiteManager)
 
     @default("lite_manager")
-    def _default_manager(self):  # noqa: C901, PLR0912
+    def _default_manager(self):  # noqa: C901, PLR0912, PLR0915
         kwargs = dict(
             parent=self,
         )
@@ -202,6 +214,24 @@ class ManagedApp(BaseLiteApp):
             kwargs["disable_addons"] = self.disable_addons
         if self.source_date_epoch is not None:
             kwargs["source_date_epoch"] = self.source_date_epoch
+        if self.no_verify_source_date_epoch:
+            kwargs["no_verify_source_date_epoch"] = self.no_verify_source_date_epoch
+        if self.hash_workers is not None:
+            kwargs["hash_workers"] = self.hash_workers
+        if self.copy_strategy is not None:
+            kwargs["copy_strategy"] = self.copy_strategy
+        if self.file_dep_checker is not None:
+            kwargs["file_dep_checker"] = self.file_dep_checker
+        if self.jobs is not None:
+            kwargs["jobs"] = self.jobs
+        if self.jobs_backend is not None:
+            kwargs["jobs_backend"] = self.jobs_backend
+        if self.trace_file is not None:
+            kwargs["trace_file"] = self.trace_file
+        if self.profile_dir is not None:
+            kwargs["profile_dir"] = self.profile_dir
+        if self.profilers:
+            kwargs["profilers"] = self.profilers
         if self.port is not None:
             kwargs["port"] = self.port
         if self.base_url is not None:
@@ -256,9 +286,10 @@ class LiteListApp(LiteDoitApp):
 class LiteTaskApp(LiteDoitApp):
     """run a doit task, optionally with --force"""
 
-    force = Bool(False, help="forget previous runs of task and re-run from the beginning").tag(
-        config=True
-    )
+    force = Bool(
+        False,
+        help="forget previous runs of task and re-run from the beginning, even if nothing changed",
+    ).tag(config=True)
 
     @property
     def flags(self):
@@ -272,15 +303,34 @@ class LiteTaskApp(LiteDoitApp):
 
     _doit_task = None
 
+    #: whether to skip the task if nothing has changed since it last succeeded
+    _fingerprinted = False
+
     @property
     def _doit_cmd(self):
         return [f"{phase}{self._doit_task}" for phase in PHASES]
 
     def start(self):
-        super().start()
+        manager = self.lite_manager
+        manager.initialize()
+        task = self._doit_task
+
         if self.force:
             for phase in PHASES:
-                self.lite_manager.doit_run("forget", f"{phase}{self._doit_task}")
+                manager.doit_run("forget", f"{phase}{task}", trace=False, profile_dir=False)
+        elif self._fingerprinted and manager.is_fingerprint_current(task):
+            self.log.info(f"[lite] [{task}] nothing changed, skipping; use --force to re-run")
+            self.exit(0)
+
+        if self._fingerprinted:
+            manager.forget_fingerprint(task)
+
+        rc = manager.doit_run(*self._doit_cmd)
+
+        if self._fingerprinted and not rc:
+            manager.save_fingerprint(task)
+
+        self.exit(rc)
 
 
 # the tasks
@@ -301,6 +351,8 @@ class LiteBuildApp(LiteTaskApp):
 
     _doit_task = "build"
 
+    _fingerprinted = True
+
 
 class LiteCheckApp(LiteTaskApp):
     """verify a JupyterLite site, using available schema and rules"""
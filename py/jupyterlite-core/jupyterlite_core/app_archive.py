@@ -0,0 +1,154 @@
+"""a cached index of the metadata of an npm-style app archive"""
+
+import hashlib
+import json
+import os
+import re
+from pathlib import Path, PurePosixPath
+
+from .compression import open_tar
+from .constants import UTF8
+from .hashing import HASH_ALGORITHM, HashCache, hash_many
+
+#: the version of the on-disk app archive index format
+APP_ARCHIVE_INDEX_VERSION = 1
+
+#: the prefix of all members of an npm-style tarball
+PACKAGE = "package"
+
+#: the webpack chunk ids and hashes referenced by an app's ``bundle.js``
+CHUNK_PATTERN = r'(\d+):"([0-9a-f]+)"'
+
+#: the size of each read while indexing a member
+INDEX_CHUNK_SIZE = 1024 * 1024
+
+
+class AppArchiveIndex:
+    """the metadata of an app archive, read once, and cached in the ``cache_dir``
+
+    As a compressed tarball has no index of its own, finding any one member may
+    mean decompressing everything before it. Instead, the archive is read once,
+    and the result is cached, keyed by the hash, size and ``mtime`` of the archive:
+
+    - ``apps``: the apps listed in ``package/package.json``
+    - ``members``: the size, ``mtime`` and hash of each file, by its path relative
+      to ``package/``
+    - ``chunks``: the webpack chunk ids and hashes used by each app's ``bundle.js``
+    """
+
+    def __init__(self, archive: Path, cache_dir: Path, log=None):
+        self.archive = archive
+        self.cache_dir = cache_dir
+        self.log = log
+        self._data = None
+        self._dirty = False
+        self._hash_cache = HashCache(self.cache_dir / "hashes" / "app-archives.json")
+
+    @property
+    def apps(self) -> list[str]:
+        return self.data["apps"]
+
+    @property
+    def members(self) -> dict[str, dict]:
+        return self.data["members"]
+
+    @property
+    def chunks(self) -> dict[str, dict[str, str]]:
+        return self.data["chunks"]
+
+    @property
+    def data(self) -> dict:
+        """the index, loaded from the cache, or read from the archive once"""
+        if self._data is None:
+            self._data = self.load()
+        return self._data
+
+    @property
+    def cache_file(self) -> Path:
+        return self.cache_dir / "app-archive" / f"{self.data['sha256']}.json"
+
+    def load(self) -> dict:
+        """load the cached index, or read the archive if missing or out-of-date
+
+        If the archive had to be hashed or read again, use ``save`` to update the cache.
+        """
+        stat = self.archive.stat()
+        old_entry = self._hash_cache.entries.get(self._hash_cache.key(self.archive))
+        sha256 = hash_many([self.archive], cache=self._hash_cache)[self.archive]
+        if self._hash_cache.entries.get(self._hash_cache.key(self.archive)) != old_entry:
+            self._dirty = True
+        cache_file = self.cache_dir / "app-archive" / f"{sha256}.json"
+        key = dict(
+            version=APP_ARCHIVE_INDEX_VERSION,
+            sha256=sha256,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+        )
+
+        try:
+            data = json.loads(cache_file.read_text(**UTF8))
+            if all(data.get(k) == v for k, v in key.items()):
+                return data
+        except (OSError, ValueError):
+            pass
+
+        self._log(f"[lite] [archive] indexing {self.archive.name}...")
+        self._dirty = True
+        return {**key, **self.read_archive()}
+
+    def save(self):
+        """write the index, and the hash of the archive, if not already cached"""
+        data = self.data
+        if not self._dirty:
+            return
+        cache_file = self.cache_file
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(data, sort_keys=True), **UTF8)
+        tmp_file.replace(cache_file)
+        self._hash_cache.save()
+        self._dirty = False
+
+    def read_archive(self) -> dict:
+        """read all of the metadata in a single pass over the archive"""
+        members = {}
+        pkg_json = None
+        bundles = {}
+
+        with open_tar(self.archive, stream=True) as tar:
+            for member in tar:
+                parts = PurePosixPath(member.name).parts
+                if not member.isfile() or len(parts) < 2 or parts[0] != PACKAGE:  # noqa: PLR2004
+                    continue
+                rel = "/".join(parts[1:])
+                digest = hashlib.new(HASH_ALGORITHM)
+                keep = rel == "package.json" or (
+                    len(parts) == 4 and parts[1] == "build" and parts[3] == "bundle.js"  # noqa: PLR2004
+                )
+                content = []
+                with tar.extractfile(member) as fd:
+                    for chunk in iter(lambda: fd.read(INDEX_CHUNK_SIZE), b""):
+                        digest.update(chunk)
+                        if keep:
+                            content += [chunk]
+                members[rel] = dict(
+                    size=member.size, mtime=int(member.mtime), sha256=digest.hexdigest()
+                )
+                if rel == "package.json":
+                    pkg_json = json.loads(b"".join(content))
+                elif keep:
+                    bundles[parts[2]] = b"".join(content).decode(**UTF8)
+
+        if pkg_json is None:
+            msg = f"{self.archive} does not contain {PACKAGE}/package.json"
+            raise ValueError(msg)
+
+        return dict(
+            apps=pkg_json["jupyterlite"]["apps"],
+            members=members,
+            chunks={app: dict(re.findall(CHUNK_PATTERN, txt)) for app, txt in bundles.items()},
+        )
+
+    def _log(self, msg):
+        if self.log:
+            self.log.info(msg)
@@ -0,0 +1,94 @@
+"""checkers of whether the ``file_dep`` of a task have changed since it last ran"""
+
+import os
+from pathlib import Path
+
+from doit.dependency import FileChangedChecker
+
+from .hashing import get_fast_hash_algorithm, hash_one
+
+#: the ``doit`` default: compare the ``mtime``, then size, then ``md5`` of a file
+MD5 = "md5"
+
+#: only compare the size and ``mtime`` of a file, never reading it
+TIMESTAMP = "timestamp"
+
+#: compare the size, then a fast hash of a file, unless its inode and ``mtime`` are the same
+HASH = "hash"
+
+#: the known file dependency checkers
+FILE_DEP_CHECKERS = (MD5, TIMESTAMP, HASH)
+
+
+class TimestampSizeChecker(FileChangedChecker):
+    """a file has changed if its size or ``mtime_ns`` have changed"""
+
+    def check_modified(self, file_path, file_stat, state):
+        return list_state(state) != [file_stat.st_size, file_stat.st_mtime_ns]
+
+    def get_state(self, dep, current_state):
+        st = os.stat(dep)
+        state = [st.st_size, st.st_mtime_ns]
+        return None if list_state(current_state) == state else state
+
+
+class HashChecker(FileChangedChecker):
+    """a file has changed if its size, or its fast hash, have changed
+
+    A file is only read if its inode or ``mtime_ns`` have changed, e.g. after a fresh
+    checkout, or a copy. Hashes are kept, by path, inode, size and ``mtime_ns``, for
+    the whole process, so a file which is a ``file_dep`` of many tasks is read once.
+    """
+
+    #: the length of a state: the algorithm, size, ``mtime_ns``, inode and hash
+    STATE_LENGTH = 5
+
+    _digests: dict[tuple, str] = {}
+
+    def __init__(self):
+        self.algorithm = get_fast_hash_algorithm()
+
+    def check_modified(self, file_path, file_stat, state):
+        state = list_state(state)
+        if not state or len(state) != self.STATE_LENGTH or state[0] != self.algorithm:
+            return True
+        _, size, mtime_ns, ino, digest = state
+        if file_stat.st_size != size:
+            return True
+        if [file_stat.st_mtime_ns, file_stat.st_ino] == [mtime_ns, ino]:
+            return False
+        return self.digest(file_path, file_stat) != digest
+
+    def get_state(self, dep, current_state):
+        st = os.stat(dep)
+        stat_state = [self.algorithm, st.st_size, st.st_mtime_ns, st.st_ino]
+        current_state = list_state(current_state)
+        if current_state and current_state[:-1] == stat_state:
+            return None
+        return [*stat_state, self.digest(dep, st)]
+
+    def digest(self, file_path, file_stat):
+        """get the (cached) hash of a file, as it was when it was ``stat``-ed"""
+        key = (
+            os.path.abspath(file_path),
+            file_stat.st_ino,
+            file_stat.st_size,
+            file_stat.st_mtime_ns,
+        )
+        if key not in self._digests:
+            self._digests[key] = hash_one(Path(file_path), self.algorithm)
+        return self._digests[key]
+
+
+def list_state(state):
+    """normalize a state loaded from a ``doit`` database, where tuples become lists"""
+    return list(state) if isinstance(state, list | tuple) else state
+
+
+def get_file_dep_checker(name: str):
+    """get the ``check_file_uptodate`` value for ``doit`` for a checker name"""
+    if name == TIMESTAMP:
+        return TimestampSizeChecker
+    if name == HASH:
+        return HashChecker
+    return name
@@ -0,0 +1,241 @@
+"""utilities for compressing large streams"""
+
+import contextlib
+import gzip
+import json
+import os
+import shutil
+import struct
+import tarfile
+import tempfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from pathlib import Path
+
+from .constants import COMPRESSED_SIDECARS, EXTENSION_TAR_ZST, UTF8
+
+#: the uncompressed size of each block compressed by a worker
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+#: the size of the deflate window, used to prime each block with the end of the last
+GZIP_DICT_SIZE = 32 * 1024
+
+#: the default gzip compression level, as used by the ``gzip`` module
+GZIP_LEVEL = 9
+
+#: the default zstandard compression level, as used by the ``zstd`` CLI
+ZSTD_LEVEL = 3
+
+#: the default brotli quality, as used by the ``brotli`` CLI
+BROTLI_QUALITY = 11
+
+#: the version of the on-disk record of written sidecars
+SIDECARS_VERSION = 1
+
+
+def compress_one_block(data: bytes, zdict: bytes, level: int, last: bool) -> bytes:
+    """compress one block as raw deflate, ending on a byte boundary unless ``last``"""
+    args = [level, zlib.DEFLATED, -zlib.MAX_WBITS, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY]
+    compressor = zlib.compressobj(*args, zdict) if zdict else zlib.compressobj(*args)
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelGzipWriter:
+    """a write-only gzip stream which compresses blocks on a pool of threads
+
+    Like ``pigz``, each block is primed with the end of the previous block and
+    flushed to a byte boundary, so that the blocks join into a single gzip member.
+    The output only depends on the data, ``compresslevel`` and ``block_size``, and
+    not on the number of ``workers``.
+    """
+
+    def __init__(
+        self,
+        fileobj,
+        compresslevel: int = GZIP_LEVEL,
+        workers: int | None = None,
+        block_size: int = GZIP_BLOCK_SIZE,
+        mtime: int = 0,
+    ):
+        self.fileobj = fileobj
+        self.compresslevel = compresslevel
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._zdict = b""
+        self._crc = 0
+        self._size = 0
+        self._closed = False
+        self._write_header(mtime)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        """the uncompressed position, as needed by ``tarfile``"""
+        return self._size
+
+    def write(self, data) -> int:
+        """buffer some data, compressing any complete blocks"""
+        self._buffer += data
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[: self.block_size])
+            del self._buffer[: self.block_size]
+            self._submit(block, last=False)
+
+        return len(data)
+
+    def close(self):
+        """compress the final block, and write the gzip trailer"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._submit(bytes(self._buffer), last=True)
+            self._drain(0)
+            self.fileobj.write(struct.pack("<LL", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self._pool.shutdown()
+
+    def _write_header(self, mtime: int):
+        """write a gzip header, as the ``gzip`` module would without a filename"""
+        if self.compresslevel == zlib.Z_BEST_COMPRESSION:
+            xfl = b"\002"
+        elif self.compresslevel == zlib.Z_BEST_SPEED:
+            xfl = b"\004"
+        else:
+            xfl = b"\000"
+        self.fileobj.write(b"\037\213\010\000" + struct.pack("<L", mtime) + xfl + b"\377")
+
+    def _submit(self, block: bytes, last: bool):
+        """queue one block for compression, bounding the number of pending blocks"""
+        future = self._pool.submit(compress_one_block, block, self._zdict, self.compresslevel, last)
+        self._pending.append(future)
+        self._zdict = block[-GZIP_DICT_SIZE:]
+        self._drain(self.workers * 2)
+
+    def _drain(self, max_pending: int):
+        """write compressed blocks, in order, until few enough are pending"""
+        while len(self._pending) > max_pending:
+            self.fileobj.write(self._pending.popleft().result())
+
+
+@contextlib.contextmanager
+def zstd_writer(fileobj, level: int = ZSTD_LEVEL, workers: int | None = None):
+    """yield a write-only zstandard stream, compressed on a pool of threads
+
+    With at least one worker, the output does not depend on the number of workers.
+    """
+    import zstandard
+
+    threads = workers or os.cpu_count() or 1
+    compressor = zstandard.ZstdCompressor(level=level, threads=threads)
+    with compressor.stream_writer(fileobj, closefd=False, write_return_read=True) as writer:
+        yield writer
+
+
+@contextlib.contextmanager
+def open_tar(path: Path, stream: bool = False):
+    """open a (maybe compressed) tar archive for reading
+
+    If ``stream``, members may only be read in order, but the archive is only read
+    once. Otherwise, zstandard-compressed archives are decompressed to a temporary file.
+    """
+    if not path.name.endswith(EXTENSION_TAR_ZST):
+        with tarfile.open(path, "r|*" if stream else "r:*") as tar:
+            yield tar
+        return
+
+    import zstandard
+
+    with path.open("rb") as fd, zstandard.ZstdDecompressor().stream_reader(fd) as reader:
+        if stream:
+            with tarfile.open(fileobj=reader, mode="r|") as tar:
+                yield tar
+            return
+
+        with tempfile.TemporaryFile() as tmp:
+            shutil.copyfileobj(reader, tmp, GZIP_BLOCK_SIZE)
+            tmp.seek(0)
+            with tarfile.open(fileobj=tmp, mode="r:") as tar:
+                yield tar
+
+
+def compress_bytes(data: bytes, encoding: str, level: int) -> bytes:
+    """compress some data for an HTTP ``Content-Encoding``, reproducibly"""
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        import brotli
+
+        return brotli.compress(data, quality=level)
+    msg = f"Unknown content encoding: {encoding}"
+    raise ValueError(msg)
+
+
+def sidecar_path(path: Path, encoding: str) -> Path:
+    """get the path of the pre-compressed copy of a file, for an encoding"""
+    return path.with_name(f"{path.name}{COMPRESSED_SIDECARS[encoding]}")
+
+
+def get_sidecars_json(cache_dir: Path, output_dir: Path) -> Path:
+    """get the path of the record of the sidecars written in an ``output_dir``"""
+    key = sha256(str(Path(output_dir).resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(cache_dir) / "sidecars" / f"{key}.json"
+
+
+def load_sidecars_json(sidecars_json: Path) -> dict[str, list]:
+    """read the source hash, levels and written encodings of each file with sidecars
+
+    A missing, malformed, or out-of-date record is empty.
+    """
+    try:
+        data = json.loads(Path(sidecars_json).read_text(**UTF8))
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {}) if data.get("version") == SIDECARS_VERSION else {}
+
+
+def write_sidecars(
+    path: Path, levels: dict[str, int], source_date_epoch: int | None = None
+) -> dict[str, bool]:
+    """write a pre-compressed copy of a file next to it, for each encoding and level
+
+    A copy which is not smaller than the file is not written, and any older copy is
+    removed. Each copy has the same ``mtime`` as the file, clamped to
+    ``source_date_epoch``. Returns whether each copy was written.
+    """
+    data = path.read_bytes()
+    mtime_ns = path.stat().st_mtime_ns
+    if source_date_epoch is not None:
+        mtime_ns = min(mtime_ns, source_date_epoch * 1_000_000_000)
+    written = {}
+
+    for encoding, level in levels.items():
+        sidecar = sidecar_path(path, encoding)
+        compressed = compress_bytes(data, encoding, level)
+        written[encoding] = len(compressed) < len(data)
+        if not written[encoding]:
+            sidecar.unlink(missing_ok=True)
+            continue
+        tmp_file = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+        tmp_file.write_bytes(compressed)
+        os.utime(tmp_file, ns=(mtime_ns, mtime_ns))
+        tmp_file.replace(sidecar)
+
+    return written
@@ -9,10 +9,13 @@
 import os
 from pathlib import Path
 
-from traitlets import Bool, CInt, Dict, Tuple, Unicode, Union, default
+from traitlets import Bool, CInt, Dict, Enum, Tuple, Unicode, Union, default
 from traitlets.config import LoggingConfigurable
 
 from . import constants as C  # noqa: N812
+from .checkers import FILE_DEP_CHECKERS, MD5
+from .copying import AUTO, COPY_STRATEGIES
+from .profiling import PROFILERS
 from .trait_types import CPath, TypedTuple
 
 
@@ -123,12 +126,86 @@ class LiteBuildConfig(LoggingConfigurable):
         )
     ).tag(config=True)
 
+    copy_strategy: str = Enum(
+        COPY_STRATEGIES,
+        default_value=AUTO,
+        help=(
+            "How to copy files into the output_dir: `copy` their data; `hardlink` to them, "
+            "sharing later changes; `reflink` to clone them on e.g. btrfs or xfs; "
+            "or `auto` to clone if possible, otherwise copy"
+        ),
+    ).tag(config=True)
+
+    file_dep_checker: str = Enum(
+        FILE_DEP_CHECKERS,
+        default_value=MD5,
+        help=(
+            "How to check whether the files a task depends on have changed: by `md5`, "
+            "if their timestamp changed; by `timestamp` and size only, never reading "
+            "them; or by a fast `hash`, only if their inode, timestamp or size changed"
+        ),
+    ).tag(config=True)
+
+    hash_workers: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help="The number of threads used to hash files. Defaults to the number of CPUs",
+    ).tag(config=True)
+
+    jobs: int | None = CInt(
+        None,
+        allow_none=True,
+        min=1,
+        help="The number of tasks to run at once. Defaults to running tasks one at a time",
+    ).tag(config=True)
+
+    jobs_backend: str = Enum(
+        ["thread", "process"],
+        default_value="thread",
+        help=(
+            "How to run tasks at once, with more than one of `jobs`: as `thread`s, "
+            "or as `process`es, which requires `cloudpickle`"
+        ),
+    ).tag(config=True)
+
     source_date_epoch: int | None = CInt(
         allow_none=True,
         min=1,
         help="Trigger reproducible builds, clamping timestamps to this value",
     ).tag(config=True)
 
+    no_verify_source_date_epoch: bool = Bool(
+        False,
+        help=(
+            "Skip the final pass over the output_dir which clamps any timestamps newer "
+            "than source_date_epoch missed while writing files"
+        ),
+    ).tag(config=True)
+
+    trace_file: Path | None = CPath(
+        None,
+        allow_none=True,
+        help=(
+            "Write a timeline of the tasks run, as Chrome Trace Event JSON, "
+            "for chrome://tracing or https://ui.perfetto.dev"
+        ),
+    ).tag(config=True)
+
+    profile_dir: Path | None = CPath(
+        None,
+        allow_none=True,
+        help=(
+            "Write a pstats file of each addon, and the peak memory of each addon and "
+            "task, to this folder. Tasks are profiled one at a time, even with many jobs"
+        ),
+    ).tag(config=True)
+
+    profilers: tuple[str] = TypedTuple(
+        Enum(PROFILERS),
+        help="The profilers to use with a profile_dir: `cprofile` and/or `tracemalloc`",
+    ).tag(config=True)
+
     http_headers: dict = Dict(help="the HTTP headers to add to all served responses").tag(
         config=True
     )
@@ -279,6 +356,10 @@ class LiteBuildConfig(LoggingConfigurable):
         sde = int(os.environ[C.SOURCE_DATE_EPOCH])
         return sde
 
+    @default("profilers")
+    def _default_profilers(self):
+        return tuple(PROFILERS)
+
     @default("port")
     def _default_port(self):
         return int(os.environ.get("JUPYTERLITE_PORT", "8000"))
@@ -0,0 +1,51 @@
+"""a pipeline of patches to a ``jupyter-lite.json``, applied with one read and write"""
+
+import json
+import os
+from collections.abc import Callable
+from pathlib import Path
+
+from .constants import JSON_FMT, UTF8
+
+#: a function which takes a parsed config document, and returns the patched document
+ConfigPatch = Callable[[dict], dict]
+
+
+class ConfigPatcher:
+    """the patches registered by addons for one config file, during one phase
+
+    Rather than each addon reading, patching and writing the same file in its own
+    task, each registers a pure function of the whole document. These are applied
+    in the order they were registered, after reading the file once, and the result
+    is written once.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.patches: list[tuple[str, ConfigPatch]] = []
+        self.file_dep: list[Path] = []
+        self.config: dict = {}
+
+    def add(self, name: str, patch: ConfigPatch, file_dep=None, config=None):
+        """register a named patch, with any files and config it depends on"""
+        self.patches += [(name, patch)]
+        self.file_dep += [Path(p) for p in file_dep or [] if Path(p) not in self.file_dep]
+        if config is not None:
+            self.config[f"{len(self.patches)}:{name}"] = config
+
+    def apply(self, source_date_epoch: int | None = None, log=None):
+        """read the file, apply all of the patches in order, and write it
+
+        A missing or malformed file is an error, rather than losing its settings.
+        """
+        config = json.loads(self.path.read_text(**UTF8))
+
+        for name, patch in self.patches:
+            if log:
+                log.debug(f"[lite] [config] [{name}] patching {self.path}")
+            config = patch(config)
+
+        self.path.write_text(json.dumps(config, **JSON_FMT), **UTF8)
+
+        if source_date_epoch is not None and self.path.stat().st_mtime > source_date_epoch:
+            os.utime(self.path, (source_date_epoch, source_date_epoch))
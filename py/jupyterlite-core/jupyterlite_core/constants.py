@@ -65,6 +65,9 @@ SETTINGS_FILE_TYPES = "fileTypes"
 #: configuration key for the contents all.json filename
 CONTENTS_ALL_JSON_FILE = "contentsAllJsonFile"
 
+#: configuration key for the contents manifest filename
+CONTENTS_MANIFEST_FILE = "contentsManifestFile"
+
 #: configuration key for the workspaces all.json filename
 WORKSPACES_ALL_JSON_FILE = "workspacesAllJsonFile"
 
@@ -76,6 +79,9 @@ LITE_PLUGIN_SETTINGS = "litePluginSettings"
 #: our schema
 JUPYTERLITE_SCHEMA = "jupyterlite.schema.v0.json"
 
+#: the schema for Contents API responses, shipped with this package
+CONTENTS_SCHEMA = ROOT / "schemas" / "contents.schema.v0.json"
+
 #: our configuration file
 JUPYTERLITE_JSON = "jupyter-lite.json"
 
@@ -91,9 +97,15 @@ DEFAULT_OUTPUT_DIR = "_output"
 ALL_JSON = "all.json"
 ALL_FEDERATED_JSON = "all_federated.json"
 
+#: the flat, sorted list of every file in the Contents API, one JSON object per line
+MANIFEST_NDJSON = "manifest.ndjson"
+
 #: the workspace file extension
 WORKSPACE_FILE = ".jupyterlab-workspace"
 
+#: names hidden from Contents API listings, as in ``jupyter_server``
+DEFAULT_HIDE_GLOBS = ("__pycache__", "*.pyc", "*.pyo", ".DS_Store", "*~")
+
 ### Environment Variables
 
 #: a canonical environment variable for triggering reproducible builds
@@ -102,11 +114,30 @@ SOURCE_DATE_EPOCH = "SOURCE_DATE_EPOCH"
 #: this is arrived at by inspection
 NPM_SOURCE_DATE_EPOCH = 499162500
 
+#: the suffix of a pre-compressed copy of a file, by its HTTP ``Content-Encoding``
+COMPRESSED_SIDECARS = {"gzip": ".gz", "br": ".br"}
+
+#: the extensions of files which are worth pre-compressing, by default
+COMPRESSIBLE_EXTENSIONS = (
+    ".css",
+    ".html",
+    ".ipynb",
+    ".js",
+    ".json",
+    ".map",
+    ".mjs",
+    ".svg",
+    ".wasm",
+)
+
 #: known zip extensions
 EXTENSION_ZIP = (".whl", ".zip", ".conda")
 
-#: known compressed tar extensions
-EXTENSION_TAR = (".tgz", ".tar.bz2", ".tar.gz")
+#: known zstandard-compressed tar extensions
+EXTENSION_TAR_ZST = (".tar.zst", ".tzst")
+
+#: known tar extensions, which may be compressed
+EXTENSION_TAR = (".tgz", ".tar.bz2", ".tar.gz", *EXTENSION_TAR_ZST, ".tar")
 
 ### URLs
 
@@ -0,0 +1,76 @@
+"""utilities for copying files, maybe without duplicating their data"""
+
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+
+#: copy the data of each file
+COPY = "copy"
+
+#: link each file to its source, sharing data, metadata and any later changes
+HARDLINK = "hardlink"
+
+#: clone each file, sharing data until either copy is changed, on e.g. btrfs or xfs
+REFLINK = "reflink"
+
+#: clone each file if possible, otherwise copy it
+AUTO = "auto"
+
+#: the known copy strategies
+COPY_STRATEGIES = (COPY, HARDLINK, REFLINK, AUTO)
+
+#: the linux ``ioctl`` request to clone a whole file, from ``linux/fs.h``
+FICLONE = 0x40049409
+
+#: pairs of source and destination devices which can't clone files, found by ``auto``
+NO_REFLINK_DEVICES: set[tuple[int, int]] = set()
+
+
+def reflink_one(src: Path, dest: Path):
+    """clone the data of ``src`` to ``dest``, raising ``OSError`` if unsupported"""
+    if not sys.platform.startswith("linux"):
+        raise OSError(errno.EOPNOTSUPP, "reflinks are only supported on linux", str(src))
+
+    import fcntl
+
+    with open(src, "rb") as src_fd, open(dest, "wb") as dest_fd:
+        try:
+            fcntl.ioctl(dest_fd.fileno(), FICLONE, src_fd.fileno())
+        except OSError:
+            dest_fd.close()
+            os.unlink(dest)
+            raise
+
+    shutil.copystat(src, dest)
+
+
+def copy_file(src: Path, dest: Path, strategy: str = COPY) -> Path:
+    """copy one file to a new ``dest`` with a strategy, compatible with ``shutil.copy2``
+
+    - ``copy`` always copies the data, as ``shutil.copy2``
+    - ``hardlink`` links to ``src``, falling back to ``copy`` across filesystems
+    - ``reflink`` clones ``src``, and fails if the filesystem doesn't support it
+    - ``auto`` clones ``src`` if possible, otherwise copies it
+    """
+    if strategy == HARDLINK:
+        try:
+            os.link(src, dest)
+            return dest
+        except OSError as err:
+            if err.errno != errno.EXDEV:
+                raise
+    elif strategy == REFLINK:
+        reflink_one(src, dest)
+        return dest
+    elif strategy == AUTO:
+        devices = os.stat(src).st_dev, os.stat(Path(dest).parent).st_dev
+        if devices not in NO_REFLINK_DEVICES:
+            try:
+                reflink_one(src, dest)
+                return dest
+            except OSError:
+                NO_REFLINK_DEVICES.add(devices)
+
+    return shutil.copy2(src, dest)
@@ -0,0 +1,71 @@
+"""a fingerprint of everything which goes into a build, to skip builds that would do nothing"""
+
+import json
+import os
+import stat
+from hashlib import sha256
+from pathlib import Path
+
+from .addons import get_addon_entry_points
+from .tree import TreeSnapshot
+
+#: the version of the on-disk record of a fingerprint
+FINGERPRINT_VERSION = 1
+
+
+def hash_json(data) -> str:
+    """get the hash of some data, as canonical JSON"""
+    return sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def hash_stats(root: Path, tree: TreeSnapshot | None = None) -> str:
+    """get the hash of the names, sizes and ``mtime_ns`` of a file, or everything in a folder
+
+    Only the names of folders are used, as their ``mtime`` changes with their entries.
+    Files are never read.
+    """
+    digest = sha256()
+    try:
+        root_stat = os.stat(root)
+    except FileNotFoundError:
+        return digest.hexdigest()
+
+    if not stat.S_ISDIR(root_stat.st_mode):
+        digest.update(f"{root_stat.st_size}:{root_stat.st_mtime_ns}".encode())
+        return digest.hexdigest()
+
+    tree = tree or TreeSnapshot(root)
+    for path, path_stat in tree.entries.items():
+        rel = path.relative_to(tree.root).as_posix()
+        if stat.S_ISDIR(path_stat.st_mode):
+            digest.update(f"{rel}/\n".encode())
+        else:
+            digest.update(f"{rel}:{path_stat.st_size}:{path_stat.st_mtime_ns}\n".encode())
+
+    return digest.hexdigest()
+
+
+def get_addon_versions() -> dict[str, str]:
+    """get the entry point, and the distribution which provides it, of each addon"""
+    versions = {}
+    for name, entry_point in get_addon_entry_points().items():
+        dist = entry_point.dist
+        dist_version = f"{dist.name}=={dist.version}" if dist else None
+        versions[name] = f"{entry_point.value} {dist_version}"
+    return versions
+
+
+def load_fingerprint(fingerprint_json: Path) -> dict[str, str]:
+    """read the hash of each part of the last successful build, if any"""
+    try:
+        data = json.loads(fingerprint_json.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("parts", {}) if data.get("version") == FINGERPRINT_VERSION else {}
+
+
+def save_fingerprint(fingerprint_json: Path, parts: dict[str, str]):
+    """write the hash of each part of a successful build"""
+    data = dict(version=FINGERPRINT_VERSION, parts=parts)
+    fingerprint_json.parent.mkdir(parents=True, exist_ok=True)
+    fingerprint_json.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
@@ -0,0 +1,165 @@
+"""utilities for hashing many, potentially large, files"""
+
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+from .optional import has_optional_dependency
+
+#: the size of each read while hashing a file, bounding memory use per worker
+HASH_CHUNK_SIZE = 1024 * 1024
+
+#: the default hash algorithm
+HASH_ALGORITHM = "sha256"
+
+#: the version of the on-disk hash cache format
+HASH_CACHE_VERSION = 1
+
+#: a fast, non-cryptographic hash, from the optional ``xxhash`` package
+XXH3_128 = "xxh3_128"
+
+#: a fast hash if ``xxhash`` is missing, as it is often accelerated by the CPU
+FALLBACK_FAST_HASH_ALGORITHM = "sha1"
+
+
+@lru_cache(maxsize=1)
+def get_fast_hash_algorithm() -> str:
+    """get the fastest available algorithm for (non-cryptographic) change detection"""
+    if has_optional_dependency("xxhash"):
+        return XXH3_128
+    return FALLBACK_FAST_HASH_ALGORITHM
+
+
+def new_digest(algorithm: str = HASH_ALGORITHM):
+    """get a new digest for an algorithm from ``hashlib``, or ``xxh3_128``"""
+    if algorithm == XXH3_128:
+        import xxhash
+
+        return xxhash.xxh3_128()
+    return hashlib.new(algorithm)
+
+
+def hash_one(path: Path, algorithm: str = HASH_ALGORITHM, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """get the hex digest of one file, read in fixed-size chunks"""
+    digest = new_digest(algorithm)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+
+    with open(path, "rb", buffering=0) as fd:
+        while True:
+            size = fd.readinto(buffer)
+            if not size:
+                break
+            digest.update(view[:size])
+
+    return digest.hexdigest()
+
+
+def hash_many(
+    paths: Iterable[Path],
+    workers: int | None = None,
+    algorithm: str = HASH_ALGORITHM,
+    cache: "HashCache | None" = None,
+) -> dict[Path, str]:
+    """get the hex digests of many files, spread over a pool of threads
+
+    As ``hashlib`` releases the GIL while hashing, this scales with the
+    number of cores, up to the limits of the disk. If a ``cache`` is given,
+    only files which have changed since they were last hashed are read.
+    """
+    paths = list(dict.fromkeys(paths))
+    hashes = {}
+
+    if cache is not None:
+        hashes.update(cache.get_many(paths))
+
+    to_hash = [path for path in paths if path not in hashes]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(to_hash) <= 1:
+        hashes.update({path: hash_one(path, algorithm) for path in to_hash})
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(to_hash))) as pool:
+            digests = pool.map(hash_one, to_hash, [algorithm] * len(to_hash))
+            hashes.update(zip(to_hash, digests, strict=True))
+
+    if cache is not None:
+        cache.update({path: hashes[path] for path in to_hash})
+
+    return {path: hashes[path] for path in paths}
+
+
+class HashCache:
+    """a persistent cache of file hashes, keyed by path and ``stat`` fields
+
+    An entry is only reused if the size, ``mtime_ns``, ``ctime_ns`` and inode of
+    a file are unchanged: as ``ctime`` can't be set by tools which clamp ``mtime``,
+    such as ``--source-date-epoch``, a rewritten file is always hashed again.
+    """
+
+    def __init__(self, cache_file: Path, algorithm: str = HASH_ALGORITHM):
+        self.cache_file = cache_file
+        self.algorithm = algorithm
+        self.entries: dict[str, list] = {}
+        self.stats: dict[str, list[int]] = {}
+        self.load()
+
+    def load(self):
+        """read the cache file, ignoring it if missing, malformed or out-of-date"""
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+
+        if data.get("version") != HASH_CACHE_VERSION or data.get("algorithm") != self.algorithm:
+            return
+
+        self.entries = data.get("files", {})
+
+    def save(self, paths: Iterable[Path] | None = None):
+        """write the cache file, optionally only keeping entries for ``paths``"""
+        if paths is not None:
+            keys = {self.key(path) for path in paths}
+            self.entries = {k: v for k, v in self.entries.items() if k in keys}
+
+        data = dict(version=HASH_CACHE_VERSION, algorithm=self.algorithm, files=self.entries)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        tmp_file.write_text(json.dumps(data, sort_keys=True), encoding="utf-8")
+        tmp_file.replace(self.cache_file)
+
+    def get_many(self, paths: Iterable[Path]) -> dict[Path, str]:
+        """get the cached hashes of files which have not changed"""
+        hashes = {}
+        for path in paths:
+            key = self.key(path)
+            # keep the stat from before hashing, in case the file changes meanwhile
+            stat_key = self.stats[key] = self.stat_key(path)
+            entry = self.entries.get(key)
+            if entry and entry[:-1] == stat_key:
+                hashes[path] = entry[-1]
+        return hashes
+
+    def update(self, hashes: dict[Path, str], fresh: bool = False):
+        """record fresh hashes of files
+
+        If ``fresh``, e.g. as the files were just written, they are ``stat``-ed now,
+        rather than when they were last looked up.
+        """
+        for path, digest in hashes.items():
+            key = self.key(path)
+            stat_key = self.stats.pop(key, None)
+            if fresh or stat_key is None:
+                stat_key = self.stat_key(path)
+            self.entries[key] = [*stat_key, digest]
+
+    def key(self, path: Path) -> str:
+        return os.path.abspath(path)
+
+    def stat_key(self, path: Path) -> list[int]:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino]
@@ -0,0 +1,52 @@
+"""matching relative paths against many ignore patterns at once"""
+
+import re
+from functools import lru_cache
+
+
+class IgnoreMatcher:
+    """a compiled matcher for many path regular expressions, as a single alternation
+
+    Paths are matched relative to some root, with a leading ``/``, e.g. ``/a/b.txt``.
+    As many patterns match a directory name followed by ``/`` (e.g. ``/node_modules/``),
+    a directory is also ``pruned`` if a pattern matches its path with a trailing ``/``,
+    before anything inside it.
+    """
+
+    def __init__(self, patterns: tuple[str, ...]):
+        self.patterns = tuple(patterns)
+        self._regexes = []
+        if not self.patterns:
+            return
+        try:
+            self._regexes = [re.compile("|".join(f"(?:{p})" for p in self.patterns))]
+        except re.error:
+            # e.g. global flags like ``(?i)`` can only be at the start of a pattern
+            self._regexes = [re.compile(p) for p in self.patterns]
+
+    def search(self, rel_posix_path: str) -> bool:
+        """whether any pattern matches anywhere in a path"""
+        return any(r.search(rel_posix_path) for r in self._regexes)
+
+    def is_ignored(self, rel_posix_path: str, is_dir: bool = False) -> bool:
+        """whether a path, or everything in a directory, should be ignored"""
+        if self.search(rel_posix_path):
+            return True
+        return is_dir and self.is_pruned(rel_posix_path)
+
+    def is_pruned(self, rel_posix_path: str) -> bool:
+        """whether everything in a directory will be ignored, without walking it"""
+        prefix = f"{rel_posix_path.rstrip('/')}/"
+        # the sentinel keeps ``$`` from matching right after the trailing ``/``
+        return any(
+            match.end() <= len(prefix)
+            for regex in self._regexes
+            for match in [regex.search(f"{prefix}\0")]
+            if match
+        )
+
+
+@lru_cache(maxsize=32)
+def get_ignore_matcher(*patterns: str) -> IgnoreMatcher:
+    """get a (cached) matcher for some patterns"""
+    return IgnoreMatcher(patterns)
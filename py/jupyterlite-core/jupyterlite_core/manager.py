@@ -1,13 +1,48 @@
 """Manager for JupyterLite"""
 
+import contextlib
+import functools
+import os
+import threading
+from hashlib import sha256
 from logging import getLogger
+from pathlib import Path
 
 import doit
-from traitlets import Bool, Dict, Unicode, default
+from traitlets import Bool, Dict, Instance, Unicode, default
 
 from .addons import get_addon_implementations
+from .app_archive import AppArchiveIndex
+from .checkers import get_file_dep_checker
 from .config import LiteBuildConfig
+from .config_patch import ConfigPatch, ConfigPatcher
 from .constants import HOOK_PARENTS, HOOKS, PHASES
+from .fingerprint import (
+    get_addon_versions,
+    hash_json,
+    hash_stats,
+    load_fingerprint,
+    save_fingerprint,
+)
+from .hashing import HashCache, hash_many
+from .ignore import IgnoreMatcher, get_ignore_matcher
+from .profiling import Profiler
+from .trace import Tracer
+from .tree import TreeSnapshot
+
+#: guards the snapshots of directories, which tasks may invalidate on many ``jobs``
+TREES_LOCK = threading.RLock()
+
+#: config which changes how a build is observed, but not what it builds
+UNFINGERPRINTED_TRAITS = ["trace_file", "profile_dir", "profilers"]
+
+
+def split_attr(attr: str) -> tuple[str, str]:
+    """split the name of an addon method into its phase and hook, e.g. ``post_``, ``build``"""
+    for phase in PHASES:
+        if phase and attr.startswith(phase):
+            return phase, attr.removeprefix(phase)
+    return "", attr
 
 
 class LiteManager(LiteBuildConfig):
@@ -32,6 +67,11 @@ class LiteManager(LiteBuildConfig):
     _addons = Dict(help="""concrete addons that have named iterable methods of doit tasks""")
     _doit_config = Dict(help="the DOIT_CONFIG for tasks")
     _doit_tasks = Dict(help="the doit task generators")
+    _app_archive_indexes = Dict(help="the indexes of app archives, by path")
+    _trees = Dict(help="snapshots of directories, by path, until invalidated")
+    _config_patchers = Dict(help="the patches to config files in the current phase, by path")
+    _tracer = Instance(Tracer, allow_none=True, help="the spans of the current ``trace_file``")
+    _profiler = Instance(Profiler, allow_none=True, help="the profiles of the current run")
 
     def initialize(self):
         """perform one-time inialization of the manager"""
@@ -42,12 +82,190 @@ class LiteManager(LiteBuildConfig):
         tasks = self._doit_tasks
         self.log.debug(f"[lite] [tasks] ... OK {len(tasks)} tasks")
 
-    def doit_run(self, task, *args, raw=False):
-        """run a subset of the doit command line"""
+    def doit_run(self, task, *args, raw=False, trace=None, profile_dir=None):
+        """run a subset of the doit command line
+
+        If ``trace`` (or ``trace_file``) is given, write a timeline of generating and
+        running the tasks there, as Chrome Trace Event JSON. If ``profile_dir`` is given,
+        write a ``pstats`` file, and the peak memory, of each addon there.
+        """
+        trace = self.trace_file if trace is None else trace
+        profile_dir = self.profile_dir if profile_dir is None else profile_dir
         loader = doit.cmd_base.ModuleTaskLoader(self._doit_tasks)
         config = dict(GLOBAL=self._doit_config)
         runner = doit.doit_cmd.DoitMain(task_loader=loader, extra_config=config)
-        return runner.run([task, *args])
+        self._tracer = Tracer() if trace else None
+        self._profiler = Profiler(self.profilers) if profile_dir else None
+        if self._profiler:
+            self._profiler.start()
+        try:
+            return runner.run([task, *args])
+        finally:
+            self._save_trace(trace)
+            self._save_profile(profile_dir)
+
+    def _save_trace(self, trace):
+        """write the timeline of the last run, if traced"""
+        tracer, self._tracer = self._tracer, None
+        if tracer:
+            tracer.save(Path(trace))
+            self.log.info(f"[lite] [trace] wrote {trace}")
+
+    def _save_profile(self, profile_dir):
+        """write the profiles of the last run, if profiled, and log the peak memory"""
+        profiler, self._profiler = self._profiler, None
+        if not profiler:
+            return
+        profiler.stop()
+        written = profiler.save(Path(profile_dir))
+        self.log.info(f"[lite] [profile] wrote {len(written)} files to {profile_dir}")
+        for addon, peak in profiler.peaks.items():
+            self.log.info(f"[lite] [profile] [{addon}] peak memory {peak / 2**20:.1f} MiB")
+
+    def get_app_archive_index(self, archive=None) -> AppArchiveIndex:
+        """get the index of an app archive, by default ``app_archive``
+
+        The first time an archive is indexed, or changes, the index and the hash of
+        the archive are saved in the ``cache_dir``, whichever task first needs them.
+        """
+        archive = Path(archive or self.app_archive).resolve()
+        if archive not in self._app_archive_indexes:
+            index = AppArchiveIndex(archive, self.cache_dir, log=self.log)
+            # loads the index, and writes it if it was not already cached
+            index.save()
+            self._app_archive_indexes[archive] = index
+        return self._app_archive_indexes[archive]
+
+    def patch_config(
+        self, config_path, name: str, patch: ConfigPatch, file_dep=None, config=None
+    ) -> None:
+        """register a patch to a config file, such as ``jupyter-lite.json``
+
+        All of the patches to each file in the phase are applied by a single task,
+        in the order they were registered, which reads and writes the file once. The
+        task is re-run if any ``file_dep``, or any ``config``, has changed.
+        """
+        config_path = Path(config_path)
+        if config_path not in self._config_patchers:
+            self._config_patchers[config_path] = ConfigPatcher(config_path)
+        self._config_patchers[config_path].add(name, patch, file_dep=file_dep, config=config)
+
+    @property
+    def contents_ignore(self) -> IgnoreMatcher:
+        """the compiled ``ignore_contents`` and ``extra_ignore_contents``"""
+        return get_ignore_matcher(*self.ignore_contents, *self.extra_ignore_contents)
+
+    @property
+    def lite_config_ignore(self) -> IgnoreMatcher:
+        """the compiled ``ignore_lite_config`` and ``extra_ignore_lite_config``"""
+        return get_ignore_matcher(*self.ignore_lite_config, *self.extra_ignore_lite_config)
+
+    def get_tree(self, root, ignore: IgnoreMatcher | None = None) -> TreeSnapshot:
+        """get a snapshot of a directory, walking it only if not already known
+
+        If a parent of ``root`` has already been walked, the snapshot is taken from it.
+        If given, files matched by ``ignore`` are skipped, without walking ignored
+        directories, and the snapshot is only shared with callers using the same ``ignore``.
+        All snapshots are invalidated before each phase: any task which writes files that
+        are later listed by another task in the same phase should ``invalidate_tree``.
+        """
+        root = Path(root)
+        key = root if ignore is None else (root, ignore)
+        with TREES_LOCK:
+            if key not in self._trees:
+                for parent in [] if ignore else root.parents:
+                    if parent in self._trees:
+                        self._trees[root] = self._trees[parent].subtree(root)
+                        break
+                else:
+                    self._trees[key] = TreeSnapshot(root, ignore=ignore)
+            return self._trees[key]
+
+    def invalidate_tree(self, *paths):
+        """forget the snapshots which contain, or are inside, any of ``paths``, or all"""
+        paths = [Path(p) for p in paths]
+        with TREES_LOCK:
+            if not paths:
+                self._trees.clear()
+                return
+            for key in list(self._trees):
+                root = key if isinstance(key, Path) else key[0]
+                if any(p == root or root in p.parents or p in root.parents for p in paths):
+                    self._trees.pop(key, None)
+
+    def get_fingerprint_json(self, task: str) -> Path:
+        """get the path of the fingerprint of the last successful run of a task"""
+        key = sha256(str(self.output_dir.resolve()).encode("utf-8")).hexdigest()[:16]
+        return self.cache_dir / "fingerprints" / f"{self.task_prefix}{task}.{key}.json"
+
+    def get_fingerprint(self) -> dict[str, str]:
+        """get the hash of each part of a build: config, addons, app archive, and inputs
+
+        Inputs are only ``stat``-ed, never read: the ``lite_dir`` (skipping the same
+        paths as ``ignore_lite_config``), ``contents``, settings overrides, any
+        ``fingerprint_paths`` of addons, and the ``output_dir`` itself.
+        """
+        self.invalidate_tree()
+        config = {
+            name: getattr(self, name)
+            for name in sorted(self.traits(config=True))
+            if name not in UNFINGERPRINTED_TRAITS
+        }
+        addon_config = {
+            name: {key: getattr(addon, key) for key in sorted(addon.traits(config=True))}
+            for name, addon in self._addons.items()
+            if hasattr(addon, "traits")
+        }
+
+        inputs = {
+            str(self.lite_dir): hash_stats(
+                self.lite_dir, self.get_tree(self.lite_dir, ignore=self.lite_config_ignore)
+            ),
+            str(self.output_dir): hash_stats(self.output_dir, self.get_tree(self.output_dir)),
+        }
+        paths = [*self.contents, *self.settings_overrides]
+        for addon in self._addons.values():
+            paths += getattr(addon, "fingerprint_paths", [])
+        for path in [self.lite_dir / p for p in paths]:
+            if str(path) not in inputs:
+                tree = self.get_tree(path, ignore=self.contents_ignore)
+                inputs[str(path)] = hash_stats(path, tree)
+
+        return {
+            "config": hash_json([config, addon_config]),
+            "addons": hash_json(get_addon_versions()),
+            "app_archive": hash_json(self.get_app_archive_hash()),
+            "inputs": hash_json(inputs),
+        }
+
+    def get_app_archive_hash(self) -> str | None:
+        """get the (cached) hash of the ``app_archive``, if it exists"""
+        archive = self.app_archive
+        if not archive or not Path(archive).is_file():
+            return None
+        cache = HashCache(self.cache_dir / "hashes" / "fingerprint.app_archive.json")
+        archive_hash = hash_many([Path(archive)], cache=cache)[Path(archive)]
+        cache.save([Path(archive)])
+        return archive_hash
+
+    def is_fingerprint_current(self, task: str) -> bool:
+        """whether nothing has changed since the last successful run of a task"""
+        old_parts = load_fingerprint(self.get_fingerprint_json(task))
+        if not old_parts:
+            return False
+        parts = self.get_fingerprint()
+        changed = sorted(name for name, value in parts.items() if old_parts.get(name) != value)
+        if changed:
+            self.log.debug(f"[lite] [fingerprint] [{task}] changed: {', '.join(changed)}")
+        return not changed
+
+    def forget_fingerprint(self, task: str):
+        """remove the fingerprint of a task, e.g. before running it"""
+        self.get_fingerprint_json(task).unlink(missing_ok=True)
+
+    def save_fingerprint(self, task: str):
+        """record the fingerprint of a successful run of a task"""
+        save_fingerprint(self.get_fingerprint_json(task), self.get_fingerprint())
 
     @default("log")
     def _default_log(self):
@@ -90,12 +308,16 @@ class LiteManager(LiteBuildConfig):
 
     @default("_doit_config")
     def _default_doit_config(self):
-        """our hardcoded ``DOIT_CONFIG``"""
-        return {
+        """our hardcoded ``DOIT_CONFIG``, maybe running many ``jobs`` at once"""
+        config = {
             "dep_file": ".jupyterlite.doit.db",
             "backend": "sqlite3",
             "verbosity": 2,
+            "check_file_uptodate": get_file_dep_checker(self.file_dep_checker),
         }
+        if self.jobs and self.jobs > 1:
+            config.update(num_process=self.jobs, par_type=self.jobs_backend)
+        return config
 
     @default("_doit_tasks")
     def _default_doit_tasks(self):
@@ -114,20 +336,45 @@ class LiteManager(LiteBuildConfig):
         return tasks
 
     def _gather_tasks(self, attr, prev_attr):
-        """early up-front ``doit`` work"""
+        """early up-front ``doit`` work
+
+        As tasks in the same phase may be run at once, a task may list files in
+        ``writes`` which it changes in place, such as ``jupyter-lite.json``: it will
+        be run after any earlier task in the phase that writes the same files. A task
+        with ``after_all`` is run after every other task in the phase, e.g. to process
+        all of their outputs. After ``post_build``, a final task clamps any timestamps
+        missed while writing files, see ``verify_timestamps``.
+        """
 
         def _gather():
-            for name, addon in self._addons.items():
-                if attr in addon.__all__:
-                    try:
-                        for task in getattr(addon, attr)(self):
-                            patched_task = {**task}
-                            patched_task["name"] = f"""{self.task_prefix}{name}:{task["name"]}"""
-                            yield patched_task
-                    except Exception as error:
-                        self.log.error(f"[lite] [{attr}] [{name}] [ERR] {error}")
-                        if self.strict:
-                            raise error
+            yield from self._instrument_gather(attr, _phase_tasks())
+
+        def _phase_tasks():
+            # the tasks of the previous phase may have changed any file
+            self.invalidate_tree()
+            last_writers = {}
+            task_names = []
+            after_all = []
+            for task in self._addon_tasks(attr):
+                self._serialize_writes(attr, task, last_writers)
+                if task.pop("after_all", False):
+                    after_all += [task]
+                    continue
+                task_names += [f"{self.task_prefix}{attr}:{task['name']}"]
+                yield task
+            for task in self._config_patch_tasks():
+                task_names += [f"{self.task_prefix}{attr}:{task['name']}"]
+                yield task
+            for task in after_all:
+                yield {**task, "task_dep": [*task.get("task_dep", []), *task_names]}
+                task_names += [f"{self.task_prefix}{attr}:{task['name']}"]
+            if attr == "post_build" and self.verifies_timestamps:
+                yield dict(
+                    name=f"{self.task_prefix}timestamps",
+                    doc="clamp any timestamps newer than source_date_epoch",
+                    task_dep=task_names,
+                    actions=[(self.verify_timestamps, [])],
+                )
 
         if not prev_attr:
             return _gather
@@ -138,6 +385,115 @@ class LiteManager(LiteBuildConfig):
 
         return _delayed_gather
 
+    @property
+    def verifies_timestamps(self):
+        """whether to check every timestamp in the ``output_dir`` after ``post_build``"""
+        return self.source_date_epoch is not None and not self.no_verify_source_date_epoch
+
+    def verify_timestamps(self):
+        """clamp any timestamps in the ``output_dir`` newer than ``source_date_epoch``
+
+        Each addon clamps the paths it writes, as it writes them, but the ``mtime`` of a
+        folder changes whenever an entry is added or removed, so some may be missed.
+        """
+        sde = self.source_date_epoch
+        clamped = 0
+        self.invalidate_tree(self.output_dir)
+
+        tree = self.get_tree(self.output_dir)
+        entries = {self.output_dir: self.output_dir.stat(), **tree.entries}
+
+        for path, path_stat in entries.items():
+            if path_stat.st_mtime > sde and not os.path.islink(path):
+                self.log.debug(f"[lite] [timestamps] clamping {path}")
+                # with many ``jobs``, other tasks may still be replacing files
+                with contextlib.suppress(FileNotFoundError):
+                    os.utime(path, (sde, sde))
+                    clamped += 1
+
+        self.log.info(f"[lite] [timestamps] clamped {clamped} paths to {sde}")
+
+    def _instrument_gather(self, attr, tasks):
+        """yield the tasks of a phase, tracing and profiling them if needed"""
+        tracer = self._tracer
+        if tracer is None and self._profiler is None:
+            yield from tasks
+            return
+        phase, hook = split_attr(attr)
+        key, name = f"gather:{attr}", f"{self.task_prefix}{attr}"
+        span = tracer.span(key, name, "gather", phase=phase, hook=hook) if tracer else None
+        with span or contextlib.nullcontext():
+            for task in tasks:
+                yield self._instrument_task(attr, task)
+
+    def _instrument_task(self, attr, task):
+        """wrap the python actions of a task in one span of the trace, and a profile"""
+        tracer, profiler = self._tracer, self._profiler
+        phase, hook = split_attr(attr)
+        name = f"{self.task_prefix}{attr}:{task['name']}"
+        addon = task["name"].removeprefix(self.task_prefix).split(":")[0]
+        args = dict(addon=addon, hook=hook, phase=phase, task=name)
+
+        def instrument(func):
+            if profiler:
+                func = profiler.wrap(addon, name, func)
+            if tracer:
+                func = tracer.wrap(name, name, attr, func, **args)
+            return func
+
+        actions = []
+        for action in task.get("actions", []):
+            if callable(action):
+                actions += [instrument(action)]
+            elif isinstance(action, tuple) and callable(action[0]):
+                actions += [(instrument(action[0]), *action[1:])]
+            else:
+                actions += [action]
+        return {**task, "actions": actions}
+
+    def _addon_tasks(self, attr):
+        """yield the tasks of every addon for a phase, named for the addon"""
+        for name, addon in self._addons.items():
+            if attr not in addon.__all__:
+                continue
+            make_tasks = functools.partial(getattr(addon, attr), self)
+            try:
+                if self._profiler:
+                    tasks = self._profiler.iterate(name, f"{self.task_prefix}{attr}", make_tasks)
+                else:
+                    tasks = make_tasks()
+                # an addon may only register config patches, yielding no tasks
+                for task in tasks or []:
+                    yield {**task, "name": f"""{self.task_prefix}{name}:{task["name"]}"""}
+            except Exception as error:
+                self.log.error(f"[lite] [{attr}] [{name}] [ERR] {error}")
+                if self.strict:
+                    raise error
+
+    def _config_patch_tasks(self):
+        """yield a task for each config file patched in this phase, and forget them"""
+        patchers, self._config_patchers = self._config_patchers, {}
+        for config_path, patcher in sorted(patchers.items()):
+            rel = config_path.relative_to(self.output_dir).as_posix()
+            yield dict(
+                name=f"{self.task_prefix}config:{rel}",
+                doc=f"patch {rel} with {', '.join(name for name, _ in patcher.patches)}",
+                file_dep=patcher.file_dep,
+                uptodate=[doit.tools.config_changed(patcher.config)] if patcher.config else [],
+                actions=[(patcher.apply, [self.source_date_epoch, self.log])],
+            )
+
+    def _serialize_writes(self, attr, task, last_writers):
+        """make a task depend on the last task in its phase which wrote the same files"""
+        writes = [Path(p) for p in task.pop("writes", [])]
+        task_dep = list(task.get("task_dep", []))
+        for path in writes:
+            if path in last_writers and last_writers[path] not in task_dep:
+                task_dep += [last_writers[path]]
+            last_writers[path] = f"{self.task_prefix}{attr}:{task['name']}"
+        if task_dep:
+            task["task_dep"] = task_dep
+
     def _is_sys_prefix_ignored(self, addon):
         ignore = self.ignore_sys_prefix
         return addon in ignore if isinstance(ignore, tuple) else ignore
@@ -0,0 +1,139 @@
+"""opt-in ``cProfile`` and ``tracemalloc`` reports of the work done by each addon"""
+
+import contextlib
+import cProfile
+import functools
+import json
+import threading
+import tracemalloc
+from pathlib import Path
+
+#: profile the python functions called by each addon
+CPROFILE = "cprofile"
+#: track the peak python memory allocated by each addon and task
+TRACEMALLOC = "tracemalloc"
+PROFILERS = [CPROFILE, TRACEMALLOC]
+
+#: the version of the report of peak memory
+MEMORY_VERSION = 1
+
+
+class Profiler:
+    """collect a ``cProfile`` and the peak ``tracemalloc`` memory of each addon
+
+    Only one addon is profiled at a time, so that its work, and memory, are not mixed
+    up with another's: with many ``jobs``, tasks wait for each other. Work done in
+    other processes, with the ``process`` ``jobs_backend``, is not collected.
+    """
+
+    def __init__(self, profilers=PROFILERS):
+        self.profilers = tuple(profilers)
+        self._profiles = {}
+        self._peaks = {}
+        self._lock = threading.RLock()
+        self._active = False
+        self._started_tracemalloc = False
+
+    def __getstate__(self):
+        # only an empty profiler may be pickled into another process
+        return {"profilers": self.profilers}
+
+    def __setstate__(self, state):
+        self.__init__(state["profilers"])
+
+    def start(self):
+        """start tracing memory allocations, if needed"""
+        if TRACEMALLOC in self.profilers and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+    def stop(self):
+        """stop tracing memory allocations, if started here"""
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextlib.contextmanager
+    def profile(self, addon: str, task: str):
+        """profile the body of a ``with`` block as part of the work of an addon"""
+        with self._lock:
+            if self._active:
+                # already inside the work of an addon
+                yield
+                return
+            self._active = True
+            profile = None
+            if CPROFILE in self.profilers:
+                profile = self._profiles.get(addon) or cProfile.Profile()
+                self._profiles[addon] = profile
+            tracing = TRACEMALLOC in self.profilers and tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.reset_peak()
+            if profile:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile:
+                    profile.disable()
+                if tracing:
+                    self._add_peak(addon, task, tracemalloc.get_traced_memory()[1])
+                self._active = False
+
+    def wrap(self, addon: str, task: str, func):
+        """wrap a callable in a profile, keeping its signature for ``doit``"""
+
+        @functools.wraps(func)
+        def profiled(*func_args, **func_kwargs):
+            with self.profile(addon, task):
+                return func(*func_args, **func_kwargs)
+
+        return profiled
+
+    def iterate(self, addon: str, task: str, make_items):
+        """yield the items of a (maybe lazy) iterable, profiling only making them"""
+        with self.profile(addon, task):
+            items = iter(make_items() or [])
+        while True:
+            with self.profile(addon, task):
+                item = next(items, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def _add_peak(self, addon, task, peak):
+        """keep the highest peak of memory of an addon, and each of its tasks"""
+        peaks = self._peaks.setdefault(addon, {"peak_bytes": 0, "tasks": {}})
+        peaks["peak_bytes"] = max(peaks["peak_bytes"], peak)
+        peaks["tasks"][task] = max(peaks["tasks"].get(task, 0), peak)
+
+    def save(self, profile_dir: Path) -> list[Path]:
+        """write a ``pstats`` file for each addon, and a ``memory.json`` of peaks"""
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        for old in profile_dir.glob("*.pstats"):
+            old.unlink()
+
+        written = []
+        with self._lock:
+            for addon, profile in sorted(self._profiles.items()):
+                pstats_file = profile_dir / f"{addon}.pstats"
+                profile.dump_stats(pstats_file)
+                written += [pstats_file]
+
+            if TRACEMALLOC in self.profilers:
+                memory_json = profile_dir / "memory.json"
+                data = dict(version=MEMORY_VERSION, addons=self._peaks)
+                memory_json.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+                written += [memory_json]
+
+        return written
+
+    @property
+    def peaks(self) -> dict[str, int]:
+        """the peak memory of each addon, highest first"""
+        return dict(
+            sorted(
+                ((addon, peaks["peak_bytes"]) for addon, peaks in self._peaks.items()),
+                key=lambda item: -item[1],
+            )
+        )
@@ -0,0 +1,85 @@
+"""tests of the cached app archive index"""
+
+import io
+import json
+import tarfile
+
+import pytest
+
+from jupyterlite_core.app_archive import AppArchiveIndex
+from jupyterlite_core.manager import LiteManager
+
+A_BUNDLE = 'var chunks = {123:"abc123",456:"def456"};'
+
+
+def _an_app_archive(path, apps):
+    members = {
+        "package/package.json": json.dumps({"jupyterlite": {"apps": apps}}),
+        **{f"package/build/{app}/bundle.js": A_BUNDLE for app in apps},
+        "package/index.html": "<html></html>",
+    }
+    with tarfile.open(path, "w:gz") as tar:
+        for name, text in members.items():
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return path
+
+
+def test_app_archive_index(tmp_path, monkeypatch):
+    """is an app archive read once, and then reused until it changes"""
+    archive = _an_app_archive(tmp_path / "app.tgz", ["lab", "repl"])
+    cache_dir = tmp_path / "cache"
+
+    index = AppArchiveIndex(archive, cache_dir)
+    assert index.apps == ["lab", "repl"]
+    assert not cache_dir.exists(), "loading should not write the cache"
+    assert sorted(index.members) == [
+        "build/lab/bundle.js",
+        "build/repl/bundle.js",
+        "index.html",
+        "package.json",
+    ]
+    assert index.members["index.html"]["size"] == len("<html></html>")
+    assert index.chunks == {app: {"123": "abc123", "456": "def456"} for app in ["lab", "repl"]}
+
+    index.save()
+    assert index.cache_file.exists()
+
+    def _fail(*args, **kwargs):  # pragma: no cover
+        raise AssertionError("should have used the cache")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(AppArchiveIndex, "read_archive", _fail)
+        assert AppArchiveIndex(archive, cache_dir).apps == ["lab", "repl"]
+
+    _an_app_archive(archive, ["lab"])
+    assert AppArchiveIndex(archive, cache_dir).apps == ["lab"]
+
+
+def test_app_archive_index_needs_package_json(tmp_path):
+    """is an archive without a ``package.json`` rejected"""
+    archive = tmp_path / "app.tgz"
+    with tarfile.open(archive, "w:gz"):
+        pass
+
+    with pytest.raises(ValueError, match=r"package\.json"):
+        AppArchiveIndex(archive, tmp_path / "cache").load()
+
+
+def test_manager_saves_app_archive_index(tmp_path, monkeypatch):
+    """does the manager save an index the first time it reads an archive"""
+    archive = _an_app_archive(tmp_path / "app.tgz", ["lab"])
+    cache_dir = tmp_path / "cache"
+    index = LiteManager(lite_dir=tmp_path, cache_dir=cache_dir).get_app_archive_index(archive)
+    assert index.cache_file.exists()
+    assert (cache_dir / "hashes/app-archives.json").exists()
+
+    def _fail(*args, **kwargs):  # pragma: no cover
+        raise AssertionError("should have used the cache")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(AppArchiveIndex, "read_archive", _fail)
+        manager = LiteManager(lite_dir=tmp_path, cache_dir=cache_dir)
+        assert manager.get_app_archive_index(archive).apps == ["lab"]
@@ -7,6 +7,16 @@ import tempfile
 from hashlib import sha256
 from pathlib import Path
 
+import pytest
+
+from jupyterlite_core.compression import open_tar
+
+try:  # pragma: no cover
+    __import__("libarchive")
+    HAS_LIBARCHIVE = True
+except Exception:  # pragma: no cover
+    HAS_LIBARCHIVE = False
+
 # use the generally-documented invocation
 LITE_ARGS = "jupyter", "lite"
 
@@ -30,10 +40,11 @@ def test_archive_input(a_lite_app_archive, the_npm_source_date_epoch):
     assert not unexpected, f"{a_lite_app_archive} does not work the way we expect"
 
 
-def test_archive_is_reproducible(an_empty_lite_dir, script_runner, source_date_epoch):
+@pytest.mark.parametrize("engine_args", [["--no-libarchive"], *([[]] if HAS_LIBARCHIVE else [])])
+def test_archive_is_reproducible(an_empty_lite_dir, script_runner, source_date_epoch, engine_args):
     """do we build reproducible artifacts?"""
     # TODO: handle macro-scale reproducibility in CI
-    extra_args = "--debug", "--source-date-epoch", source_date_epoch
+    extra_args = "--debug", "--source-date-epoch", source_date_epoch, *engine_args
     archive_args = (*LITE_ARGS, "archive", *extra_args)
     cwd = dict(cwd=str(an_empty_lite_dir))
 
@@ -44,9 +55,7 @@ def test_archive_is_reproducible(an_empty_lite_dir, script_runner, source_date_e
 
     # build once for initial tarball
     before = an_empty_lite_dir / "v1.tgz"
-    initial = script_runner.run(
-        [*archive_args, "--output-archive", str(before), "--no-libarchive"], **cwd
-    )
+    initial = script_runner.run([*archive_args, "--output-archive", str(before)], **cwd)
     assert initial.success, "failed to build the first tarball"
 
     # reset
@@ -61,6 +70,35 @@ def test_archive_is_reproducible(an_empty_lite_dir, script_runner, source_date_e
     _assert_same_tarball("two successive builds should be the same", script_runner, before, after)
 
 
+@pytest.mark.skipif(not HAS_LIBARCHIVE, reason="requires libarchive-c")
+def test_archive_engines_agree(an_empty_lite_dir, script_runner, source_date_epoch):
+    """do the ``tarfile`` and ``libarchive`` engines archive the same members?"""
+    archive_args = (*LITE_ARGS, "archive", "--source-date-epoch", source_date_epoch)
+    cwd = dict(cwd=str(an_empty_lite_dir))
+
+    readme = an_empty_lite_dir / "files/nested/README.md"
+    readme.parent.mkdir(parents=True)
+    readme.write_text("# Hello world\n", encoding="utf-8")
+
+    members = []
+    for name, engine_args in [("v1.tgz", ["--no-libarchive"]), ("v2.tgz", [])]:
+        tarball = an_empty_lite_dir / name
+        result = script_runner.run(
+            [*archive_args, *engine_args, "--output-archive", str(tarball)], **cwd
+        )
+        assert result.success, f"failed to build {name}"
+        _reset_a_lite_dir(an_empty_lite_dir, readme, *an_empty_lite_dir.glob("*.tgz"))
+        with tarfile.open(tarball) as tar:
+            members += [
+                [
+                    (m.name, m.size, m.mtime, m.mode, m.uid, m.gid, m.uname, m.gname)
+                    for m in tar.getmembers()
+                ]
+            ]
+
+    assert members[0] == members[1]
+
+
 def test_archive_is_idempotent(an_empty_lite_dir, script_runner, source_date_epoch):
     extra_args = "--debug", "--source-date-epoch", source_date_epoch
     archive_args = (*LITE_ARGS, "archive", *extra_args)
@@ -83,6 +121,38 @@ def test_archive_is_idempotent(an_empty_lite_dir, script_runner, source_date_epo
     _assert_same_tarball("a build repeated should be the same", script_runner, before, after)
 
 
+@pytest.mark.parametrize("engine_args", [["--no-libarchive"], *([[]] if HAS_LIBARCHIVE else [])])
+@pytest.mark.parametrize("suffix", [".tar.zst", ".tar"])
+def test_archive_formats(an_empty_lite_dir, script_runner, source_date_epoch, suffix, engine_args):
+    """can other archive formats be written, and used as an app archive?"""
+    if suffix == ".tar.zst":
+        pytest.importorskip("zstandard")
+    extra_args = "--debug", "--source-date-epoch", source_date_epoch, *engine_args
+    archive_args = (*LITE_ARGS, "archive", *extra_args)
+    cwd = dict(cwd=str(an_empty_lite_dir))
+
+    before = an_empty_lite_dir / "v1.tgz"
+    initial = script_runner.run([*archive_args, "--output-archive", str(before)], **cwd)
+    assert initial.success, "failed to build the first tarball"
+
+    other = an_empty_lite_dir / f"v2{suffix}"
+    middle = script_runner.run(
+        [*archive_args, "--app-archive", str(before), "--output-archive", str(other)], **cwd
+    )
+    assert middle.success, f"failed to build the {suffix} archive"
+
+    with tarfile.open(before) as tgz, open_tar(other) as tar:
+        assert tgz.getnames() == tar.getnames()
+
+    after = an_empty_lite_dir / "v3.tgz"
+    subsequent = script_runner.run(
+        [*archive_args, "--app-archive", str(other), "--output-archive", str(after)], **cwd
+    )
+    assert subsequent.success, f"failed to build a tarball from the {suffix} archive"
+
+    _assert_same_tarball(f"a build from {suffix} should be the same", script_runner, before, after)
+
+
 def _reset_a_lite_dir(lite_dir, *skip):
     """clean out a lite dir, except for the named files"""
     for path in lite_dir.glob("*"):
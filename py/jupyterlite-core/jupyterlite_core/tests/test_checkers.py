@@ -0,0 +1,82 @@
+"""tests of checking whether the ``file_dep`` of tasks have changed"""
+
+import os
+
+import pytest
+
+from jupyterlite_core.checkers import (
+    HASH,
+    MD5,
+    TIMESTAMP,
+    HashChecker,
+    TimestampSizeChecker,
+    get_file_dep_checker,
+)
+from jupyterlite_core.manager import LiteManager
+
+
+def touch(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_timestamp_size_checker(tmp_path):
+    """is a file changed only if its size or timestamp change"""
+    path = tmp_path / "a.txt"
+    path.write_text("a", encoding="utf-8")
+    checker = TimestampSizeChecker()
+
+    state = checker.get_state(path, None)
+    assert checker.get_state(path, state) is None
+    assert not checker.check_modified(path, path.stat(), state)
+
+    touch(path, path.stat().st_mtime_ns + 1_000_000_000)
+    assert checker.check_modified(path, path.stat(), state)
+    state = checker.get_state(path, state)
+
+    mtime_ns = path.stat().st_mtime_ns
+    path.write_text("b", encoding="utf-8")
+    touch(path, mtime_ns)
+    assert not checker.check_modified(path, path.stat(), state), "expected no read"
+
+    path.write_text("bb", encoding="utf-8")
+    touch(path, mtime_ns)
+    assert checker.check_modified(path, path.stat(), state)
+    assert checker.check_modified(path, path.stat(), 1.0), "expected a foreign state"
+
+
+def test_hash_checker(tmp_path):
+    """is a file changed only if its size or content change"""
+    path = tmp_path / "a.txt"
+    path.write_text("a", encoding="utf-8")
+    checker = HashChecker()
+
+    state = checker.get_state(path, None)
+    assert checker.get_state(path, state) is None
+    assert not checker.check_modified(path, path.stat(), state)
+
+    touch(path, path.stat().st_mtime_ns + 1_000_000_000)
+    assert not checker.check_modified(path, path.stat(), state)
+    state = checker.get_state(path, state)
+    assert state is not None, "expected a new timestamp to be kept"
+
+    mtime_ns = path.stat().st_mtime_ns
+    new_path = tmp_path / "b.txt"
+    new_path.write_text("b", encoding="utf-8")
+    touch(new_path, mtime_ns)
+    new_path.replace(path)
+    assert checker.check_modified(path, path.stat(), state), "expected a new inode"
+
+    path.write_text("bb", encoding="utf-8")
+    assert checker.check_modified(path, path.stat(), state)
+    assert checker.check_modified(path, path.stat(), [1.0, 1, "abc"]), "expected md5 state"
+    assert checker.check_modified(path, path.stat(), ["md4", *state[1:]])
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"), [(MD5, MD5), (TIMESTAMP, TimestampSizeChecker), (HASH, HashChecker)]
+)
+def test_manager_file_dep_checker(tmp_path, name, expected):
+    """does the manager configure ``doit`` with a checker"""
+    assert get_file_dep_checker(name) == expected
+    manager = LiteManager(lite_dir=tmp_path, file_dep_checker=name)
+    assert manager._doit_config["check_file_uptodate"] == expected
@@ -1,7 +1,11 @@
 """integration tests for overall CLI functionality"""
 
+import gzip
+import io
+import json
 import platform
 import re
+import tarfile
 import time
 
 from pytest import mark
@@ -95,8 +99,11 @@ def test_cli_status_null(lite_hook, an_empty_lite_dir, script_runner):
     """do the "side-effect-free" commands create exactly one file?"""
     returned_status = script_runner.run(["jupyter", "lite", lite_hook], cwd=str(an_empty_lite_dir))
     assert returned_status.success
-    files = set(an_empty_lite_dir.rglob("*"))
-    # we would expect to see our build cruft sqlite
+    cache_dir = an_empty_lite_dir / ".cache"
+    files = {
+        p for p in an_empty_lite_dir.rglob("*") if p != cache_dir and cache_dir not in p.parents
+    }
+    # we would expect to see our build cruft sqlite, and maybe the index of the app archive
     assert len(files) == 1
     dododb = an_empty_lite_dir / ".jupyterlite.doit.db"
     assert files == {dododb}
@@ -350,3 +357,221 @@ def test_build_ignores_hidden_directories(an_empty_lite_dir, script_runner):
     # Should NOT warn about .venv - it's silently ignored
     assert "Skipping" not in status.stderr or ".venv" not in status.stderr
     assert ".venv" not in status.stderr
+
+
+def test_init_unpacks_with_source_date_epoch(an_empty_lite_dir, script_runner):
+    """are unpacked files and folders clamped to the source date epoch"""
+    sde = 1700000000
+    args = "jupyter", "lite", "init", "--source-date-epoch", f"{sde}", "--no-sourcemaps"
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    build = an_empty_lite_dir / "_output/build"
+    unpacked = [build, *build.rglob("*")]
+    assert not [p for p in unpacked if p.name.endswith(".map")], "expected no maps"
+    newer = [p for p in unpacked if p.stat().st_mtime > sde]
+    assert not newer, f"expected no paths newer than {sde}"
+
+
+def test_init_refuses_path_traversal(an_empty_lite_dir, script_runner):
+    """is an app archive which would write outside of the output dir rejected"""
+    app_archive = an_empty_lite_dir / "evil.tgz"
+    members = {
+        "package/package.json": json.dumps({"jupyterlite": {"apps": []}}).encode(),
+        "package/../evil.txt": b"evil",
+    }
+    with tarfile.open(app_archive, "w:gz") as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    args = "jupyter", "lite", "init", "--app-archive", str(app_archive)
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert not status.success
+    assert "Path Traversal" in status.stdout + status.stderr
+    assert not (an_empty_lite_dir / "evil.txt").exists()
+
+
+@mark.parametrize("reconcile", [True, False])
+def test_build_reconciles_output_dir(an_empty_lite_dir, script_runner, reconcile):
+    """are unchanged files kept when the apps change"""
+    out = an_empty_lite_dir / "_output"
+    args = ["jupyter", "lite", "build", *(["--reconcile"] if reconcile else [])]
+
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    before = (out / "index.html").stat()
+    assert (out / "lab/index.html").exists()
+
+    status = script_runner.run([*args, "--apps", "repl"], cwd=str(an_empty_lite_dir))
+    assert status.success
+    after = (out / "index.html").stat()
+    assert not (out / "lab").exists()
+    assert (out / "repl/index.html").exists()
+
+    kept = (before.st_ino, before.st_ctime_ns) == (after.st_ino, after.st_ctime_ns)
+    assert kept == reconcile
+
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert (out / "lab/index.html").exists()
+
+
+@mark.parametrize("copy_strategy", ["copy", "hardlink", "auto"])
+def test_build_copy_strategy(an_empty_lite_dir, script_runner, copy_strategy):
+    """are contents copied, or linked, as configured"""
+    readme = an_empty_lite_dir / "files/README.md"
+    readme.parent.mkdir()
+    readme.write_text("# hello world\n", encoding="utf-8")
+
+    args = "jupyter", "lite", "build", "--copy-strategy", copy_strategy
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    out_readme = an_empty_lite_dir / "_output/files/README.md"
+    assert out_readme.read_text(encoding="utf-8") == "# hello world\n"
+    linked = out_readme.stat().st_ino == readme.stat().st_ino
+    assert linked == (copy_strategy == "hardlink")
+
+
+def test_build_jobs(an_empty_lite_dir, script_runner):
+    """do tasks which patch the same file still all apply, when run at once"""
+    for i in range(10):
+        (an_empty_lite_dir / f"files/{i}/README.md").parent.mkdir(parents=True)
+        (an_empty_lite_dir / f"files/{i}/README.md").write_text(f"# {i}\n", encoding="utf-8")
+    (an_empty_lite_dir / "overrides.json").write_text(
+        json.dumps({"@jupyterlab/apputils-extension:themes": {"theme": "JupyterLab Dark"}}),
+        encoding="utf-8",
+    )
+
+    args = "jupyter", "lite", "build", "--jobs", "4"
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    out = an_empty_lite_dir / "_output"
+    config = json.loads((out / "jupyter-lite.json").read_text(encoding="utf-8"))
+    config_data = config["jupyter-config-data"]
+    assert "contentsAllJsonFile" in config_data
+    assert "fileTypes" in config_data
+    assert "@jupyterlab/apputils-extension:themes" in config_data["settingsOverrides"]
+    assert (out / "files/9/README.md").exists()
+
+
+def test_build_gzip_sidecars(an_empty_lite_dir, script_runner):
+    """are gzip sidecars written after every other file, but not listed as contents"""
+    (an_empty_lite_dir / "files").mkdir()
+    (an_empty_lite_dir / "files/README.md").write_text("# hello\n", encoding="utf-8")
+    (an_empty_lite_dir / "files/data.json").write_text("[1]\n" * 100, encoding="utf-8")
+
+    args = "jupyter", "lite", "build", "--gzip-sidecars", "--source-date-epoch", "1"
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    out = an_empty_lite_dir / "_output"
+    for path in [out / "jupyter-lite.json", out / "api/contents/all.json", out / "files/data.json"]:
+        sidecar = path.with_name(f"{path.name}.gz")
+        assert gzip.decompress(sidecar.read_bytes()) == path.read_bytes()
+        assert sidecar.stat().st_mtime <= 1
+
+    listing = json.loads((out / "api/contents/all.json").read_text(encoding="utf-8"))
+    assert sorted(c["name"] for c in listing["content"]) == ["README.md", "data.json"]
+
+    # change an input which is not compressed, so the build isn't skipped
+    (an_empty_lite_dir / "files/README.md").write_text("# hello world\n", encoding="utf-8")
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert "-- post_build:compress:sidecars" in status.stdout, "no compressible file changed"
+
+    (an_empty_lite_dir / "files/data.json").write_text("[2]\n" * 100, encoding="utf-8")
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert "compressed 1 of" in status.stdout + status.stderr
+    assert gzip.decompress((out / "files/data.json.gz").read_bytes()) == b"[2]\n" * 100
+
+
+@mark.parametrize("verify", [True, False])
+def test_build_clamps_timestamps_on_write(an_empty_lite_dir, script_runner, verify):
+    """are written paths clamped to the source date epoch, without the final pass"""
+    sde = 1700000000
+    (an_empty_lite_dir / "files/a/b").mkdir(parents=True)
+    (an_empty_lite_dir / "files/a/b/c.md").write_text("# hello\n", encoding="utf-8")
+    (an_empty_lite_dir / "files/d.json").write_text("{}", encoding="utf-8")
+
+    args = "jupyter", "lite", "build", "--source-date-epoch", f"{sde}", "--debug"
+    if not verify:
+        args = *args, "--no-verify-source-date-epoch"
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    out = an_empty_lite_dir / "_output"
+    newer = [p for p in [out, *out.rglob("*")] if p.stat().st_mtime > sde]
+    assert not newer, f"expected no paths newer than {sde}"
+
+    output = status.stdout + status.stderr
+    if verify:
+        assert "clamped 0 paths" in output
+    else:
+        assert "[timestamps]" not in output
+
+
+def test_build_fingerprint(an_empty_lite_dir, script_runner):
+    """is a build skipped if nothing changed since it last succeeded, unless forced"""
+    (an_empty_lite_dir / "files").mkdir()
+    readme = an_empty_lite_dir / "files/README.md"
+    readme.write_text("# hello\n", encoding="utf-8")
+    skipped = "nothing changed, skipping"
+
+    args = "jupyter", "lite", "build"
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert skipped not in status.stdout + status.stderr
+
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert skipped in status.stdout + status.stderr
+
+    status = script_runner.run([*args, "--force"], cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert skipped not in status.stdout + status.stderr
+
+    readme.write_text("# hello world\n", encoding="utf-8")
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert skipped not in status.stdout + status.stderr
+    out_readme = an_empty_lite_dir / "_output/files/README.md"
+    assert out_readme.read_text(encoding="utf-8") == "# hello world\n"
+
+    (an_empty_lite_dir / "_output/files/README.md").unlink()
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert out_readme.exists(), "expected a changed output_dir to be rebuilt"
+
+
+def test_build_trace(an_empty_lite_dir, script_runner):
+    """does a build write a timeline of its tasks"""
+    trace_file = an_empty_lite_dir / "trace.json"
+    args = "jupyter", "lite", "build", "--trace", str(trace_file)
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+
+    events = json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert spans["pre_build"]["cat"] == "gather"
+    task = spans["build:icons:copy"]
+    assert task["args"]["addon"] == "icons"
+    assert task["args"]["hook"] == "build"
+    assert "cpu_ms" in task["args"]
+
+
+def test_build_profile(an_empty_lite_dir, script_runner):
+    """does a build write a profile, and the peak memory, of each addon"""
+    profile_dir = an_empty_lite_dir / "profile"
+    args = "jupyter", "lite", "build", "--profile-dir", str(profile_dir)
+    status = script_runner.run(args, cwd=str(an_empty_lite_dir))
+    assert status.success
+    assert "peak memory" in status.stderr
+
+    assert (profile_dir / "static.pstats").exists()
+    memory = json.loads((profile_dir / "memory.json").read_text(encoding="utf-8"))
+    assert memory["addons"]["static"]["peak_bytes"] > 0
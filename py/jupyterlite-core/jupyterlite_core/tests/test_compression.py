@@ -0,0 +1,117 @@
+"""tests of compressing large streams"""
+
+import gzip
+import io
+import random
+
+import pytest
+
+from jupyterlite_core.addons.compress import CompressAddon
+from jupyterlite_core.compression import ParallelGzipWriter, write_sidecars
+from jupyterlite_core.manager import LiteManager
+
+
+def _some_data(size):
+    rand = random.Random(size)  # noqa: S311
+    words = [rand.randbytes(rand.randint(1, 12)) for _ in range(100)]
+    return b"".join(rand.choices(words, k=size // 4 + 1))[:size]
+
+
+@pytest.mark.parametrize("size", [0, 1, 1024, 64 * 1024, 1024 * 1024 + 1])
+@pytest.mark.parametrize("compresslevel", [1, 6, 9])
+def test_parallel_gzip(size, compresslevel):
+    """does parallel gzip give a single valid, reproducible gzip stream"""
+    data = _some_data(size)
+    outputs = []
+
+    for workers in [1, 4]:
+        fileobj = io.BytesIO()
+        with ParallelGzipWriter(
+            fileobj, compresslevel=compresslevel, workers=workers, block_size=16 * 1024
+        ) as gz:
+            for i in range(0, size, 10000):
+                gz.write(data[i : i + 10000])
+            assert gz.tell() == size
+        outputs += [fileobj.getvalue()]
+
+    assert outputs[0] == outputs[1]
+    assert gzip.decompress(outputs[0]) == data
+    with gzip.GzipFile(fileobj=io.BytesIO(outputs[0])) as gz:
+        assert gz.read() == data
+        assert gz.mtime == 0
+
+
+def test_write_sidecars(tmp_path):
+    """are sidecars reproducible, clamped, and only written if smaller"""
+    big, small = tmp_path / "big.js", tmp_path / "small.js"
+    big.write_bytes(_some_data(64 * 1024))
+    small.write_bytes(b"x")
+    (tmp_path / "small.js.gz").write_bytes(b"stale")
+
+    assert write_sidecars(big, {"gzip": 9}, source_date_epoch=1) == {"gzip": True}
+    first = (tmp_path / "big.js.gz").read_bytes()
+    assert gzip.decompress(first) == big.read_bytes()
+    assert (tmp_path / "big.js.gz").stat().st_mtime == 1
+
+    write_sidecars(big, {"gzip": 9}, source_date_epoch=1)
+    assert (tmp_path / "big.js.gz").read_bytes() == first
+
+    assert write_sidecars(small, {"gzip": 9}) == {"gzip": False}
+    assert not (tmp_path / "small.js.gz").exists()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compress_addon(an_empty_lite_dir, workers):
+    """are sidecars only written for new or changed files, and removed with them"""
+    manager = LiteManager(lite_dir=an_empty_lite_dir)
+    addon = CompressAddon(manager=manager, gzip=True, workers=workers)
+    out = manager.output_dir
+    for i in range(4):
+        (out / f"{i}.json").parent.mkdir(parents=True, exist_ok=True)
+        (out / f"{i}.json").write_bytes(_some_data(1024 + i))
+    (out / "README.md").write_bytes(_some_data(1024))
+
+    addon.write_all_sidecars()
+    assert sorted(p.name for p in out.glob("*.gz")) == [f"{i}.json.gz" for i in range(4)]
+    ctimes = {p: p.stat().st_ctime_ns for p in out.glob("*.gz")}
+
+    (out / "0.json").write_bytes(_some_data(2048))
+    (out / "3.json").unlink()
+    addon.write_all_sidecars()
+
+    assert gzip.decompress((out / "0.json.gz").read_bytes()) == _some_data(2048)
+    assert not (out / "3.json.gz").exists()
+    changed = {p for p in out.glob("*.gz") if p.stat().st_ctime_ns != ctimes[p]}
+    assert changed <= {out / "0.json.gz"}
+
+    addon.gzip = False
+    assert [t["name"] for t in addon.post_build(manager)] == ["sidecars"]
+    addon.write_all_sidecars()
+    assert not list(out.glob("*.gz")), "expected sidecars of a disabled encoding removed"
+    assert not list(addon.post_build(manager)), "expected nothing left to remove"
+
+
+def test_compress_addon_uptodate(an_empty_lite_dir):
+    """is the sidecars task only run again if a compressible file or sidecar changes"""
+    manager = LiteManager(lite_dir=an_empty_lite_dir)
+    addon = CompressAddon(manager=manager, gzip=True, workers=1)
+    out = manager.output_dir
+    out.mkdir(parents=True, exist_ok=True)
+    (out / "a.json").write_bytes(_some_data(1024))
+
+    [task] = addon.post_build(manager)
+    assert len(task["uptodate"]) == 2
+    assert not addon.is_sidecars_uptodate(None, {}), "expected a first run"
+
+    values = addon.write_all_sidecars()
+    assert addon.is_sidecars_uptodate(None, values)
+
+    (out / "README.md").write_bytes(_some_data(512))
+    assert addon.is_sidecars_uptodate(None, values), "expected other files ignored"
+
+    (out / "a.json.gz").unlink()
+    assert not addon.is_sidecars_uptodate(None, values), "expected a removed sidecar found"
+
+    values = addon.write_all_sidecars()
+    (out / "b.json").write_bytes(_some_data(1024))
+    assert not addon.is_sidecars_uptodate(None, values), "expected a new file found"
@@ -0,0 +1,53 @@
+"""tests of patching config files once per phase"""
+
+import json
+
+import pytest
+
+from jupyterlite_core.constants import JUPYTER_CONFIG_DATA, JUPYTERLITE_JSON
+from jupyterlite_core.manager import LiteManager
+
+
+def test_config_patches(tmp_path):
+    """are all of the patches to a file applied, in order, by one task"""
+    manager = LiteManager(lite_dir=tmp_path, source_date_epoch=1700000000)
+    jupyterlite_json = manager.output_dir / JUPYTERLITE_JSON
+    dep = tmp_path / "dep.json"
+
+    def add(key, value):
+        def patch(config):
+            config.setdefault(JUPYTER_CONFIG_DATA, {})[key] = value
+            return config
+
+        return patch
+
+    manager.patch_config(jupyterlite_json, "a", add("a", 1), file_dep=[jupyterlite_json])
+    manager.patch_config(jupyterlite_json, "b", add("a", 2), file_dep=[dep], config={"b": 1})
+
+    tasks = list(manager._config_patch_tasks())
+    assert not list(manager._config_patch_tasks())
+
+    [task] = tasks
+    assert task["name"] == f"config:{JUPYTERLITE_JSON}"
+    assert task["file_dep"] == [jupyterlite_json, dep]
+    assert len(task["uptodate"]) == 1
+
+    with pytest.raises(FileNotFoundError):
+        for action, args in task["actions"]:
+            action(*args)
+    assert not jupyterlite_json.exists()
+
+    jupyterlite_json.parent.mkdir(parents=True)
+    jupyterlite_json.write_text("{", encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError):
+        for action, args in task["actions"]:
+            action(*args)
+    assert jupyterlite_json.read_text(encoding="utf-8") == "{"
+
+    jupyterlite_json.write_text(json.dumps({"b": 1}), encoding="utf-8")
+    for action, args in task["actions"]:
+        action(*args)
+
+    config = json.loads(jupyterlite_json.read_text(encoding="utf-8"))
+    assert config == {"b": 1, JUPYTER_CONFIG_DATA: {"a": 2}}
+    assert jupyterlite_json.stat().st_mtime == 1700000000
@@ -1,9 +1,15 @@
 """tests for more kinds of contents"""
 
+import hashlib
 import json
+import shutil
 
 import pytest
 
+from jupyterlite_core.addons.contents import ContentsAddon, DateTimeEncoder
+from jupyterlite_core.constants import CONTENTS_SCHEMA, JSON_FMT
+from jupyterlite_core.manager import LiteManager
+
 
 @pytest.mark.parametrize(
     "allow_hidden,expect_success,expect_content,extra_ignore",
@@ -99,10 +105,7 @@ def test_contents_missing_jupyter_server(
     script_runner,
     monkeypatch,
 ):
-    """
-    Test that an error is raised when contents are provided but jupyter_server is not installed
-    """
-    # Create a test file to be used as contents
+    """Contents are indexed even when jupyter_server is not installed"""
     test_contents = an_empty_lite_dir / "test_contents"
     test_contents.mkdir()
     (test_contents / "test_file.txt").write_text("Test content")
@@ -110,20 +113,52 @@ def test_contents_missing_jupyter_server(
     # Set environment variable to simulate jupyter_server not being installed
     monkeypatch.setenv("JUPYTERLITE_NO_JUPYTER_SERVER", "true")
 
-    # Run the build command with contents
     result = script_runner.run(
         ["jupyter", "lite", "build", "--contents", "test_contents"],
         cwd=str(an_empty_lite_dir),
     )
+    assert result.success
 
-    # The build should fail
-    assert not result.success
-
-    # Check if the expected error message is in the output
-    expected_error = (
-        "jupyter-server is not installed. You cannot add custom content to jupyterlite."
-    )
-    assert expected_error in result.stdout or expected_error in result.stderr
+    root_contents_json = an_empty_lite_dir / "_output/api/contents/all.json"
+    root_contents = json.loads(root_contents_json.read_text(encoding="utf-8"))
+    assert root_contents["content"][0]["name"] == "test_file.txt"
+    assert root_contents["content"][0]["mimetype"] == "text/plain"
+
+
+@pytest.mark.parametrize("source_date_epoch", [None, 1])
+def test_contents_index_matches_jupyter_server(an_empty_lite_dir, source_date_epoch):
+    """The native Contents API index is the same as the one from jupyter_server"""
+    filemanager = pytest.importorskip("jupyter_server.services.contents.filemanager")
+
+    manager = LiteManager(lite_dir=an_empty_lite_dir, source_date_epoch=source_date_epoch)
+    addon = ContentsAddon(manager=manager)
+    files = addon.output_files_dir
+    nested = files / "nested with spaces" / "deeper"
+    nested.mkdir(parents=True)
+    (files / "empty").mkdir()
+    (files / "README.md").write_text("# hello", encoding="utf-8")
+    (files / "data.unknown-ext").write_bytes(b"\x00")
+    (files / "cache.pyc").write_bytes(b"")
+    (files / ".hidden").write_text("", encoding="utf-8")
+    (nested.parent / "notebook.ipynb").write_text("{}", encoding="utf-8")
+    (nested / "== data ==.csv").write_text("a,b\n1,2", encoding="utf-8")
+    read_only = nested / "read-only.py"
+    read_only.write_text("", encoding="utf-8")
+    read_only.chmod(0o444)
+
+    assert addon.all_contents_paths() is None
+
+    fm = filemanager.FileContentsManager(root_dir=str(files))
+
+    for path in [files, *[d for d in files.rglob("*") if d.is_dir()]]:
+        stem = path.relative_to(files).as_posix()
+        listing_path = "" if stem == "." else stem
+        expected = fm.get(listing_path)
+        if source_date_epoch is not None:
+            expected = addon.patch_listing_timestamps(expected)
+        all_json = addon.api_dir / listing_path / "all.json"
+        observed = all_json.read_text(encoding="utf-8")
+        assert observed == json.dumps(expected, **JSON_FMT, cls=DateTimeEncoder)
 
 
 def test_contents_resolved_relative_to_lite_dir(
@@ -263,3 +298,195 @@ def test_contents_path_in_py_config_resolved_relative_to_lite_dir(
     root_contents = json.loads(root_contents_json.read_text(encoding="utf-8"))
     assert len(root_contents["content"]) == 1, root_contents
     assert root_contents["content"][0]["name"] == "notebook.ipynb"
+
+
+def test_contents_last_wins(an_empty_lite_dir):
+    """does the last of several ``contents`` with the same relative path win"""
+    first, second = an_empty_lite_dir / "first", an_empty_lite_dir / "second"
+    for root in [first, second]:
+        (root / "nested").mkdir(parents=True)
+        (root / "nested" / "same.txt").write_text(root.name, encoding="utf-8")
+        (root / f"{root.name}.txt").write_text(root.name, encoding="utf-8")
+    (first / "nested" / ".ipynb_checkpoints").mkdir()
+    (first / "nested" / ".ipynb_checkpoints" / "same.txt").write_text("", encoding="utf-8")
+
+    manager = LiteManager(lite_dir=an_empty_lite_dir, contents=[first, second, first / "first.txt"])
+    addon = ContentsAddon(manager=manager)
+    files = addon.output_files_dir
+    plan = {dest: src for src, dest in addon.file_src_dest}
+
+    assert plan == {
+        files / "first.txt": first / "first.txt",
+        files / "second.txt": second / "second.txt",
+        files / "nested" / "same.txt": second / "nested" / "same.txt",
+    }
+    assert addon.file_src_dest == addon.file_src_dest
+
+
+@pytest.mark.parametrize("source_date_epoch", [None, 1700000000])
+def test_contents_batches(an_empty_lite_dir, source_date_epoch):
+    """are contents copied in batches, only copying changed files"""
+    files = an_empty_lite_dir / "files"
+    for rel in ["a.txt", "b.txt", "c.txt", "nested/d.txt"]:
+        (files / rel).parent.mkdir(parents=True, exist_ok=True)
+        (files / rel).write_text(rel, encoding="utf-8")
+
+    manager = LiteManager(
+        lite_dir=an_empty_lite_dir,
+        source_date_epoch=source_date_epoch,
+        copy_strategy="copy",
+    )
+    addon = ContentsAddon(manager=manager, batch_size=2, copy_workers=2)
+    tasks = {t["name"]: t for t in addon.build(manager) if t["name"].startswith("copy:")}
+    assert sorted(tasks) == ["copy:.:0", "copy:.:1", "copy:nested"]
+
+    def run_all():
+        for task in tasks.values():
+            for action, args in task["actions"]:
+                action(*args)
+
+    run_all()
+    out = addon.output_files_dir
+    assert (out / "nested/d.txt").read_text(encoding="utf-8") == "nested/d.txt"
+    ctimes = {p: p.stat().st_ctime_ns for p in out.rglob("*.txt")}
+
+    (files / "b.txt").write_text("changed", encoding="utf-8")
+    run_all()
+
+    assert (out / "b.txt").read_text(encoding="utf-8") == "changed"
+    changed = {p for p in out.rglob("*.txt") if p.stat().st_ctime_ns != ctimes[p]}
+    assert changed <= {out / "b.txt"}
+
+    (files / "a.txt").write_text("A.TXT", encoding="utf-8")
+    run_all()
+    assert (out / "a.txt").read_text(encoding="utf-8") == "A.TXT", "expected a same-size edit"
+
+    assert sorted(p.name for p in addon.copied_dir.glob("*.json")) == sorted(
+        addon.get_copied_json(name).name for name in [".:0", ".:1", "nested"]
+    )
+
+    # a new first file shifts the batches, but only the new file is copied
+    (files / "0.txt").write_text("0", encoding="utf-8")
+    (files / "nested/d.txt").unlink()
+    ctimes = {p: p.stat().st_ctime_ns for p in out.rglob("*.txt")}
+    addon = ContentsAddon(manager=manager, batch_size=2, copy_workers=2)
+    tasks = {t["name"]: t for t in addon.build(manager) if t["name"].startswith("copy:")}
+    assert sorted(tasks) == ["copy:.:0", "copy:.:1"]
+    assert not addon.get_copied_json("nested").exists(), "expected an unused record removed"
+    run_all()
+    changed = {p for p in out.rglob("*.txt") if p.stat().st_ctime_ns != ctimes.get(p)}
+    assert changed <= {out / "0.txt", out / "b.txt", out / "c.txt"}
+    assert out / "a.txt" not in changed
+
+
+def test_contents_batches_edited_while_copying(an_empty_lite_dir, monkeypatch):
+    """is a source edited while it is copied copied again"""
+    src = an_empty_lite_dir / "files/a.txt"
+    src.parent.mkdir()
+    src.write_text("a", encoding="utf-8")
+    manager = LiteManager(
+        lite_dir=an_empty_lite_dir, source_date_epoch=1700000000, copy_strategy="copy"
+    )
+    addon = ContentsAddon(manager=manager, batch_size=2)
+    [batch] = [batch for _, batch in addon.get_copy_batches(sorted(addon.file_src_dest))]
+    copy_file = addon.copy_file
+
+    def copy_and_edit(from_path, to_path):
+        copy_file(from_path, to_path)
+        from_path.write_text("b", encoding="utf-8")
+
+    with monkeypatch.context() as mp:
+        mp.setattr(addon, "copy_file", copy_and_edit)
+        addon.copy_batch(".", batch)
+
+    dest = addon.output_files_dir / "a.txt"
+    assert dest.read_text(encoding="utf-8") == "a"
+    addon.copy_batch(".", batch)
+    assert dest.read_text(encoding="utf-8") == "b", "expected the edited source copied again"
+
+
+def test_contents_shards(an_empty_lite_dir):
+    """are large Contents API responses split into shards, listed in ``all.json``"""
+    manager = LiteManager(lite_dir=an_empty_lite_dir)
+    addon = ContentsAddon(manager=manager, shard_size=2)
+    files = addon.output_files_dir
+    (files / "nested").mkdir(parents=True)
+    (files / "nested" / "only.txt").write_text("", encoding="utf-8")
+    for name in "edcba":
+        (files / f"{name}.txt").write_text(name, encoding="utf-8")
+
+    (files / ".hidden.txt").write_text("", encoding="utf-8")
+    (files / "a.txt.gz").write_bytes(b"")
+    tree = manager.get_tree(files)
+    assert addon.get_shard_targets(tree) == [addon.api_dir / f"all.{i}.json" for i in range(3)]
+
+    assert addon.all_contents_paths() is None
+    assert all(path.exists() for path in addon.get_shard_targets(tree))
+
+    manifest = json.loads((addon.api_dir / "all.json").read_text(encoding="utf-8"))
+    assert manifest["content"] is None
+    assert [(s["file"], s["first"], s["last"], s["count"]) for s in manifest["shards"]] == [
+        ("all.0.json", "a.txt", "b.txt", 2),
+        ("all.1.json", "c.txt", "d.txt", 2),
+        ("all.2.json", "e.txt", "nested", 2),
+    ]
+
+    for shard in manifest["shards"]:
+        shard_json = json.loads((addon.api_dir / shard["file"]).read_text(encoding="utf-8"))
+        assert [c["name"] for c in shard_json["content"]] == [shard["first"], shard["last"]]
+
+    nested = json.loads((addon.api_dir / "nested/all.json").read_text(encoding="utf-8"))
+    assert [c["name"] for c in nested["content"]] == ["only.txt"]
+    assert "shards" not in nested
+
+    validator = addon.get_validator(CONTENTS_SCHEMA)
+    for path in sorted(addon.api_dir.rglob("*.json")):
+        addon.validate_one_json_file(validator, path)
+
+    addon.shard_size = 3
+    assert addon.all_contents_paths() is None
+    assert sorted(p.name for p in addon.api_dir.glob("all*.json")) == [
+        "all.0.json",
+        "all.1.json",
+        "all.json",
+    ]
+
+
+@pytest.mark.parametrize("source_date_epoch", [None, 1700000000])
+def test_contents_manifest(an_empty_lite_dir, source_date_epoch):
+    """is every listed file in ``/files/`` written to the manifest, sorted by path"""
+    manager = LiteManager(lite_dir=an_empty_lite_dir, source_date_epoch=source_date_epoch)
+    addon = ContentsAddon(manager=manager, manifest=True)
+    files = addon.output_files_dir
+    for rel in ["a/b.txt", "a/c/d.json", "a.txt", "a-b.txt", "b.ipynb", ".hidden", "x.pyc"]:
+        (files / rel).parent.mkdir(parents=True, exist_ok=True)
+        (files / rel).write_text(rel, encoding="utf-8")
+
+    addon.write_manifest()
+
+    lines = addon.manifest_path.read_text(encoding="utf-8").splitlines()
+    records = [json.loads(line) for line in lines]
+    paths = [r["path"] for r in records]
+    assert paths == sorted(paths) == ["a-b.txt", "a.txt", "a/b.txt", "a/c/d.json", "b.ipynb"]
+
+    for record in records:
+        path = files / record["path"]
+        assert record["size"] == len(record["path"])
+        assert record["hash"] == hashlib.sha256(path.read_bytes()).hexdigest()
+        if source_date_epoch is not None:
+            assert record["last_modified"] == "2023-11-14T22:13:20Z"
+    assert records[1]["mimetype"] == "text/plain"
+
+    # hashes are cached for each directory, and forgotten with the directory
+    assert len(list(addon.manifest_cache_dir.glob("*.json"))) == 3
+    shutil.rmtree(files / "a/c")
+    addon.write_manifest()
+    assert len(list(addon.manifest_cache_dir.glob("*.json"))) == 2
+    paths = [
+        json.loads(line)["path"]
+        for line in addon.manifest_path.read_text(encoding="utf-8").splitlines()
+    ]
+    assert paths == ["a-b.txt", "a.txt", "a/b.txt", "b.ipynb"]
+
+    config = addon.patch_contents_config({})
+    assert config["jupyter-config-data"]["contentsManifestFile"] == "manifest.ndjson"
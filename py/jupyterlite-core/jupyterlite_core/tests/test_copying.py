@@ -0,0 +1,31 @@
+"""tests of copying files with different strategies"""
+
+import os
+
+import pytest
+
+from jupyterlite_core.copying import COPY_STRATEGIES, HARDLINK, REFLINK, copy_file
+
+
+@pytest.mark.parametrize("strategy", COPY_STRATEGIES)
+def test_copy_file(tmp_path, strategy):
+    """does each strategy give a file with the same content and mtime"""
+    src = tmp_path / "src.txt"
+    dest = tmp_path / "dest.txt"
+    src.write_text("hello world", encoding="utf-8")
+    os.utime(src, (1700000000, 1700000000))
+
+    try:
+        copy_file(src, dest, strategy)
+    except OSError as err:
+        if strategy != REFLINK:
+            raise
+        pytest.skip(f"filesystem does not support reflinks: {err}")
+
+    assert dest.read_text(encoding="utf-8") == "hello world"
+    assert dest.stat().st_mtime == 1700000000
+    assert (src.stat().st_ino == dest.stat().st_ino) == (strategy == HARDLINK)
+
+    if strategy != HARDLINK:
+        dest.write_text("changed", encoding="utf-8")
+        assert src.read_text(encoding="utf-8") == "hello world"
@@ -0,0 +1,54 @@
+"""tests of fingerprinting everything which goes into a build"""
+
+import os
+
+from jupyterlite_core.fingerprint import get_addon_versions, hash_stats
+from jupyterlite_core.manager import LiteManager
+
+
+def test_hash_stats(tmp_path):
+    """does the hash of a tree change with the names, sizes and times of its files"""
+    (tmp_path / "a").mkdir()
+    path = tmp_path / "a/b.txt"
+    path.write_text("b", encoding="utf-8")
+    first = hash_stats(tmp_path)
+    assert hash_stats(tmp_path) == first
+    assert hash_stats(path) != first
+
+    mtime_ns = path.stat().st_mtime_ns
+    os.utime(path, ns=(mtime_ns + 1, mtime_ns + 1))
+    assert hash_stats(tmp_path) != first
+
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    assert hash_stats(tmp_path) == first
+    path.rename(tmp_path / "a/c.txt")
+    assert hash_stats(tmp_path) != first
+    assert hash_stats(tmp_path / "missing") == hash_stats(tmp_path / "also-missing")
+
+
+def test_addon_versions():
+    """is each addon's distribution known"""
+    versions = get_addon_versions()
+    assert "jupyterlite-core==" in versions["contents"]
+
+
+def test_manager_fingerprint(an_empty_lite_dir):
+    """does the fingerprint of a build change with its config and inputs"""
+    manager = LiteManager(lite_dir=an_empty_lite_dir)
+    assert not manager.is_fingerprint_current("build")
+
+    manager.save_fingerprint("build")
+    assert manager.is_fingerprint_current("build")
+
+    (an_empty_lite_dir / "files").mkdir()
+    (an_empty_lite_dir / "files/a.txt").write_text("a", encoding="utf-8")
+    assert not manager.is_fingerprint_current("build")
+
+    manager.save_fingerprint("build")
+    manager.no_sourcemaps = not manager.no_sourcemaps
+    assert not manager.is_fingerprint_current("build")
+
+    manager.no_sourcemaps = not manager.no_sourcemaps
+    assert manager.is_fingerprint_current("build")
+    manager.forget_fingerprint("build")
+    assert not manager.is_fingerprint_current("build")
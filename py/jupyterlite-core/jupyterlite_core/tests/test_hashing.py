@@ -0,0 +1,73 @@
+"""tests of hashing many files"""
+
+import os
+import time
+from hashlib import sha256
+
+import pytest
+
+from jupyterlite_core.hashing import HashCache, hash_many, hash_one
+
+
+@pytest.mark.parametrize("size", [0, 1, 1024 * 1024, 3 * 1024 * 1024 + 7])
+@pytest.mark.parametrize("chunk_size", [1, 1024 * 1024])
+def test_hash_one(tmp_path, size, chunk_size):
+    """are chunked hashes the same as whole-file hashes"""
+    if chunk_size == 1 and size > 1024:
+        pytest.skip("too slow to hash byte-by-byte")
+    path = tmp_path / "some.bin"
+    data = bytes(i % 251 for i in range(size))
+    path.write_bytes(data)
+    assert hash_one(path, chunk_size=chunk_size) == sha256(data).hexdigest()
+
+
+@pytest.mark.parametrize("workers", [None, 1, 4])
+def test_hash_many(tmp_path, workers):
+    """are threaded hashes the same as serial hashes"""
+    paths = []
+    for i in range(20):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(f"{i}" * i, encoding="utf-8")
+        paths += [path]
+
+    hashes = hash_many([*paths, paths[0]], workers=workers)
+
+    assert list(hashes) == paths
+    assert hashes == {p: sha256(p.read_bytes()).hexdigest() for p in paths}
+
+
+def test_hash_cache(tmp_path):
+    """are only changed files re-hashed"""
+    cache_file = tmp_path / "cache/hashes.json"
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"{i}.txt"
+        path.write_text(f"{i}", encoding="utf-8")
+        paths += [path]
+
+    expected = {p: sha256(p.read_bytes()).hexdigest() for p in paths}
+
+    cache = HashCache(cache_file)
+    assert hash_many(paths, cache=cache) == expected
+    cache.save(paths)
+    assert cache_file.exists()
+
+    # a changed file, with the same size and mtime, is still re-hashed
+    stat = paths[0].stat()
+    # wait out coarse filesystem timestamps
+    time.sleep(0.1)
+    paths[0].write_text("x", encoding="utf-8")
+    os.utime(paths[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    expected[paths[0]] = sha256(b"x").hexdigest()
+
+    cache = HashCache(cache_file)
+    assert cache.get_many(paths) == {p: expected[p] for p in paths[1:]}
+    assert hash_many(paths, cache=cache) == expected
+
+    # stale entries are pruned
+    cache.save(paths[:2])
+    assert len(HashCache(cache_file).entries) == 2
+
+    # a broken cache is ignored
+    cache_file.write_text("not json", encoding="utf-8")
+    assert hash_many(paths, cache=HashCache(cache_file)) == expected
@@ -0,0 +1,58 @@
+"""tests of matching paths against many ignore patterns"""
+
+import pytest
+
+from jupyterlite_core.ignore import IgnoreMatcher, get_ignore_matcher
+from jupyterlite_core.manager import LiteManager
+
+PATTERNS = [r"/node_modules/", r"\.pyc$", r"/\.git", r"/_"]
+
+
+@pytest.mark.parametrize(
+    "path,is_dir,ignored,pruned",
+    [
+        ["/a.txt", False, False, False],
+        ["/a.pyc", False, True, False],
+        ["/a.pyc", True, True, False],
+        ["/node_modules", True, True, True],
+        ["/node_modules/a/b.js", False, True, True],
+        ["/src/node_modules", True, True, True],
+        ["/.git", True, True, True],
+        ["/.github/workflows", True, True, True],
+        ["/src", True, False, False],
+        ["/_output", True, True, True],
+    ],
+)
+def test_ignore_matcher(path, is_dir, ignored, pruned):
+    """does a combined matcher agree with each pattern"""
+    matcher = get_ignore_matcher(*PATTERNS)
+    assert matcher.is_ignored(path, is_dir) == ignored
+    assert matcher.is_pruned(path) == pruned
+    if not is_dir:
+        assert matcher.search(path) == any(IgnoreMatcher([p]).search(path) for p in PATTERNS)
+
+
+def test_ignore_matcher_edge_cases():
+    """do empty patterns, and patterns which can't be combined, still work"""
+    assert not IgnoreMatcher([]).is_ignored("/a", is_dir=True)
+    matcher = IgnoreMatcher([r"(?i)/readme", r"/b/"])
+    assert matcher.search("/README.md")
+    assert matcher.is_pruned("/b")
+    assert get_ignore_matcher(*PATTERNS) is get_ignore_matcher(*PATTERNS)
+
+
+def test_lite_config_ignore_prunes(tmp_path):
+    """are ignored directories skipped while finding ``jupyter-lite.json``"""
+    for rel in ["jupyter-lite.json", "app/jupyter-lite.json", "node_modules/a/jupyter-lite.json"]:
+        (tmp_path / rel).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel).write_text("{}", encoding="utf-8")
+
+    manager = LiteManager(lite_dir=tmp_path)
+    tree = manager.get_tree(tmp_path, manager.lite_config_ignore)
+
+    assert tree.rglob("jupyter-lite.json") == [
+        tmp_path / "app/jupyter-lite.json",
+        tmp_path / "jupyter-lite.json",
+    ]
+    assert tmp_path / "node_modules" not in tree.entries
+    assert manager.get_tree(tmp_path) is not tree
@@ -0,0 +1,52 @@
+"""tests of profiling the work done by each addon"""
+
+import json
+import pickle
+import pstats
+
+from jupyterlite_core.profiling import CPROFILE, PROFILERS, TRACEMALLOC, Profiler
+
+
+def make_items():
+    yield bytearray(2**20)
+    yield bytearray(2**10)
+
+
+def test_profiler(tmp_path):
+    """are the profile and peak memory of each addon and task written"""
+    profiler = Profiler(PROFILERS)
+    profiler.start()
+    try:
+        items = list(profiler.iterate("a", "build", make_items))
+        grow = profiler.wrap("b", "build:b:grow", lambda size: len(bytearray(size)))
+        assert grow.__wrapped__
+        assert grow(2**21) == 2**21
+    finally:
+        profiler.stop()
+
+    assert len(items) == 2
+    written = profiler.save(tmp_path)
+    assert sorted(path.name for path in written) == ["a.pstats", "b.pstats", "memory.json"]
+    assert "make_items" in str(pstats.Stats(str(tmp_path / "a.pstats")).stats)
+
+    memory = json.loads((tmp_path / "memory.json").read_text(encoding="utf-8"))["addons"]
+    assert memory["a"]["peak_bytes"] >= 2**20
+    assert memory["b"]["tasks"]["build:b:grow"] >= 2**21
+    assert list(profiler.peaks) == ["b", "a"]
+
+
+def test_profiler_one(tmp_path):
+    """are only the chosen profilers used, and old profiles removed"""
+    (tmp_path / "old.pstats").write_text("", encoding="utf-8")
+    profiler = Profiler([CPROFILE])
+    profiler.start()
+    with profiler.profile("a", "build"), profiler.profile("b", "build"):
+        pass
+    profiler.stop()
+    assert [path.name for path in profiler.save(tmp_path)] == ["a.pstats"]
+    assert not (tmp_path / "old.pstats").exists()
+
+    profiler = Profiler([TRACEMALLOC])
+    clone = pickle.loads(pickle.dumps(profiler))  # noqa: S301
+    assert clone.profilers == (TRACEMALLOC,)
+    assert not clone.peaks
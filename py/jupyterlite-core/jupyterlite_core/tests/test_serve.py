@@ -1,12 +1,18 @@
 """Test that various serving options work"""
 
+import gzip
 import json
+import os
 import subprocess
 import time
 
 import pytest
 from tornado import httpclient
 
+from jupyterlite_core.addons.compress import CompressAddon
+from jupyterlite_core.addons.serve import CompressedResponses, parse_accept_encoding
+from jupyterlite_core.manager import LiteManager
+
 from .conftest import CI, DARWIN, LINUX, PYPY
 
 if CI and DARWIN:  # pragma: no cover
@@ -97,3 +103,76 @@ def _fetch_without_errors(url, retries=15, expect_headers=None):  # pragma: no c
                 errors += [err]
 
     return errors
+
+
+@pytest.mark.parametrize(
+    "accept_encoding,expected",
+    [
+        ["", {}],
+        ["gzip", {"gzip": 1.0}],
+        ["br;q=0.9, GZIP;q=0.5, *;q=0", {"br": 0.9, "gzip": 0.5, "*": 0.0}],
+        ["gzip;q=nope, ", {"gzip": 0.0}],
+    ],
+)
+def test_parse_accept_encoding(accept_encoding, expected):
+    """are the qualities of encodings parsed from an ``Accept-Encoding`` header"""
+    assert parse_accept_encoding(accept_encoding) == expected
+
+
+def test_compressed_responses(tmp_path):
+    """are sidecars preferred, and bodies compressed on the fly kept up to a size"""
+    responses = CompressedResponses(["gzip"], max_size=3000)
+    paths = [tmp_path / f"{i}.js" for i in range(3)]
+    for i, path in enumerate(paths):
+        path.write_text(f"var x = {i};\n" * 100, encoding="utf-8")
+    (tmp_path / "data.bin").write_bytes(b"\0" * 100)
+    sidecar = tmp_path / "0.js.gz"
+    sidecar.write_bytes(gzip.compress(paths[0].read_bytes()))
+    mtime_ns = paths[0].stat().st_mtime_ns
+    os.utime(sidecar, ns=(mtime_ns + 1, mtime_ns + 1))
+
+    assert responses.negotiate(paths[0], "gzip, br") == ("gzip", sidecar)
+    assert responses.negotiate(paths[1], "gzip, br") == ("gzip", None)
+    assert responses.negotiate(paths[1], "br") == (None, None)
+    assert responses.negotiate(paths[1], "gzip;q=0") == (None, None)
+    assert responses.negotiate(tmp_path / "data.bin", "gzip") == (None, None)
+
+    bodies = [responses.get(path, "gzip") for path in paths]
+    assert [gzip.decompress(body) for body in bodies] == [p.read_bytes() for p in paths]
+    assert responses.get(paths[2], "gzip") is bodies[2]
+    assert 0 < responses.size <= 3000
+
+    responses.max_size = 10
+    assert responses.get(paths[0], "gzip") is None
+
+    os.utime(sidecar, ns=(mtime_ns, mtime_ns))
+    assert responses.negotiate(paths[0], "gzip") == ("gzip", None), "expected an older sidecar"
+
+
+def test_compressed_responses_recorded_sidecars(an_empty_lite_dir):
+    """are recorded sidecars only used for the content they were written from"""
+    sde = 1700000000
+    manager = LiteManager(lite_dir=an_empty_lite_dir, source_date_epoch=sde)
+    compress = CompressAddon(manager=manager, gzip=True, workers=1)
+    path = manager.output_dir / "a.js"
+    path.parent.mkdir(parents=True)
+    path.write_text("var a = 1;\n" * 100, encoding="utf-8")
+    os.utime(path, (sde, sde))
+    compress.write_all_sidecars()
+
+    responses = CompressedResponses(
+        ["gzip"],
+        max_size=3000,
+        sidecars_json=compress.sidecars_json,
+        hash_cache_file=compress.get_hash_cache_file(compress.sidecars_json),
+    )
+    sidecar = path.with_name("a.js.gz")
+    assert responses.negotiate(path, "gzip") == ("gzip", sidecar)
+
+    path.write_text("var b = 2;\n" * 100, encoding="utf-8")
+    os.utime(path, (sde, sde))
+    assert sidecar.stat().st_mtime == path.stat().st_mtime
+    assert responses.negotiate(path, "gzip") == ("gzip", None), "expected a stale sidecar"
+
+    compress.write_all_sidecars()
+    assert responses.negotiate(path, "gzip") == ("gzip", sidecar)
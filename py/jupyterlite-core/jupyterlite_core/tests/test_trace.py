@@ -0,0 +1,55 @@
+"""tests of the timeline of a build"""
+
+import json
+import pickle
+
+from jupyterlite_core.manager import split_attr
+from jupyterlite_core.trace import Tracer
+
+
+def test_tracer_merges_spans(tmp_path):
+    """are the spans with the same key merged into one event"""
+    tracer = Tracer()
+    path = tmp_path / "a.txt"
+
+    def write(text):
+        path.write_text(text, encoding="utf-8")
+        return True
+
+    traced = tracer.wrap("task", "build:a", "build", write, addon="a")
+    assert traced.__wrapped__ is write
+    assert traced("a" * 100)
+    assert traced("b" * 100)
+    with tracer.span("other", "gather:build", "gather"):
+        pass
+
+    trace_file = tmp_path / "trace.json"
+    tracer.save(trace_file)
+    events = json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"]
+    spans = [event for event in events if event["ph"] == "X"]
+    assert [span["name"] for span in spans] == ["build:a", "gather:build"]
+    task = spans[0]
+    assert task["args"]["addon"] == "a"
+    assert task["dur"] >= 0
+    assert task["args"]["cpu_ms"] >= 0
+    if "write_bytes" in task["args"]:
+        assert task["args"]["write_bytes"] >= 200
+
+
+def test_tracer_pickles_empty():
+    """is a tracer sent to another process empty, but usable"""
+    tracer = Tracer()
+    with tracer.span("a", "a", "a"):
+        pass
+    clone = pickle.loads(pickle.dumps(tracer))  # noqa: S301
+    assert not clone.to_json()["traceEvents"][1:]
+    with clone.span("b", "b", "b"):
+        pass
+    assert len(clone.to_json()["traceEvents"]) == 2
+
+
+def test_split_attr():
+    """are addon methods split into phases and hooks"""
+    assert split_attr("pre_build") == ("pre_", "build")
+    assert split_attr("build") == ("", "build")
+    assert split_attr("post_status") == ("post_", "status")
@@ -0,0 +1,64 @@
+"""tests of walking, and caching, directory trees"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from jupyterlite_core.manager import LiteManager
+from jupyterlite_core.tree import TreeSnapshot
+
+
+def make_tree(root):
+    for rel in ["a.json", "b/c.json", "b/d/e.txt", "f/g.json"]:
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(rel, encoding="utf-8")
+
+
+def test_tree_snapshot(tmp_path):
+    """does a snapshot find the same paths as ``rglob``"""
+    make_tree(tmp_path)
+    tree = TreeSnapshot(tmp_path)
+
+    assert tree.files == sorted(p for p in tmp_path.rglob("*") if p.is_file())
+    assert tree.dirs == sorted(p for p in tmp_path.rglob("*") if p.is_dir())
+    assert tree.rglob("*.json") == sorted(tmp_path.rglob("*.json"))
+    assert tree.rglob("d/*.txt") == [tmp_path / "b/d/e.txt"]
+    assert tree.rglob("d", files_only=True) == []
+    assert tree.stat(tmp_path / "a.json").st_size == len("a.json")
+    assert tree.subtree(tmp_path / "b").files == sorted((tmp_path / "b").rglob("*.*"))
+    assert TreeSnapshot(tmp_path / "missing").files == []
+
+
+def test_manager_tree(tmp_path):
+    """does the manager reuse snapshots until they are invalidated"""
+    make_tree(tmp_path)
+    manager = LiteManager(lite_dir=tmp_path, output_dir=tmp_path / "_output")
+
+    tree = manager.get_tree(tmp_path)
+    assert manager.get_tree(tmp_path) is tree
+    assert manager.get_tree(tmp_path / "b").files == [tmp_path / "b/c.json", tmp_path / "b/d/e.txt"]
+
+    (tmp_path / "b/h.json").write_text("{}", encoding="utf-8")
+    assert tmp_path / "b/h.json" not in manager.get_tree(tmp_path / "b").files
+
+    manager.invalidate_tree(tmp_path / "b/d")
+    assert manager.get_tree(tmp_path) is not tree
+    assert tmp_path / "b/h.json" in manager.get_tree(tmp_path / "b").files
+
+    tree = manager.get_tree(tmp_path)
+    manager.invalidate_tree()
+    assert manager.get_tree(tmp_path) is not tree
+
+
+def test_manager_tree_threads(tmp_path):
+    """can many threads get, and invalidate, the same snapshots at once"""
+    make_tree(tmp_path)
+    manager = LiteManager(lite_dir=tmp_path, output_dir=tmp_path / "_output")
+
+    def get_and_invalidate(i):
+        manager.get_tree(tmp_path)
+        manager.get_tree(tmp_path / "b")
+        manager.invalidate_tree(tmp_path / "b/d")
+        return len(manager.get_tree(tmp_path / ("b" if i % 2 else "f")).files)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        assert set(pool.map(get_and_invalidate, range(200))) == {1, 2}
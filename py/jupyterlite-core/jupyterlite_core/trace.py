@@ -0,0 +1,112 @@
+"""a timeline of a build, as Chrome Trace Event JSON, for ``chrome://tracing`` or Perfetto"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+#: the per-thread I/O counters on Linux, see ``man 5 proc``
+THREAD_IO = Path("/proc/thread-self/io")
+
+
+def read_io_counters() -> tuple[int, int] | None:
+    """get the bytes read and written by the current thread, if the platform can tell"""
+    try:
+        text = THREAD_IO.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    fields = dict(line.split(":", 1) for line in text.splitlines() if ":" in line)
+    try:
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (KeyError, ValueError):
+        return None
+
+
+class Tracer:
+    """collect spans of wall time, CPU time and I/O, written as Chrome Trace Events
+
+    Spans with the same ``key`` are merged into one, e.g. all of the actions of a task.
+    Spans from tasks run in other processes, with the ``process`` ``jobs_backend``,
+    are not collected.
+    """
+
+    def __init__(self):
+        self._origin_ns = time.perf_counter_ns()
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # only an empty tracer may be pickled into another process
+        return {"origin_ns": self._origin_ns}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self._origin_ns = state["origin_ns"]
+
+    @contextlib.contextmanager
+    def span(self, key: str, name: str, cat: str, **args):
+        """record the time and I/O taken by the body of a ``with`` block"""
+        start_ns = time.perf_counter_ns()
+        start_cpu = time.thread_time_ns()
+        start_io = read_io_counters()
+        try:
+            yield
+        finally:
+            end_io = read_io_counters()
+            args["cpu_ms"] = (time.thread_time_ns() - start_cpu) / 1e6
+            if start_io and end_io:
+                args["read_bytes"] = end_io[0] - start_io[0]
+                args["write_bytes"] = end_io[1] - start_io[1]
+            span = dict(name=name, cat=cat, start_ns=start_ns, end_ns=time.perf_counter_ns())
+            self._add(key, dict(**span, tid=threading.get_native_id(), args=args))
+
+    def wrap(self, key: str, name: str, cat: str, func, **args):
+        """wrap a callable in a span, keeping its signature for ``doit``"""
+
+        @functools.wraps(func)
+        def traced(*func_args, **func_kwargs):
+            with self.span(key, name, cat, **args):
+                return func(*func_args, **func_kwargs)
+
+        return traced
+
+    def _add(self, key, span):
+        """add a span, or extend an earlier span with the same key"""
+        with self._lock:
+            old = self._spans.setdefault(key, span)
+            if old is span:
+                return
+            old["start_ns"] = min(old["start_ns"], span["start_ns"])
+            old["end_ns"] = max(old["end_ns"], span["end_ns"])
+            for arg, value in span["args"].items():
+                if isinstance(value, int | float) and isinstance(old["args"].get(arg), int | float):
+                    old["args"][arg] += value
+
+    def to_json(self) -> dict:
+        """get the Chrome Trace Event JSON of every span, in microseconds"""
+        pid = os.getpid()
+        with self._lock:
+            spans = sorted(self._spans.values(), key=lambda span: span["start_ns"])
+        events = [dict(name="process_name", ph="M", pid=pid, tid=0, args=dict(name="jupyter-lite"))]
+        for span in spans:
+            events += [
+                dict(
+                    name=span["name"],
+                    cat=span["cat"],
+                    ph="X",
+                    ts=(span["start_ns"] - self._origin_ns) / 1e3,
+                    dur=(span["end_ns"] - span["start_ns"]) / 1e3,
+                    pid=pid,
+                    tid=span["tid"],
+                    args=span["args"],
+                )
+            ]
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+    def save(self, trace_file: Path):
+        """write the trace"""
+        trace_file.parent.mkdir(parents=True, exist_ok=True)
+        trace_file.write_text(json.dumps(self.to_json(), indent=1), encoding="utf-8")
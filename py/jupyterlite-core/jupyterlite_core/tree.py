@@ -0,0 +1,106 @@
+"""a snapshot of the files and folders under a directory, walked once"""
+
+import os
+import stat
+from pathlib import Path, PurePosixPath
+
+from .ignore import IgnoreMatcher
+
+
+class TreeSnapshot:
+    """the paths and ``stat`` results of everything under a ``root``, walked once
+
+    Many addons need to list the same directories (usually the ``output_dir``) while
+    generating tasks: rather than each walking them again with ``rglob``, and then
+    calling ``is_dir`` or ``stat`` on each path, the tree is walked once with
+    ``os.scandir``, keeping the ``stat`` result of each entry.
+
+    If given, files matched by ``ignore`` are skipped, and directories in which every
+    file would be ignored are not walked at all.
+
+    A snapshot is not updated when files change: see ``LiteManager.get_tree``.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        entries: dict[Path, os.stat_result] | None = None,
+        ignore: IgnoreMatcher | None = None,
+    ):
+        self.root = Path(root)
+        self.ignore = ignore
+        self._entries = entries
+
+    @property
+    def entries(self) -> dict[Path, os.stat_result]:
+        """the ``stat`` result of each path under the ``root``, sorted by path"""
+        if self._entries is None:
+            self._entries = self.walk()
+        return self._entries
+
+    @property
+    def files(self) -> list[Path]:
+        """all of the (non-directory) paths under the ``root``, sorted"""
+        return [p for p, st in self.entries.items() if not stat.S_ISDIR(st.st_mode)]
+
+    @property
+    def dirs(self) -> list[Path]:
+        """all of the directories under the ``root``, sorted"""
+        return [p for p, st in self.entries.items() if stat.S_ISDIR(st.st_mode)]
+
+    def walk(self) -> dict[Path, os.stat_result]:
+        """walk the tree once, following links to files, but not to directories"""
+        entries = {}
+        to_scan = [(self.root, "")]
+
+        while to_scan:
+            os_dir, rel_dir = to_scan.pop()
+            try:
+                scanner = os.scandir(os_dir)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with scanner:
+                for entry in scanner:
+                    rel = f"{rel_dir}/{entry.name}"
+                    try:
+                        entry_stat = entry.stat()
+                    except FileNotFoundError:
+                        entry_stat = entry.stat(follow_symlinks=False)
+                    is_dir = stat.S_ISDIR(entry_stat.st_mode)
+                    if self.is_ignored(rel, is_dir):
+                        continue
+                    entries[Path(entry.path)] = entry_stat
+                    if is_dir and not entry.is_symlink():
+                        to_scan += [(entry.path, rel)]
+
+        return dict(sorted(entries.items()))
+
+    def is_ignored(self, rel_posix_path: str, is_dir: bool) -> bool:
+        """whether a file is ignored, or a directory can be skipped altogether"""
+        if self.ignore is None:
+            return False
+        if is_dir:
+            return self.ignore.is_pruned(rel_posix_path)
+        return self.ignore.search(rel_posix_path)
+
+    def stat(self, path: Path) -> os.stat_result | None:
+        """get the ``stat`` result of a path, if it was found"""
+        return self.entries.get(Path(path))
+
+    def rglob(self, pattern: str, files_only: bool = False) -> list[Path]:
+        """get the sorted paths which match a pattern, as ``Path.rglob``"""
+        return [
+            path
+            for path, path_stat in self.entries.items()
+            if PurePosixPath(path.relative_to(self.root).as_posix()).match(pattern)
+            and not (files_only and stat.S_ISDIR(path_stat.st_mode))
+        ]
+
+    def subtree(self, root: Path) -> "TreeSnapshot":
+        """get a snapshot of a directory in this tree, without walking it again"""
+        root = Path(root)
+        return TreeSnapshot(
+            root,
+            {p: st for p, st in self.entries.items() if root in p.parents},
+            ignore=self.ignore,
+        )